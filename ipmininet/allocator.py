@@ -0,0 +1,457 @@
+"""This module allocates subnets out of a prefix space with a buddy allocator.
+The free blocks are indexed by prefix length so that finding the smallest
+block able to contain a subnet, splitting it and merging it back are all
+logarithmic operations. It also provides an index of prefixes to detect
+address conflicts and a prefix trie to find the longest prefix matching an
+address."""
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from ipaddress import IPv4Address, IPv4Interface, IPv4Network, \
+    IPv6Address, IPv6Interface, IPv6Network, ip_interface, ip_network
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, \
+    Tuple, Union
+
+IPNetwork = Union[IPv4Network, IPv6Network]
+IPAddress = Union[IPv4Address, IPv6Address]
+
+_INF = float('inf')
+# The value of the nodes of a PrefixTrie that are not a prefix of the trie
+_EMPTY = object()
+
+
+class PrefixIndex:
+    """A set of IPv4 and IPv6 prefixes, stored as sorted integer intervals,
+    that answers containment and overlap queries in logarithmic time.
+
+    Two prefixes are either disjoint or nested. The index thus keeps apart
+    the prefixes that are not contained in another one: they are disjoint
+    so a prefix overlaps the index iff it overlaps the last of them that
+    starts before its end."""
+
+    def __init__(self, prefixes: Iterable[Union[str, IPNetwork]] = ()):
+        """:param prefixes: The initial prefixes of the index"""
+        self._nets = set()  # type: Set[IPNetwork]
+        # All the prefixes, as (version, start, prefixlen, net)
+        self._all = []  # type: List[Tuple[int, int, int, IPNetwork]]
+        # The maximal prefixes, as (version, start, end, net)
+        self._top = []  # type: List[Tuple[int, int, int, IPNetwork]]
+        self.update(prefixes)
+
+    @staticmethod
+    def _net(prefix: Union[str, IPNetwork]) -> IPNetwork:
+        return prefix if isinstance(prefix, (IPv4Network, IPv6Network)) \
+            else ip_network(str(prefix))
+
+    @staticmethod
+    def _bounds(net: IPNetwork) -> Tuple[int, int, int]:
+        return (net.version, int(net.network_address),
+                int(net.broadcast_address))
+
+    def __contains__(self, prefix: Union[str, IPNetwork]) -> bool:
+        return self._net(prefix) in self._nets
+
+    def __iter__(self) -> Iterator[IPNetwork]:
+        """Iterate over the prefixes, IPv4 first, by increasing address"""
+        return (entry[3] for entry in self._all)
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, [str(n) for n in self])
+
+    def _last_top(self, version: int, before: int) -> Optional[Tuple]:
+        """Return the last maximal prefix starting at or before an address"""
+        i = bisect_right(self._top, (version, before, _INF)) - 1
+        if i >= 0 and self._top[i][0] == version:
+            return self._top[i]
+        return None
+
+    def add(self, prefix: Union[str, IPNetwork]) -> bool:
+        """Add a prefix to the index
+
+        :return: False if the prefix was already in the index"""
+        net = self._net(prefix)
+        if net in self._nets:
+            return False
+        self._nets.add(net)
+        version, start, end = self._bounds(net)
+        insort(self._all, (version, start, net.prefixlen, net))
+        if not self.covers(net, strict=True):
+            # The prefix replaces the maximal prefixes that it contains
+            lo = bisect_left(self._top, (version, start))
+            hi = bisect_right(self._top, (version, end, _INF))
+            self._top[lo:hi] = [(version, start, end, net)]
+        return True
+
+    def update(self, prefixes: Iterable[Union[str, IPNetwork]]):
+        """Add several prefixes to the index"""
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def discard(self, prefix: Union[str, IPNetwork]) -> bool:
+        """Remove a prefix from the index
+
+        :return: False if the prefix was not in the index"""
+        net = self._net(prefix)
+        if net not in self._nets:
+            return False
+        self._nets.remove(net)
+        version, start, end = self._bounds(net)
+        self._all.remove((version, start, net.prefixlen, net))
+        i = bisect_left(self._top, (version, start, end, net))
+        if i < len(self._top) and self._top[i][3] == net:
+            # The prefixes that it contained become maximal
+            top = []
+            last = -1
+            for j in range(bisect_left(self._all, (version, start)),
+                           len(self._all)):
+                v, s, _, n = self._all[j]
+                if v != version or s > end:
+                    break
+                if s > last:
+                    last = int(n.broadcast_address)
+                    top.append((v, s, last, n))
+            self._top[i:i + 1] = top
+        return True
+
+    def maximal(self) -> List[IPNetwork]:
+        """Return the prefixes that are not contained in another one of the
+        index. They are disjoint."""
+        return [entry[3] for entry in self._top]
+
+    def overlaps(self, prefix: Union[str, IPNetwork]) -> bool:
+        """Return whether a prefix overlaps a prefix of the index"""
+        version, start, end = self._bounds(self._net(prefix))
+        top = self._last_top(version, end)
+        return top is not None and top[2] >= start
+
+    def covers(self, prefix: Union[str, IPNetwork], strict=False) -> bool:
+        """Return whether a prefix is contained in a prefix of the index
+
+        :param prefix: The prefix to look for
+        :param strict: Whether the prefix itself is ignored"""
+        net = self._net(prefix)
+        if not strict and net in self._nets:
+            return True
+        version, start, end = self._bounds(net)
+        top = self._last_top(version, start)
+        return top is not None and top[2] >= end and top[3] != net
+
+    def conflicts(self, prefix: Union[str, IPNetwork]) -> List[IPNetwork]:
+        """Return the prefixes of the index that overlap a prefix, from the
+        biggest to the smallest one"""
+        net = self._net(prefix)
+        version, start, end = self._bounds(net)
+        # The prefixes containing it
+        found = [n for n in (net.supernet(new_prefix=p)
+                             for p in range(net.prefixlen))
+                 if n in self._nets]
+        # The prefix itself and the ones that it contains
+        for i in range(bisect_left(self._all, (version, start)),
+                       len(self._all)):
+            v, s, prefixlen, n = self._all[i]
+            if v != version or s > end:
+                break
+            if prefixlen >= net.prefixlen:
+                found.append(n)
+        return found
+
+    def next_free(self, base: Union[str, IPNetwork], prefixlen: int) \
+            -> Optional[IPNetwork]:
+        """Return the lowest prefix of base that does not overlap the index
+
+        :param base: The prefix in which to look for a free block
+        :param prefixlen: The prefix length of the free block
+        :return: The free block or None if there is none"""
+        base = self._net(base)
+        if prefixlen < base.prefixlen or prefixlen > base.max_prefixlen:
+            return None
+        version, start, end = self._bounds(base)
+        size = 1 << (base.max_prefixlen - prefixlen)
+        while start + size - 1 <= end:
+            top = self._last_top(version, start + size - 1)
+            if top is None or top[2] < start:
+                return type(base)((start, prefixlen))
+            # Skip after the last prefix overlapping the block
+            start = (top[2] + size) // size * size
+        return None
+
+
+class SubnetAllocator:
+    """A buddy allocator of the subnets of one IP version.
+
+    Allocating a subnet takes the lowest free block among the smallest ones
+    that can contain it, then splits it in halves until it has the requested
+    size. The upper halves are kept as free blocks. This keeps the free
+    space as aggregated as possible: a subnet never splits a bigger block if
+    a smaller one can hold it."""
+
+    def __init__(self, subnets: Iterable[IPNetwork],
+                 reserved: Union[PrefixIndex, Iterable[IPNetwork]] = ()):
+        """:param subnets: The prefix space in which subnets are allocated
+        :param reserved: The subnets that cannot be allocated, e.g., because
+                         they were statically assigned"""
+        subnets = list(subnets)
+        self._network = type(subnets[0]) if subnets else IPv4Network
+        self.bits = subnets[0].max_prefixlen if subnets else 32
+        # The network addresses of the free blocks, by prefix length.
+        # Blocks are removed from the heaps lazily, the sets are the
+        # reference.
+        self._heaps = {}  # type: Dict[int, List[int]]
+        self._free = {}  # type: Dict[int, Set[int]]
+        for net in subnets:
+            self._add(int(net.network_address), net.prefixlen)
+        if not isinstance(reserved, PrefixIndex):
+            reserved = PrefixIndex(reserved)
+        for net in reserved.maximal():
+            if net.max_prefixlen == self.bits:
+                self.reserve(net)
+
+    def _size(self, prefixlen: int) -> int:
+        return 1 << (self.bits - prefixlen)
+
+    def _add(self, addr: int, prefixlen: int):
+        """Register a free block"""
+        self._free.setdefault(prefixlen, set()).add(addr)
+        heapq.heappush(self._heaps.setdefault(prefixlen, []), addr)
+
+    def _remove(self, addr: int, prefixlen: int) -> bool:
+        """Unregister a free block
+
+        :return: Whether the block was free"""
+        free = self._free.get(prefixlen)
+        if free is None or addr not in free:
+            return False
+        free.remove(addr)
+        return True
+
+    def _pop(self, prefixlen: int) -> Optional[int]:
+        """Unregister and return the lowest free block of a given size"""
+        free = self._free.get(prefixlen)
+        if not free:
+            return None
+        heap = self._heaps[prefixlen]
+        while True:
+            addr = heapq.heappop(heap)
+            if addr in free:
+                free.remove(addr)
+                return addr
+
+    def _split(self, addr: int, prefixlen: int, target: int, to: int):
+        """Split the free block addr/prefixlen until reaching the block
+        target/to that it contains. All the other halves are freed."""
+        while prefixlen < to:
+            prefixlen += 1
+            upper = addr + self._size(prefixlen)
+            if target >= upper:
+                self._add(addr, prefixlen)
+                addr = upper
+            else:
+                self._add(upper, prefixlen)
+
+    def __len__(self) -> int:
+        """Return the number of free blocks"""
+        return sum(len(free) for free in self._free.values())
+
+    def largest_prefixlen(self) -> Optional[int]:
+        """Return the prefix length of the biggest free block, or None if
+        there is no space left"""
+        for prefixlen in range(self.bits + 1):
+            if self._free.get(prefixlen):
+                return prefixlen
+        return None
+
+    def allocate(self, prefixlen: int) -> IPNetwork:
+        """Allocate a subnet
+
+        :param prefixlen: The prefix length of the subnet
+        :raise ValueError: if no free block can contain the subnet"""
+        for plen in range(prefixlen, -1, -1):
+            addr = self._pop(plen)
+            if addr is not None:
+                self._split(addr, plen, addr, prefixlen)
+                return self._network((addr, prefixlen))
+        raise ValueError('No free block can contain a /%d' % prefixlen)
+
+    def reserve(self, net: IPNetwork) -> bool:
+        """Make a subnet unavailable for allocations
+
+        :return: False if the subnet was not entirely free"""
+        addr = int(net.network_address)
+        for plen in range(net.prefixlen, -1, -1):
+            block = addr & ~(self._size(plen) - 1)
+            if self._remove(block, plen):
+                self._split(block, plen, addr, net.prefixlen)
+                return True
+        # The subnet is not in a free block, but may contain some of them
+        end = addr + self._size(net.prefixlen)
+        for plen in range(net.prefixlen + 1, self.bits + 1):
+            for block in [b for b in self._free.get(plen, ())
+                          if addr <= b < end]:
+                self._remove(block, plen)
+        return False
+
+    def release(self, net: IPNetwork):
+        """Make an allocated subnet available again, merging it with its
+        buddy blocks when they are free"""
+        addr = int(net.network_address)
+        prefixlen = net.prefixlen
+        while prefixlen > 0:
+            buddy = addr ^ self._size(prefixlen)
+            if not self._remove(buddy, prefixlen):
+                break
+            addr = min(addr, buddy)
+            prefixlen -= 1
+        self._add(addr, prefixlen)
+
+    def free_subnets(self) -> List[IPNetwork]:
+        """Return the free blocks, from the smallest to the biggest"""
+        return [self._network((addr, plen))
+                for plen in sorted(self._free, reverse=True)
+                for addr in sorted(self._free[plen])]
+
+
+class PrefixTrie:
+    """A binary trie mapping IPv4 and IPv6 prefixes to values.
+
+    Each prefix is a node of the trie, reached from the root of its IP
+    version by following its bits. Looking up an address walks down its bits
+    and meets all the prefixes containing it, so that the longest one is
+    found in at most 32 or 128 steps, regardless of the size of the trie."""
+
+    def __init__(self, items: Iterable[Tuple[Union[str, IPNetwork],
+                                             Any]] = ()):
+        """:param items: The initial (prefix, value) pairs of the trie"""
+        # Each node is [child for bit 0, child for bit 1, value]
+        self._roots = {4: [None, None, _EMPTY],
+                       6: [None, None, _EMPTY]}  # type: Dict[int, list]
+        self._len = 0
+        for prefix, value in items:
+            self[prefix] = value
+
+    @staticmethod
+    def _net(prefix: Union[str, IPNetwork]) -> IPNetwork:
+        return prefix if isinstance(prefix, (IPv4Network, IPv6Network)) \
+            else ip_network(str(prefix))
+
+    @staticmethod
+    def _address(address: Union[str, IPAddress, IPv4Interface,
+                                IPv6Interface]) -> IPNetwork:
+        """Return the host prefix of an address, the prefix length of an
+        interface or of a string is ignored"""
+        if isinstance(address, (IPv4Interface, IPv6Interface)):
+            address = address.ip
+        elif not isinstance(address, (IPv4Address, IPv6Address)):
+            address = ip_interface(str(address)).ip
+        return ip_network(address)
+
+    def _path(self, net: IPNetwork, create=False) -> List[list]:
+        """Return the nodes from the root of the trie to the one of a prefix.
+        The path stops at the last existing node unless create is set."""
+        node = self._roots[net.version]
+        path = [node]
+        addr = int(net.network_address)
+        shift = net.max_prefixlen
+        for _ in range(net.prefixlen):
+            shift -= 1
+            bit = (addr >> shift) & 1
+            child = node[bit]
+            if child is None:
+                if not create:
+                    break
+                child = node[bit] = [None, None, _EMPTY]
+            node = child
+            path.append(node)
+        return path
+
+    def _node(self, prefix: Union[str, IPNetwork]) -> Optional[list]:
+        net = self._net(prefix)
+        path = self._path(net)
+        if len(path) == net.prefixlen + 1 and path[-1][2] is not _EMPTY:
+            return path[-1]
+        return None
+
+    def __setitem__(self, prefix: Union[str, IPNetwork], value: Any):
+        node = self._path(self._net(prefix), create=True)[-1]
+        if node[2] is _EMPTY:
+            self._len += 1
+        node[2] = value
+
+    def __getitem__(self, prefix: Union[str, IPNetwork]) -> Any:
+        node = self._node(prefix)
+        if node is None:
+            raise KeyError(prefix)
+        return node[2]
+
+    def __delitem__(self, prefix: Union[str, IPNetwork]):
+        net = self._net(prefix)
+        path = self._path(net)
+        if len(path) != net.prefixlen + 1 or path[-1][2] is _EMPTY:
+            raise KeyError(prefix)
+        path[-1][2] = _EMPTY
+        self._len -= 1
+        # Prune the branch that no longer leads to a prefix
+        addr = int(net.network_address)
+        for depth in range(net.prefixlen, 0, -1):
+            node = path[depth]
+            if node[0] is not None or node[1] is not None \
+                    or node[2] is not _EMPTY:
+                break
+            path[depth - 1][(addr >> (net.max_prefixlen - depth)) & 1] = None
+
+    def __contains__(self, prefix: Union[str, IPNetwork]) -> bool:
+        return self._node(prefix) is not None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[IPNetwork]:
+        return (net for net, _ in self.items())
+
+    def get(self, prefix: Union[str, IPNetwork], default: Any = None) -> Any:
+        node = self._node(prefix)
+        return default if node is None else node[2]
+
+    def setdefault(self, prefix: Union[str, IPNetwork], default: Any) -> Any:
+        node = self._path(self._net(prefix), create=True)[-1]
+        if node[2] is _EMPTY:
+            self._len += 1
+            node[2] = default
+        return node[2]
+
+    def items(self) -> Iterator[Tuple[IPNetwork, Any]]:
+        """Iterate over the (prefix, value) pairs, IPv4 first, by increasing
+        address then by increasing prefix length"""
+        for version, cls, bits in ((4, IPv4Network, 32),
+                                   (6, IPv6Network, 128)):
+            stack = [(self._roots[version], 0, 0)]
+            while stack:
+                node, addr, depth = stack.pop()
+                if node[2] is not _EMPTY:
+                    yield cls((addr << (bits - depth), depth)), node[2]
+                for bit in (1, 0):
+                    if node[bit] is not None:
+                        stack.append((node[bit], addr << 1 | bit, depth + 1))
+
+    def matches(self, address: Union[str, IPAddress, IPv4Interface,
+                                     IPv6Interface]) \
+            -> Iterator[Tuple[IPNetwork, Any]]:
+        """Iterate over the prefixes containing an address, with their
+        values, from the longest to the shortest one"""
+        host = self._address(address)
+        path = self._path(host)
+        addr = int(host.network_address)
+        bits = host.max_prefixlen
+        for depth in range(len(path) - 1, -1, -1):
+            if path[depth][2] is not _EMPTY:
+                shift = bits - depth
+                yield type(host)((addr >> shift << shift, depth)), \
+                    path[depth][2]
+
+    def longest_match(self, address: Union[str, IPAddress, IPv4Interface,
+                                           IPv6Interface]) \
+            -> Optional[Tuple[IPNetwork, Any]]:
+        """Return the longest prefix containing an address and its value, or
+        None if no prefix contains it"""
+        return next(self.matches(address), None)
@@ -6,6 +6,7 @@ from select import poll
 from mininet.cli import CLI
 from mininet.log import lg
 
+from ipmininet.link import invalidate_addresses
 from ipmininet.utils import address_pair
 
 
@@ -44,12 +45,18 @@ class IPCLI(CLI):
             self.default('%s ip route get %s' % (r.name, line))
 
     def do_ip(self, line: str):
-        """ip IP1 IP2 ...: return the node associated to the given IP"""
+        """ip IP1 IP2 ...: return the node associated to the given IP, or the
+        subnet containing it if no node owns it"""
         for ip in line.split(' '):
             try:
-                n = self.mn.node_for_ip(ip)
+                itf = self.mn.intf_for_ip(ip)
+                n = '%s (%s)' % (itf.node.name, itf.name)
             except KeyError:
-                n = 'unknown IP'
+                subnet = self.mn.subnet_for_ip(ip)
+                n = 'unknown IP' if subnet is None \
+                    else 'unknown IP in %s' % subnet[0]
+            except ValueError:
+                n = 'invalid IP'
             finally:
                 lg.output(ip, '|', n, "\n")
 
@@ -117,5 +124,7 @@ class IPCLI(CLI):
 
             node.sendCmd(' '.join([ip_map.get(r, r) for r in rest]))
             self.waitForNode(node)
+            # The command may have changed the addresses of the node
+            invalidate_addresses(node)
         else:
             lg.error('*** Unknown command: %s\n' % line)
@@ -5,13 +5,12 @@ configuration for a host."""
 import abc
 import os
 
-from mako.lookup import TemplateLookup
-
 from ipmininet.router.config.base import NodeConfig, Daemon
+from ipmininet.router.config.utils import template_lookup
 
 
 __TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates')
-host_template_lookup = TemplateLookup(directories=[__TEMPLATES_DIR])
+host_template_lookup = template_lookup(__TEMPLATES_DIR)
 
 
 class HostDaemon(Daemon, metaclass=abc.ABCMeta):
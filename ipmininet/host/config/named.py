@@ -60,6 +60,7 @@ class Named(HostDaemon):
         cfg = super().build()
         cfg.log_severity = self.options.log_severity
         cfg.abs_logfile = os.path.abspath(cfg.logfile)
+        self.additional_zone_filenames = []
 
         cfg.zones = ConfigDict()
         root_zone_found = False
@@ -79,6 +80,9 @@ class Named(HostDaemon):
         return cfg
 
     def build_zone(self, zone: 'DNSZone') -> ConfigDict:
+        # The zone is shared with the other nodes, so the records added for
+        # this node are kept in the configuration tree
+        records = list(zone.records)
         master_ips = []
         for s_name in zone.servers + [zone.dns_master] + zone.dns_slaves + \
                       zone.delegation_servers:
@@ -93,20 +97,24 @@ class Named(HostDaemon):
             server = server_itf.node
             for itf in realIntfList(server):
                 for ip in itf.ips():
-                    if not is_reverse_zone(zone.name):
-                        zone.add_record(ARecord(s_name, ip.ip.compressed))
+                    record = ARecord(s_name, ip.ip.compressed)
+                    if not is_reverse_zone(zone.name) \
+                            and record not in records:
+                        records.append(record)
                     if s_name == zone.dns_master:
                         master_ips.append(ip.ip.compressed)
 
                 for ip6 in itf.ip6s(exclude_lls=True):
-                    if not is_reverse_zone(zone.name):
-                        zone.add_record(AAAARecord(s_name, ip6.ip.compressed))
+                    record = AAAARecord(s_name, ip6.ip.compressed)
+                    if not is_reverse_zone(zone.name) \
+                            and record not in records:
+                        records.append(record)
                     if s_name == zone.dns_master:
                         master_ips.append(ip6.ip.compressed)
 
         return ConfigDict(name=zone.name,
                           soa_record=zone.soa_record,
-                          records=zone.records,
+                          records=records,
                           master=self._node.name == zone.dns_master,
                           master_ips=master_ips,
                           delegation_servers=zone.delegation_servers)
@@ -210,8 +218,9 @@ class Named(HostDaemon):
                                   records=records,
                                   master=True,
                                   master_ips=[])
-        self._node.params.setdefault('dns_zones', []).append(reverse_zone)
-        cfg_zones[self.zone_filename(reverse_zone.name)] = reverse_zone
+        filename = self.zone_filename(reverse_zone.name)
+        self.additional_zone_filenames.append(filename)
+        cfg_zones[filename] = reverse_zone
 
     def set_defaults(self, defaults):
         """:param log_severity: It controls the logging levels and may take the
@@ -1,7 +1,9 @@
 import os
+import sys
 
 from .install import parse_args, dist, install_mininet, install_frrouting, \
     enable_ipv6, install_openr
+from .utils import sh
 
 if __name__ == "__main__":
 
@@ -36,6 +38,10 @@ if __name__ == "__main__":
         dist.install("git")
         source_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         dist.pip_install(source_dir)
+        # Compile the daemon templates once for all the networks
+        sh("%s -c 'from ipmininet.router.config.utils import"
+           " precompile_templates; precompile_templates()'" % sys.executable,
+           may_fail=True)
 
     # Enable IPv6 (disabled by mininet installation)
 
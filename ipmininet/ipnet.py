@@ -2,21 +2,29 @@
 This modules will auto-generate all needed configuration properties if
 unspecified by the user"""
 import math
-from operator import attrgetter, methodcaller
+import time
+from operator import itemgetter, methodcaller
 from typing import Union, List, Optional, Type, Iterable, Mapping, Tuple, \
-    Iterator, Dict, Set
+    Iterator, Dict, Set, Any, Sequence
 
 from ipaddress import ip_network, ip_interface, IPv4Address, IPv6Address, \
     IPv4Network, IPv6Network, IPv4Interface, IPv6Interface
 
 from . import MIN_IGP_METRIC, OSPF_DEFAULT_AREA
 from .utils import otherIntf, realIntfList, L3Router, address_pair, has_cmd, \
-    is_subnet_of
+    UnionFind
 from .host import IPHost
 from .router import Router
 from .router.config import BasicRouterConfig, RouterConfig
-from .link import IPIntf, IPLink, PhysicalInterface
+from .router.config.base import RouterIdAllocator
+from .allocator import IPNetwork, PrefixIndex, SubnetAllocator
+from .link import AddressIndex, DeferredIntfInit, IPBatch, IPIntf, IPLink, \
+    PhysicalInterface, VethPair, make_veth_pairs, clear_veth_pairs
 from .ipswitch import IPSwitch
+from .scheduler import StartupScheduler
+from .render import ConfigRenderer
+from .validation import CheckCache
+from .plan import AllocationPlan, PlanCache, topology_fingerprint
 
 from mininet.net import Mininet
 from mininet.node import Host, Controller, Node
@@ -26,6 +34,12 @@ from mininet.log import lg as log
 PING6_CMD = 'ping6' if has_cmd('ping6') else 'ping -6'
 
 
+# The allowed groupings of the broadcast domains in aggregates
+AGGREGATE_LEVELS = ((), ('as',), ('area',), ('as', 'area'))
+# The (level, key) pairs leading to the group of an aggregate
+AggregatePath = Tuple[Tuple[str, Any], ...]
+
+
 class IPNet(Mininet):
     """IPNet: An IP-aware Mininet"""
     def __init__(self,
@@ -45,6 +59,16 @@ class IPNet(Mininet):
                  intf: Type[IPIntf] = IPIntf,
                  switch: Type[IPSwitch] = IPSwitch,
                  controller: Optional[Type[Controller]] = None,
+                 start_workers=1,
+                 validation_workers: Optional[int] = None,
+                 render_workers: Optional[int] = None,
+                 cache_checks=True,
+                 bulk_links=True,
+                 cache_allocation=False,
+                 pack_v4_p2p=False,
+                 pack_v6_p2p=False,
+                 aggregate_by: Sequence[str] = (),
+                 summarize_aggregates=False,
                  *args, **kwargs):
         """Extends Mininet by adding IP-related ivars/functions and
         configuration knobs.
@@ -60,12 +84,47 @@ class IPNet(Mininet):
         :param max_v6_prefixlen: Maximal IPv6 prefixlen to auto-allocate
         :param allocate_IPs: whether to auto-allocate subnets in the network
         :param igp_metric: The default IGP metric for the links
-        :param igp_area: The default IGP area for the links"""
+        :param igp_area: The default IGP area for the links
+        :param start_workers: The number of nodes or daemons that can be
+                              started at the same time
+        :param validation_workers: The number of daemon configurations that
+                                   can be checked at the same time, defaults
+                                   to the number of CPUs
+        :param render_workers: The number of processes rendering the
+                               configuration files of the nodes, defaults to
+                               the number of CPUs
+        :param cache_checks: Skip the configuration checks that succeeded
+                             in a previous run on identical configurations
+        :param bulk_links: Create the veth pairs of all the links of the
+                           topology in a few batches per namespace
+        :param cache_allocation: Reuse the broadcast domains and the
+                                 addresses computed for an identical
+                                 topology in a previous run
+        :param pack_v4_p2p: Allocate a /31 to the IPv4 broadcast domains
+                            made of two router interfaces (RFC 3021),
+                            regardless of max_v4_prefixlen
+        :param pack_v6_p2p: Allocate a /127 to the IPv6 broadcast domains
+                            made of two router interfaces (RFC 6164),
+                            regardless of max_v6_prefixlen
+        :param aggregate_by: The overlays whose broadcast domains are
+                             allocated in a single block of the prefix
+                             space, from the outermost to the innermost:
+                             ('as',) groups them by AS, ('area',) by OSPF
+                             area and ('as', 'area') by OSPF area inside
+                             each AS block
+        :param summarize_aggregates: Advertise the block of each AS with a
+                                     BGP aggregate-address and the block of
+                                     each OSPF area with an area range"""
+        if tuple(aggregate_by) not in AGGREGATE_LEVELS:
+            raise ValueError('aggregate_by must be one of %s'
+                             % ', '.join(map(str, AGGREGATE_LEVELS)))
         self.router = router
         self.config = config
         self.routers = []  # type: List[Router]
+        # The router ids generated for the routers without IPv4 address
+        self.routerid_allocator = RouterIdAllocator()
         # We need this to be able to do inverse-lookups
-        self._ip_allocs = {}  # type: Dict[str, Node]
+        self._ip_index = AddressIndex()
         self.max_v4_prefixlen = max_v4_prefixlen
         self._unallocated_ipbase = [ip_network(ipBase)]
         self.use_v4 = use_v4
@@ -73,11 +132,36 @@ class IPNet(Mininet):
         self.ip6Base = ip6Base
         self.max_v6_prefixlen = max_v6_prefixlen
         self._unallocated_ip6base = [ip_network(ip6Base)]
+        self.pack_v4_p2p = pack_v4_p2p
+        self.pack_v6_p2p = pack_v6_p2p
+        self.aggregate_by = tuple(aggregate_by)
+        self.summarize_aggregates = summarize_aggregates
+        # The blocks of the groups of broadcast domains (see aggregate_by),
+        # with the (level, key) pairs that lead to their group, e.g.,
+        # ((('as', 1), ('area', '0.0.0.1')), IPv4Network('10.0.0.0/20'))
+        self.aggregates = []  # type: List[Tuple[AggregatePath, IPNetwork]]
+        # The allocators of the subnets once the network is built, by IP
+        # version. They keep track of the free space when the topology
+        # changes at runtime.
+        self._allocators = {}  # type: Dict[int, SubnetAllocator]
         self.broadcast_domains = None
         self.igp_metric = igp_metric
         self.igp_area = igp_area
         self.allocate_IPs = allocate_IPs
         self.physical_interface = {}  # type: Dict[IPIntf, Node]
+        self.start_workers = start_workers
+        self.validation_workers = validation_workers
+        self.render_workers = render_workers
+        self.cache_checks = cache_checks
+        self.bulk_links = bulk_links
+        self.cache_allocation = cache_allocation
+        # The topology whose veth pairs are created in bulk once its nodes
+        # are added, and the link parameters that were set for them
+        self._bulk_topo = None
+        self._bulk_params = {}  # type: Dict[Tuple[str, int], Dict[str, Any]]
+        # Measurements of the network startup, e.g., the time needed by each
+        # node to have all its daemons started under 'ready_time'
+        self.metrics = {}  # type: Dict[str, Any]
         super().__init__(ipBase=ipBase, host=host, switch=switch, link=link,
                          intf=intf, controller=controller, *args, **kwargs)
 
@@ -92,8 +176,13 @@ class IPNet(Mininet):
         if not cls:
             cls = self.router
         r = cls(name, **defaults)
+        if isinstance(r.nconfig, RouterConfig):
+            r.nconfig.routerid_allocator = self.routerid_allocator
         self.routers.append(r)
         self.nameToNode[name] = r
+        if self.broadcast_domains is not None:
+            # The network is already built
+            self._add_interfaces([r.intf('lo')])
         return r
 
     def __iter__(self):
@@ -112,7 +201,48 @@ class IPNet(Mininet):
             log.info(routerName + ' ')
         log.info('\n')
         self.physical_interface.update(topo.phys_interface_capture)
-        super().buildFromTopo(topo)
+        if self.bulk_links:
+            self._bulk_topo = topo
+        # Interfaces are set up and their addresses discovered per node,
+        # once all the links are created
+        try:
+            with DeferredIntfInit():
+                super().buildFromTopo(topo)
+        finally:
+            self._bulk_topo = None
+            self._bulk_params = {}
+            clear_veth_pairs()
+
+    def _make_bulk_links(self, topo):
+        """Create the veth pairs of all the links of the topology at once.
+        This is only possible for the fast IPLinks whose ports are known."""
+        pairs = []  # type: List[VethPair]
+        for _, _, params in topo.links(sort=True, withInfo=True):
+            cls = params.get('cls', self.link)
+            port1 = params.get('port1')
+            port2 = params.get('port2')
+            if not params.get('fast', True) or cls is None \
+                    or not issubclass(cls, IPLink) \
+                    or port1 is None or port2 is None:
+                continue
+            try:
+                node1 = self[params['node1']]
+                node2 = self[params['node2']]
+            except KeyError:
+                continue
+            # Same names and mac addresses as Mininet would use
+            bulk = {
+                'intfName1': params.get('intfName1') or
+                '%s-eth%s' % (node1.name, port1),
+                'intfName2': params.get('intfName2') or
+                '%s-eth%s' % (node2.name, port2),
+                'addr1': params.get('addr1') or self.randMac(),
+                'addr2': params.get('addr2') or self.randMac()}
+            self._bulk_params[node1.name, port1] = bulk
+            pairs.append((node1, bulk['intfName1'], bulk['addr1'],
+                          node2, bulk['intfName2'], bulk['addr2']))
+        log.info('*** Creating %d veth pairs in bulk\n' % len(pairs))
+        make_veth_pairs(pairs)
 
     def addLink(self, node1: Node, node2: Node,
                 igp_metric: Optional[int] = None,
@@ -156,7 +286,26 @@ class IPNet(Mininet):
                 # Only iff not already specified
                 if k not in p:
                     p[k] = v
-        return super().addLink(node1=node1, node2=node2, *args, **params)
+        if self._bulk_topo is not None:
+            # Mininet adds the links once all the nodes exist
+            self._make_bulk_links(self._bulk_topo)
+            self._bulk_topo = None
+        bulk = self._bulk_params.pop((getattr(node1, 'name', node1),
+                                      params.get('port1')), None)
+        if bulk is not None:
+            params.update(bulk)
+        link = super().addLink(node1=node1, node2=node2, *args, **params)
+        if self.broadcast_domains is not None:
+            # The network is already built
+            self._add_interfaces([link.intf1, link.intf2])
+        return link
+
+    def delLink(self, link: IPLink):
+        """Remove a link, and split its broadcast domain if needed"""
+        intfs = [link.intf1, link.intf2]
+        super().delLink(link)
+        if self.broadcast_domains is not None:
+            self._remove_interfaces(intfs)
 
     def addHost(self, name: str, **params) -> IPHost:
         """Prevent Mininet from forcing the allocation of IPv4 addresses
@@ -170,20 +319,55 @@ class IPNet(Mininet):
         """Return the node owning a given IP address
 
         :param ip: an IP address
-        :return: a node name"""
-        return self._ip_allocs[str(ip)]
+        :return: a node name
+        :raise KeyError: if no interface owns the address"""
+        return self.intf_for_ip(ip).node
+
+    def intf_for_ip(self, ip: Union[str, IPv4Address, IPv6Address]) \
+            -> IPIntf:
+        """Return the interface owning a given IP address
+
+        :param ip: an IP address
+        :raise KeyError: if no interface owns the address"""
+        owners = self._ip_index.owners(ip)
+        if not owners:
+            raise KeyError(str(ip))
+        return owners[0]
+
+    def subnet_for_ip(self, ip: Union[str, IPv4Address, IPv6Address]) \
+            -> Optional[Tuple[Union[IPv4Network, IPv6Network],
+                              Optional['BroadcastDomain']]]:
+        """Return the longest subnet of the interface addresses that contains
+        a given IP address, even if no interface owns it
+
+        :param ip: an IP address
+        :return: the subnet and its broadcast domain, or None if no subnet
+                 contains the address"""
+        match = self._ip_index.subnet(ip)
+        if match is None:
+            return None
+        net, intfs = match
+        return net, intfs[0].broadcast_domain
 
     def start(self):
         super().start()
-        log.info('*** Starting, ', len(self.routers), 'routers\n')
-        for router in self.routers:
-            log.info(router.name + ' ')
-            router.start()
-        log.info('*** Starting, ', len(self.hosts), 'hosts\n')
-        for host in self.hosts:
-            log.info(host.name + ' ')
-            host.start()
-        log.info('\n')
+        log.info('*** Starting', len(self.routers), 'routers and',
+                 len(self.hosts), 'hosts\n')
+        # Generated router ids must not collide with the ones of other
+        # routers, whatever the order in which they are built
+        for r in self.routers:
+            self.routerid_allocator.reserve_router(r)
+        renderer = ConfigRenderer(max_workers=self.render_workers)
+        scheduler = StartupScheduler(
+            max_workers=self.start_workers,
+            validation_workers=self.validation_workers,
+            check_cache=CheckCache() if self.cache_checks else None,
+            renderer=renderer)
+        scheduler.start(self.routers + self.hosts)
+        self.metrics['render_time'] = renderer.duration
+        self.metrics['daemon_render_time'] = dict(renderer.daemon_time)
+        self.metrics['validation_time'] = scheduler.validation_time
+        self.metrics['ready_time'] = dict(scheduler.ready_time)
         log.info('*** Setting default host routes\n')
         for h in self.hosts:
             if 'defaultRoute' in h.params:
@@ -211,6 +395,39 @@ class IPNet(Mininet):
                 log.info('skipping %s , ' % h.name)
         log.info('\n')
 
+    def update_configs(self) -> Dict[str, List[str]]:
+        """Build again and write the configuration files of the daemons whose
+        inputs changed since their last build, e.g., after changing the IGP
+        metric of a link or the parameters of a node
+        (see NodeConfig.update)
+
+        :return: The names of the daemons whose configuration files changed,
+                 by node name"""
+        start = time.time()
+        changed = {}
+        for n in self.routers + self.hosts:
+            daemons = n.update_config()
+            if daemons:
+                changed[n.name] = [d.NAME for d in daemons]
+        self.metrics['update_time'] = time.time() - start
+        return changed
+
+    def reconfigure(self) -> Dict[str, List[str]]:
+        """Update the configuration files of the daemons whose inputs changed
+        since their last build, and apply them to the running daemons without
+        restarting them when possible (see IPNode.reconfigure)
+
+        :return: The names of the daemons whose configuration was applied, by
+                 node name"""
+        start = time.time()
+        changed = {}
+        for n in self.routers + self.hosts:
+            daemons = n.reconfigure()
+            if daemons:
+                changed[n.name] = [d.NAME for d in daemons]
+        self.metrics['reconfigure_time'] = time.time() - start
+        return changed
+
     def stop(self):
         log.info('*** Stopping', len(self.routers), 'routers\n')
         for router in self.routers:
@@ -221,15 +438,36 @@ class IPNet(Mininet):
 
     def build(self):
         super().build()
-        self.broadcast_domains = self._broadcast_domains()
-        log.info("*** Found", len(self.broadcast_domains),
-                 "broadcast domains\n")
-        if self.allocate_IPs:
-            self._allocate_IPs()
+        for n in self.values():
+            for itf in n.intfList():
+                if isinstance(itf, IPIntf):
+                    self._ip_index.add(itf)
+        plans = PlanCache() if self.cache_allocation and self.allocate_IPs \
+            else None
+        plan = None
+        if plans is not None:
+            fingerprint = topology_fingerprint(self)
+            plan = plans.load(fingerprint)
+        self.metrics['allocation_cached'] = plan is not None \
+            and self._apply_plan(plan)
+        if self.metrics['allocation_cached']:
+            log.info("*** Applied the cached allocation of",
+                     len(self.broadcast_domains), "broadcast domains\n")
+        else:
+            self.broadcast_domains = self._broadcast_domains()
+            log.info("*** Found", len(self.broadcast_domains),
+                     "broadcast domains\n")
+            if self.allocate_IPs:
+                self._allocate_IPs()
+            if plans is not None:
+                plans.save(AllocationPlan.from_network(fingerprint, self))
+        if self.summarize_aggregates:
+            self._summarize_aggregates()
         # Physical interfaces are their own broadcast domain
         for itf_name, n in self.physical_interface.items():
             try:
                 itf = PhysicalInterface(itf_name, node=self[n])
+                self._ip_index.add(itf)
                 log.info('\n*** Adding Physical interface',
                          itf_name, 'to', n, '\n')
                 self.broadcast_domains.append(BroadcastDomain(itf))
@@ -240,39 +478,276 @@ class IPNet(Mininet):
         except AttributeError as e:
             log.error('*** Skipping post_build():', e, '\n')
 
-    def _allocated_ipv4_subnets(self) -> List[IPv4Network]:
-        subnets = []  # type: List[IPv4Network]
-        if self.broadcast_domains is None:
-            return []
-        for d in self.broadcast_domains:
-            subnets.extend(d.fixed_net4s)
-        return subnets
+    def _apply_plan(self, plan: AllocationPlan) -> bool:
+        """Create the broadcast domains and set the addresses of an
+        allocation plan, if it still fits the network: its interfaces must
+        be exactly the interfaces that belong to broadcast domains and those
+        receiving addresses must not have some yet.
+
+        :return: Whether the plan was applied, nothing is changed otherwise"""
+        expected = set()  # type: Set[IPIntf]
+        for n in self.values():
+            if BroadcastDomain.is_domain_boundary(n):
+                expected.update(realIntfList(n))
+        expected.update(r.intf('lo') for r in self.routers)
+        domains = []  # type: List[Tuple[List[IPIntf], Dict[str, Any]]]
+        seen = set()  # type: Set[IPIntf]
+        try:
+            for d in plan.domains:
+                itfs = [self[node].intf(name)
+                        for node, name in d['interfaces']]
+                for itf, (ips, ip6s) in zip(itfs, d['addresses']):
+                    if itf not in expected or itf in seen \
+                            or ips and next(itf.ips(), None) is not None \
+                            or ip6s and next(itf.ip6s(exclude_lls=True),
+                                             None) is not None:
+                        return False
+                    seen.add(itf)
+                domains.append((itfs, d))
+        except (KeyError, TypeError, ValueError):
+            return False
+        if seen != expected:
+            return False
+
+        batches = {}  # type: Dict[Node, IPBatch]
+        self.broadcast_domains = []
+        for itfs, d in domains:
+            domain = BroadcastDomain(itfs, explored=True)
+            domain.net = ip_network(d['net']) if d['net'] else None
+            domain.net6 = ip_network(d['net6']) if d['net6'] else None
+            domain._allocated_v4 = d['allocated_v4']
+            domain._allocated_v6 = d['allocated_v6']
+            for itf, (ips, ip6s) in zip(itfs, d['addresses']):
+                itf.broadcast_domain = domain
+                batch = batches.setdefault(itf.node, IPBatch(itf.node))
+                if ips:
+                    itf.setIP(tuple(ip_interface(ip) for ip in ips),
+                              batch=batch)
+                if ip6s:
+                    itf.setIP6(tuple(ip_interface(ip) for ip in ip6s),
+                               batch=batch)
+            self.broadcast_domains.append(domain)
+        for batch in batches.values():
+            batch.run()
+        self._unallocated_ipbase = [ip_network(p) for p in plan.free['4']]
+        self._unallocated_ip6base = [ip_network(p) for p in plan.free['6']]
+        self.aggregates = [(tuple((level, key) for level, key in path),
+                            ip_network(block))
+                           for path, block in plan.aggregates]
+        if self.use_v4:
+            self._allocators[4] = SubnetAllocator(self._unallocated_ipbase)
+        if self.use_v6:
+            self._allocators[6] = SubnetAllocator(self._unallocated_ip6base)
+        return True
 
-    def _allocated_ipv6_subnets(self) -> List[IPv6Network]:
-        subnets = []  # type: List[IPv6Network]
+    def _allocated_subnets(self) -> PrefixIndex:
+        """Return the index of the subnets fixed in the broadcast domains"""
+        subnets = PrefixIndex()
         if self.broadcast_domains is None:
-            return []
+            return subnets
         for d in self.broadcast_domains:
-            subnets.extend(d.fixed_net6s)
+            subnets.update(d.fixed_net4s)
+            subnets.update(d.fixed_net6s)
         return subnets
 
     def _allocate_IPs(self):
         """Allocate IP addresses on every interface in every broadcast
         domain"""
+        # The addresses of a node are all set in a single batch
+        batches = {}  # type: Dict[Node, IPBatch]
         if self.use_v4:
-            self._allocate_ipv4()
+            self._allocate_ipv4(batches)
         if self.use_v6:
-            self._allocate_ipv6()
+            self._allocate_ipv6(batches)
+        for batch in batches.values():
+            batch.run()
+
+    def _add_interfaces(self, intfs: List[IPIntf]):
+        """Update the broadcast domains and the addresses once the network
+        is built, after adding new interfaces. Only the domains of these
+        interfaces are explored. The domains that they merge keep the
+        subnet of the biggest of them if it is large enough."""
+        batches = {}  # type: Dict[Node, IPBatch]
+        explored = set()  # type: Set[IPIntf]
+        for intf in intfs:
+            self._ip_index.add(intf)
+        for intf in intfs:
+            if intf in explored:
+                continue
+            itfs = [intf]
+            if not BroadcastDomain.is_domain_boundary(intf.node):
+                # Explore both sides of the switch or of the hub
+                itfs.extend(i for i in realIntfList(intf.node)
+                            if i is not intf)
+            explored.update(itfs)
+            domain = BroadcastDomain(itfs)
+            if not domain.interfaces:
+                continue
+            explored.update(domain.interfaces)
+            old = []  # type: List[BroadcastDomain]
+            for i in domain:
+                d = getattr(i, 'broadcast_domain', None)
+                if d is not None and d not in old:
+                    old.append(d)
+            # Reuse the subnets of the biggest domains first
+            old.sort(key=lambda d: len(d.interfaces), reverse=True)
+            self._replace_domains(old, [domain])
+            for version in (4, 6):
+                self._allocate_domain(domain, version, batches, old=old)
+        for batch in batches.values():
+            batch.run()
+
+    def _remove_interfaces(self, intfs: List[IPIntf]):
+        """Update the broadcast domains and the addresses once the network
+        is built, after deleting interfaces. The domains of these interfaces
+        are split if they are no longer connected. The biggest part keeps
+        the subnets of the domain, the others get new ones."""
+        batches = {}  # type: Dict[Node, IPBatch]
+        for intf in intfs:
+            self._ip_index.remove(intf)
+        domains = []  # type: List[BroadcastDomain]
+        for intf in intfs:
+            if BroadcastDomain.is_domain_boundary(intf.node):
+                itfs = [intf]
+            else:
+                # The domain of the switch or of the hub is reached through
+                # its remaining interfaces
+                itfs = list(BroadcastDomain(realIntfList(intf.node)))
+            for i in itfs:
+                domain = getattr(i, 'broadcast_domain', None)
+                if domain is not None and domain not in domains:
+                    domains.append(domain)
+        for domain in domains:
+            remaining = [i for i in domain if i not in intfs]
+            split = []  # type: List[BroadcastDomain]
+            explored = set()  # type: Set[IPIntf]
+            for i in remaining:
+                if i not in explored:
+                    split.append(BroadcastDomain(i))
+                    explored.update(split[-1].interfaces)
+            split.sort(key=lambda d: len(d.interfaces), reverse=True)
+            self._replace_domains([domain], split)
+            for version in (4, 6):
+                net_key = 'net' if version == 4 else 'net6'
+                net = getattr(domain, net_key)
+                if not split:
+                    if net is not None and version in self._allocators:
+                        self._allocators[version].release(net)
+                    continue
+                self._allocate_domain(split[0], version, batches,
+                                      old=[domain])
+                for part in split[1:]:
+                    self._allocate_domain(part, version, batches,
+                                          stale=[net] if net else [])
+        for batch in batches.values():
+            batch.run()
+
+    def _replace_domains(self, old: List['BroadcastDomain'],
+                         new: List['BroadcastDomain']):
+        """Replace some broadcast domains of the network by new ones"""
+        for domain in old:
+            self.broadcast_domains.remove(domain)
+        for domain in new:
+            for intf in domain:
+                intf.broadcast_domain = domain
+            self.broadcast_domains.append(domain)
+
+    def _allocate_domain(self, domain: 'BroadcastDomain', version: int,
+                         batches: Dict[Node, IPBatch],
+                         old: Sequence['BroadcastDomain'] = (),
+                         stale: Sequence[Union[IPv4Network,
+                                               IPv6Network]] = ()):
+        """Give a subnet to a broadcast domain created once the network is
+        built, and address its interfaces that need it
+
+        :param domain: The broadcast domain
+        :param version: The IP version of the subnet
+        :param batches: The IPBatch of each node in which addresses are set
+        :param old: The previous domains of its interfaces. The subnet of
+                    the first one that is large enough is kept, the other
+                    subnets are released.
+        :param stale: The subnets whose addresses must be replaced"""
+        allocator = self._allocators.get(version)
+        if allocator is None or not (self.use_v4 if version == 4
+                                     else self.use_v6):
+            return
+        net_key = 'net' if version == 4 else 'net6'
+        counter_key = '_allocated_v4' if version == 4 else '_allocated_v6'
+        plen = self._subnet_prefixlen(
+            domain, version,
+            self.max_v4_prefixlen if version == 4 else self.max_v6_prefixlen,
+            self._p2p_prefixlen(version))
+        stale = list(stale)
+        kept = None
+        for d in old:
+            net = getattr(d, net_key)
+            if net is None:
+                continue
+            if kept is None and net.prefixlen <= plen \
+                    and domain.use_ip_version(version):
+                kept = d
+            else:
+                allocator.release(net)
+                stale.append(net)
+        if not domain.use_ip_version(version):
+            return
+
+        def addresses(intf):
+            return list(intf.ips()) if version == 4 \
+                else list(intf.ip6s(exclude_lls=True))
+
+        def needs_address(intf):
+            ips = addresses(intf)
+            return not ips or any(ip in net for ip in ips for net in stale)
+
+        needing = [i for i in domain
+                   if (i.node.use_v4 if version == 4 else i.node.use_v6)
+                   and needs_address(i)]
+        width = sum(i.interface_width[0 if version == 4 else 1]
+                    for i in needing)
+        if kept is not None:
+            net = getattr(kept, net_key)
+            # IPv4 reserves the broadcast address, except in a /31
+            left = net.num_addresses - getattr(kept, counter_key) \
+                - (1 if version == 4 and net.prefixlen < 31 else 0)
+            if left >= width:
+                setattr(domain, net_key, net)
+                setattr(domain, counter_key, getattr(kept, counter_key))
+            else:
+                allocator.release(net)
+                stale.append(net)
+                needing = [i for i in domain
+                           if (i.node.use_v4 if version == 4
+                               else i.node.use_v6) and needs_address(i)]
+                kept = None
+        if kept is None:
+            domain.set_subnet(allocator.allocate(plen))
+        for intf in needing:
+            if version == 4:
+                ips = tuple(domain.next_ipv4()
+                            for _ in range(intf.interface_width[0]))
+            else:
+                ips = tuple(domain.next_ipv6()
+                            for _ in range(intf.interface_width[1]))
+            intf.setIP(ips, batch=batches.setdefault(intf.node,
+                                                     IPBatch(intf.node)))
 
-    def _allocate_ipv4(self):
+    def _allocate_ipv4(self, batches: Dict[Node, IPBatch]):
         log.info("*** Allocating IPv4 addresses\n")
-        self._allocate_subnets(self._unallocated_ipbase,
-                               self.broadcast_domains,
-                               domainlen='len_v4',
-                               net_key='net',
-                               size_key='max_v4prefixlen',
-                               max_prefixlen=self.max_v4_prefixlen,
-                               allocated_subnets=self._allocated_ipv4_subnets())
+        self._allocators[4] = SubnetAllocator(
+            self._unallocated_ipbase, reserved=self._allocated_subnets())
+        if self.aggregate_by:
+            self._allocate_aggregated(4, self._allocators[4])
+            self._unallocated_ipbase[:] = self._allocators[4].free_subnets()
+        else:
+            self._allocate_subnets(self._unallocated_ipbase,
+                                   self.broadcast_domains,
+                                   domainlen='len_v4',
+                                   net_key='net',
+                                   size_key='max_v4prefixlen',
+                                   max_prefixlen=self.max_v4_prefixlen,
+                                   allocator=self._allocators[4],
+                                   p2p_prefixlen=self._p2p_prefixlen(4))
         for domain in self.broadcast_domains:
             if not domain.use_ip_version(4):
                 continue
@@ -281,20 +756,25 @@ class IPNet(Mininet):
                         and intf.node.use_v4:
                     ips = tuple(domain.next_ipv4()
                                 for _ in range(intf.interface_width[0]))
-                    intf.setIP(ips)
-                for ip in intf.ips():
-                    self._ip_allocs[ip.with_prefixlen] = intf.node
-                    self._ip_allocs[ip.ip.compressed] = intf.node
+                    intf.setIP(ips, batch=batches.setdefault(
+                        intf.node, IPBatch(intf.node)))
 
-    def _allocate_ipv6(self):
+    def _allocate_ipv6(self, batches: Dict[Node, IPBatch]):
         log.info("*** Allocating IPv6 addresses\n")
-        self._allocate_subnets(self._unallocated_ip6base,
-                               self.broadcast_domains,
-                               domainlen='len_v6',
-                               net_key='net6',
-                               size_key='max_v6prefixlen',
-                               max_prefixlen=self.max_v6_prefixlen,
-                               allocated_subnets=self._allocated_ipv6_subnets())
+        self._allocators[6] = SubnetAllocator(
+            self._unallocated_ip6base, reserved=self._allocated_subnets())
+        if self.aggregate_by:
+            self._allocate_aggregated(6, self._allocators[6])
+            self._unallocated_ip6base[:] = self._allocators[6].free_subnets()
+        else:
+            self._allocate_subnets(self._unallocated_ip6base,
+                                   self.broadcast_domains,
+                                   domainlen='len_v6',
+                                   net_key='net6',
+                                   size_key='max_v6prefixlen',
+                                   max_prefixlen=self.max_v6_prefixlen,
+                                   allocator=self._allocators[6],
+                                   p2p_prefixlen=self._p2p_prefixlen(6))
         for domain in self.broadcast_domains:
             if not domain.use_ip_version(6):
                 continue
@@ -303,113 +783,208 @@ class IPNet(Mininet):
                         and intf.node.use_v6:
                     ips = tuple(domain.next_ipv6()
                                 for _ in range(intf.interface_width[1]))
-                    intf.setIP6(ips)
-                for ip in intf.ip6s(exclude_lls=True):
-                    self._ip_allocs[ip.with_prefixlen] = intf.node
-                    self._ip_allocs[ip.ip.compressed] = intf.node
+                    intf.setIP6(ips, batch=batches.setdefault(
+                        intf.node, IPBatch(intf.node)))
 
     @staticmethod
     def _allocate_subnets(subnets: List[Union[IPv4Network, IPv6Network]],
                           domains: List['BroadcastDomain'],
                           domainlen='len_v4', net_key='net',
                           size_key='max_v4prefixlen', max_prefixlen=24,
-                          allocated_subnets: Iterable[Union[IPv4Network,
-                                                            IPv6Network]] = ()):
+                          allocated_subnets: Union[
+                              PrefixIndex, Iterable[Union[IPv4Network,
+                                                          IPv6Network]]] = (),
+                          allocator: Optional[SubnetAllocator] = None,
+                          p2p_prefixlen: Optional[int] = None):
         """Allocate subnets to broadcast domains.
 
-        We keep the subnets sorted as x < y wrt the available number of
-        addresses in the subnet so that the bigger domains
-        take the smallest subnets before subdividing them.
-        As the domains range from the biggest to the smallest, and the subnets
-        from the smallest to the biggest, the biggest domains will take the
-        first subnet that is able to contain it, and split it in several
-        subnets until it is restricted to its prefix.
-        The next domain then is necessarily of the same size (reuses on of the
-        split subnets) or smaller (uses a previously split subnet or splits a
-        bigger one). This avoids wasting of addresses (wrt. the specified
-        max_prefixlen) at the cost of a quadratic (?) behavior.
+        The domains range from the biggest to the smallest. Each of them
+        takes the lowest of the smallest free blocks that is able to contain
+        it, and splits it in several subnets until it is restricted to its
+        prefix (see SubnetAllocator). A domain thus never splits a block if a
+        smaller one can be used, which avoids wasting addresses (wrt. the
+        specified max_prefixlen). Each allocation takes a logarithmic time in
+        the number of free blocks.
 
         :param subnets: a list of ip_network of available subnets. This list
                         will be modified to account for the new allocations.
         :param domains: a list of BroadcastDomain
         :param domainlen: The name of the method used to retrieve the length
                           of the broadcast domain (address count)
-        :param net_key: the key to use to set the allocated subnet in the
-                        broadcast domain.
+        :param net_key: the key of the allocated subnet in the broadcast
+                        domain, i.e., 'net' or 'net6'.
         :param size_key: the key to use to retrieve the maximal prefix length
                          suitable for a broadcast domain
         :param max_prefixlen: The maximal prefixlen that can be allocated,
                                 e.g. to not allocate /126 for IPv6 P2P links
         :param allocated_subnets: The subnets that are already allocated and
                                   cannot be allocated to another domain
-        :return: iterator of (domain, subnet)"""
+        :param allocator: The allocator to use instead of one built from
+                          subnets and allocated_subnets
+        :param p2p_prefixlen: The prefix length of the subnets of the
+                              point-to-point domains, if they are packed"""
         _domainlen = methodcaller(domainlen)
         domains.sort(key=_domainlen, reverse=True)
-        _prefixlen = attrgetter('prefixlen')
-        subnets.sort(key=_prefixlen, reverse=True)
         ip_version = 4 if net_key == 'net' else 6
+        if allocator is None:
+            allocator = SubnetAllocator(subnets, reserved=allocated_subnets)
         for d in domains:
             if not d.use_ip_version(ip_version):
                 continue
-            if not subnets:
-                raise ValueError('No subnet left in the prefix space for all'
+            largest = allocator.largest_prefixlen()
+            if largest is None:
+                raise ValueError('No subnet left in the prefix space for all '
                                  'broadcast domains.')
-            plen = min(max_prefixlen, getattr(d, size_key))
-            if plen < subnets[-1].prefixlen:
+            plen = IPNet._subnet_prefixlen(d, ip_version, max_prefixlen,
+                                           p2p_prefixlen, size_key)
+            if plen < largest:
                 raise ValueError('Could not find a subnet big enough for a '
                                  'broadcast domain.')
             log.debug('Allocating prefix', plen, 'for interfaces',
                       d.interfaces)
-            # Try to find a suitable subnet in the list
-            for i, net in enumerate(subnets):
-                nets = []
-                # if the subnet is too big for the prefix, perform a left
-                # expansion (only expand one at a time to keep subnets as
-                # aggregated as possible).
-                while plen > net.prefixlen:
-                    # Get list of subnets and append to list of previous
-                    # expanded subnets as it is bigger wrt. prefixlen
-                    net, next_net = tuple(net.subnets(prefixlen_diff=1))
-                    # If not a subnet of an allocated subnet
-                    if len(list(filter(lambda y: is_subnet_of(next_net, y),
-                                       allocated_subnets))) == 0:
-                        nets.append(next_net)
-                # Check if we have an appropriately-sized subnet
-                if plen == net.prefixlen:
-                    # If the network overlaps with an allocated subnet,
-                    # we pass it
-                    if len(list(filter(lambda y: is_subnet_of(net, y)
-                                                 or is_subnet_of(y, net),
-                                       allocated_subnets))) == 0:
-                        # Register the allocation
-                        setattr(d, net_key, net)
-                    # Delete the expanded/used subnet
-                    del subnets[i]
-                    # Insert the created subnets if any
-                    subnets.extend(nets)
-                    # Sort the array again
-                    subnets.sort(key=_prefixlen, reverse=True)
-                    # Proceed to the next broadcast domain
-                    break
-                # Otherwise try the next network for the current domain
+            d.set_subnet(allocator.allocate(plen))
+        subnets[:] = allocator.free_subnets()
+
+    def _allocate_aggregated(self, version: int, allocator: SubnetAllocator):
+        """Allocate the subnets of the broadcast domains of each group (see
+        aggregate_by) inside a single block, recursively. The block of a
+        group is the smallest one that can contain the subnets and blocks
+        of its members, which are allocated from the biggest to the
+        smallest.
+
+        :param version: The IP version of the subnets
+        :param allocator: The allocator of the whole prefix space"""
+        domains = sorted((d for d in self.broadcast_domains
+                          if d.use_ip_version(version)),
+                         key=methodcaller('len_v4' if version == 4
+                                          else 'len_v6'), reverse=True)
+        _, items = self._aggregate_tree(domains, version, self.aggregate_by)
+        self._allocate_tree(items, version, allocator, ())
+
+    def _aggregate_tree(self, domains: List['BroadcastDomain'], version: int,
+                        levels: Sequence[str]) \
+            -> Tuple[int, List[Tuple[int, Any]]]:
+        """Group broadcast domains by their key at the first level, then
+        group the domains of each group at the next levels
+
+        :return: The number of addresses needed by the domains, and the
+                 domains or (key, items) groups with their number of
+                 addresses"""
+        bits = 32 if version == 4 else 128
+        max_prefixlen = self.max_v4_prefixlen if version == 4 \
+            else self.max_v6_prefixlen
+        p2p_prefixlen = self._p2p_prefixlen(version)
+        items = []  # type: List[Tuple[int, Any]]
+        groups = {}  # type: Dict[Any, List[BroadcastDomain]]
+        for d in domains:
+            key = d.aggregate_key(levels[0]) if levels else None
+            if key is None:
+                plen = self._subnet_prefixlen(d, version, max_prefixlen,
+                                              p2p_prefixlen)
+                items.append((1 << (bits - plen), d))
+            else:
+                groups.setdefault(key, []).append(d)
+        for key, members in groups.items():
+            size, sub = self._aggregate_tree(members, version, levels[1:])
+            # Blocks are powers of two
+            items.append((1 << (size - 1).bit_length(), (key, sub)))
+        return sum(size for size, _ in items), items
+
+    def _allocate_tree(self, items: List[Tuple[int, Any]], version: int,
+                       allocator: SubnetAllocator, path: 'AggregatePath'):
+        """Allocate the subnets of the domains and the blocks of the groups
+        returned by _aggregate_tree
+
+        :param path: The (level, key) pairs of the enclosing groups"""
+        bits = 32 if version == 4 else 128
+        level = self.aggregate_by[len(path)] \
+            if len(path) < len(self.aggregate_by) else None
+        for size, item in sorted(items, key=itemgetter(0), reverse=True):
+            net = allocator.allocate(bits - size.bit_length() + 1)
+            if isinstance(item, BroadcastDomain):
+                log.debug('Allocating prefix', net, 'for interfaces',
+                          item.interfaces)
+                item.set_subnet(net)
+                continue
+            key, sub = item
+            group = path + ((level, key),)
+            log.debug('Allocating block', net, 'for', group)
+            self.aggregates.append((group, net))
+            self._allocate_tree(sub, version, SubnetAllocator([net]), group)
+
+    def _summarize_aggregates(self):
+        """Configure the routers to advertise the blocks of their AS with
+        BGP and the blocks of their OSPF areas with area ranges"""
+        for r in self.routers:
+            r.params.pop('bgp_aggregates', None)
+            r.params.pop('ospf_area_ranges', None)
+        for path, net in self.aggregates:
+            keys = dict(path)
+            level = path[-1][0]
+            for r in self.routers:
+                if 'as' in keys and r.asn != keys['as']:
+                    continue
+                if level == 'as':
+                    r.params.setdefault('bgp_aggregates', []).append(net)
+                elif any(i.igp_area == keys['area'] for i in r.intfList()):
+                    r.params.setdefault('ospf_area_ranges', []).append(
+                        (keys['area'], net))
+
+    def _p2p_prefixlen(self, version: int) -> Optional[int]:
+        """Return the prefix length of the point-to-point subnets of an IP
+        version, or None if they are not packed"""
+        if version == 4:
+            return 31 if self.pack_v4_p2p else None
+        return 127 if self.pack_v6_p2p else None
+
+    @staticmethod
+    def _subnet_prefixlen(domain: 'BroadcastDomain', version: int,
+                          max_prefixlen: int,
+                          p2p_prefixlen: Optional[int] = None,
+                          size_key: Optional[str] = None) -> int:
+        """Return the prefix length of the subnet to allocate to a broadcast
+        domain
+
+        :param domain: The broadcast domain
+        :param version: The IP version of the subnet
+        :param max_prefixlen: The maximal prefixlen that can be allocated
+        :param p2p_prefixlen: The prefix length of the subnets of the
+                              point-to-point domains, if they are packed
+        :param size_key: the key to use to retrieve the maximal prefix
+                         length suitable for the domain"""
+        if p2p_prefixlen is not None and domain.is_point_to_point(version):
+            return p2p_prefixlen
+        if size_key is None:
+            size_key = 'max_v4prefixlen' if version == 4 \
+                else 'max_v6prefixlen'
+        return min(max_prefixlen, getattr(domain, size_key))
 
     def _broadcast_domains(self) -> List['BroadcastDomain']:
-        """Build the broadcast domains for this topology"""
+        """Build the broadcast domains for this topology in a single pass.
+        The two interfaces of each link and all the interfaces of each
+        non-boundary node (e.g., switches or hubs) are merged in the same
+        set of a union-find."""
+        sets = UnionFind()
+        interfaces = []  # type: List[IPIntf]
+        for n in self.values():
+            itfs = realIntfList(n)
+            for intf in itfs:
+                other = otherIntf(intf)
+                if other is not None:
+                    sets.union(intf, other)
+            if BroadcastDomain.is_domain_boundary(n):
+                interfaces.extend(itfs)
+            else:
+                for intf in itfs[1:]:
+                    sets.union(itfs[0], intf)
+        interfaces.extend(r.intf('lo') for r in self.routers)
+        members = {}  # type: Dict[IPIntf, List[IPIntf]]
+        for intf in interfaces:
+            members.setdefault(sets.find(intf), []).append(intf)
         domains = []
-        interfaces = {intf: False
-                      for n in self.values()
-                      if BroadcastDomain.is_domain_boundary(n)
-                      for intf in realIntfList(n)}
-        interfaces.update({r.intf('lo'): False for r in self.routers})
-        for intf in interfaces.keys():
-            # the interface already belongs to a broadcast domain
-            if interfaces[intf]:
-                continue
-            # create a new domain and explore the interface
-            bd = BroadcastDomain(intf)
-            # Mark all explored interfaces belonging to that domain
+        for itfs in members.values():
+            bd = BroadcastDomain(itfs, explored=True)
             for i in bd:
-                interfaces[i] = True
                 i.broadcast_domain = bd
             domains.append(bd)
         return domains
@@ -553,18 +1128,33 @@ class IPNet(Mininet):
 class BroadcastDomain:
     """An IP broadcast domain in the network. This class stores the set of
     interfaces belonging to the same broadcast domain, as well as the
-    associated IP prefix if any"""
+    associated IP prefix if any.
+
+    Its sizes (address counts and maximal prefix lengths) are computed in a
+    single pass over its interfaces and cached until invalidate() is called.
+    This happens when interfaces are explored, when the addresses of one of
+    its interfaces are refreshed or when their width changes."""
 
     # The set of object that will define L3 domain boundaries
     # FIXME Where do we put middleboxes in this model ?
     BOUNDARIES = (Host, IPHost, Router)
 
-    def __init__(self, interfaces: Union[None, List[IPIntf], IPIntf] = None):
+    __slots__ = ('interfaces', 'net', 'net6', '_allocated_v4',
+                 '_allocated_v6', 'fixed_net4s', 'fixed_net6s', '_sizes')
+
+    def __init__(self, interfaces: Union[None, List[IPIntf], IPIntf] = None,
+                 explored=False):
         """Initialize the broadcast domain and optionally explore a set of
         interfaces
 
-        :param interfaces: one Intf or a list of Intf"""
+        :param interfaces: one Intf or a list of Intf
+        :param explored: whether the interfaces are already all the
+                         interfaces of the domain and do not need to be
+                         explored"""
         self.interfaces = set()  # type: Set[IPIntf]
+        # len_v4, len_v6, max_v4prefixlen, max_v6prefixlen and whether
+        # IPv4 and IPv6 are used
+        self._sizes = None  # type: Optional[Tuple]
         self.net = None  # type: Optional[IPv4Network]
         self._allocated_v4 = 1  # We need to skip subnet address
         self.net6 = None  # type: Optional[IPv6Network]
@@ -574,20 +1164,20 @@ class BroadcastDomain:
         if interfaces:
             if not isinstance(interfaces, list):
                 interfaces = [interfaces]
-            self.explore(interfaces)
+            if explored:
+                self.interfaces.update(interfaces)
+                self.invalidate()
+            else:
+                self.explore(interfaces)
 
         # Retrieve pre-fixed subnets
-        self.fixed_net4s = []  # type: List[IPv4Network]
-        self.fixed_net6s = []  # type: List[IPv6Network]
+        self.fixed_net4s = PrefixIndex()
+        self.fixed_net6s = PrefixIndex()
         for i in self.interfaces:
-            for ip in i.ips():
-                net = ip_interface(ip).network
-                if net not in self.fixed_net4s:
-                    self.fixed_net4s.append(net)
-            for ip6 in i.ip6s(exclude_lls=True):
-                net6 = ip_interface(ip6).network
-                if net6 not in self.fixed_net6s:
-                    self.fixed_net6s.append(net6)
+            self.fixed_net4s.update(ip_interface(ip).network
+                                    for ip in i.ips())
+            self.fixed_net6s.update(ip_interface(ip6).network
+                                    for ip6 in i.ip6s(exclude_lls=True))
 
     @staticmethod
     def is_domain_boundary(node: Node):
@@ -600,29 +1190,60 @@ class BroadcastDomain:
         """Iterates over all interfaces in this broadcast domain"""
         return iter(self.interfaces)
 
+    def invalidate(self):
+        """Forget the cached sizes of the domain"""
+        self._sizes = None
+
+    def _get_sizes(self) -> Tuple[int, int, int, int, bool, bool]:
+        """Return the cached sizes, computing them if needed"""
+        if self._sizes is not None:
+            return self._sizes
+        len_v4 = len_v6 = width_v4 = width_v6 = 0
+        use_v4 = use_v6 = False
+        for x in self.interfaces:
+            w4, w6 = x.interface_width
+            if next(x.ips(), None) is not None:
+                len_v4 += w4
+            if next(x.ip6s(exclude_lls=True), None) is not None:
+                len_v6 += w6
+            if x.node.use_v4:
+                use_v4 = True
+                # The IPv4 prefix is sized on the IPv6 width
+                width_v4 += w6
+            if x.node.use_v6:
+                use_v6 = True
+                width_v6 += w6
+        self._sizes = (len_v4, len_v6,
+                       # IPv4 reserves 2 addresses for broadcast/subnet
+                       # addresses
+                       32 - math.ceil(math.log(2 + width_v4, 2)),
+                       # IPv6 should use whole subnet space for addressing
+                       # But see FIXME in constructor
+                       128 - math.ceil(math.log(1 + width_v6, 2)),
+                       use_v4, use_v6)
+        return self._sizes
+
     def len_v4(self) -> int:
         """The number of IPv4 addresses in this broadcast domain"""
-        return sum(map(lambda x: x.interface_width[0]
-                       if len(list(x.ips())) > 0 else 0, self.interfaces))
+        return self._get_sizes()[0]
 
     def len_v6(self) -> int:
         """The number of IPv6 addresses in this broadcast domain"""
-        return sum(map(lambda x: x.interface_width[1]
-                       if len(list(x.ip6s(exclude_lls=True))) > 0 else 0,
-                       self.interfaces))
+        return self._get_sizes()[1]
 
     def explore(self, itfs: List[IPIntf]):
         """Explore a new list of interfaces and add them and their neighbors
         to this broadcast domain
 
         :param itfs: a list of Intf"""
-        visited = []  # type: List[IPIntf]
+        self.invalidate()
+        visited = set()  # type: Set[IPIntf]
         while itfs:
             # Explore one element
             i = itfs.pop()
             if i in visited:
                 continue
-            visited.append(i)
+            visited.add(i)
             if self.is_domain_boundary(i.node):
                 self.interfaces.add(i)
             # check its corresponding interface
@@ -640,27 +1261,58 @@ class BroadcastDomain:
     @property
     def max_v4prefixlen(self) -> int:
         """Return the maximal IPv4 prefix suitable for this domain"""
-        # IPv4 reserves 2 addresses for broadcast/subnet addresses
-        return 32 \
-               - math.ceil(math.log(2 + sum(map(lambda x: x.interface_width[1]
-                                                if x.node.use_v4 else 0,
-                                                self.interfaces)), 2))
+        return self._get_sizes()[2]
 
     @property
     def max_v6prefixlen(self) -> int:
         """Return the maximal IPv6 prefix suitable for this domain"""
-        # IPv6 should use whole subnet space for addressing
-        # But see FIXME in constructor
-        return 128 \
-               - math.ceil(math.log(1 + sum(map(lambda x: x.interface_width[1]
-                                                if x.node.use_v6 else 0,
-                                                self.interfaces)), 2))
+        return self._get_sizes()[3]
 
     @property
     def routers(self) -> List[IPIntf]:
         """List all interfaces in this domain belonging to a L3 router"""
         return [i for i in self.interfaces if L3Router.is_l3router_intf(i)]
 
+    def is_point_to_point(self, ip_version: int) -> bool:
+        """Check whether this domain links two router interfaces that each
+        need a single address of an IP version, and can therefore use a /31
+        or a /127 subnet
+
+        :param ip_version: either 4 or 6"""
+        if len(self.interfaces) != 2:
+            return False
+        i = 0 if ip_version == 4 else 1
+        return all(L3Router.is_l3router_intf(itf)
+                   and itf.interface_width[i] == 1
+                   and (itf.node.use_v4 if ip_version == 4
+                        else itf.node.use_v6)
+                   for itf in self.interfaces)
+
+    def aggregate_key(self, level: str) -> Any:
+        """Return the AS number ('as') or the OSPF area ('area') shared by
+        the router interfaces of this domain, or None if they have none or
+        several
+
+        :param level: 'as' or 'area'"""
+        keys = {itf.node.asn if level == 'as' else itf.igp_area
+                for itf in self.routers}
+        return keys.pop() if len(keys) == 1 else None
+
+    def set_subnet(self, net: Union[IPv4Network, IPv6Network]):
+        """Set the subnet of this domain, whose addresses are then allocated
+        from the first usable one
+
+        :param net: The IPv4 or IPv6 subnet"""
+        if net.version == 4:
+            self.net = net
+            # RFC 3021: a /31 has neither subnet nor broadcast address
+            self._allocated_v4 = 0 if net.prefixlen == 31 else 1
+        else:
+            self.net6 = net
+            # RFC 6164: the subnet-router anycast address of a /127 is not
+            # used, Linux does not add it
+            self._allocated_v6 = 0 if net.prefixlen == 127 else 1
+
     def next_ipv4(self) -> IPv4Interface:
         """Allocate and return the next available IPv4 address in this
         domain
@@ -696,8 +1348,6 @@ class BroadcastDomain:
         :return: True iif there is more than one interface on the domain
                  enabling this IP version
         """
-        for i in self.interfaces:
-            if i.node.use_v4 and ip_version == 4 \
-                    or i.node.use_v6 and ip_version == 6:
-                return True
-        return False
+        sizes = self._get_sizes()
+        return sizes[4] if ip_version == 4 else \
+            sizes[5] if ip_version == 6 else False
@@ -1,14 +1,19 @@
 """Classes for interfaces and links that are IP-agnostic. This basically
 enhance the TCIntf class from Mininet, and then define sane defaults for the link
 classes."""
-from itertools import chain
+import json
+import re
 import subprocess
 from ipaddress import ip_interface, IPv4Interface, IPv6Interface
 import functools
-from typing import Union, Tuple, Optional, Generator, Sequence, List, Type
+from typing import Union, Tuple, Optional, Generator, Sequence, List, Type, \
+    Dict, Set, TYPE_CHECKING
 
 from . import OSPF_DEFAULT_AREA, MIN_IGP_METRIC
-from .utils import otherIntf, is_container
+from .allocator import IPNetwork, PrefixTrie
+from .utils import otherIntf, is_container, InputRecorder
+if TYPE_CHECKING:
+    from .ipnet import BroadcastDomain
 
 import mininet.link as _m
 from mininet.log import lg as log
@@ -22,13 +27,44 @@ class IPIntf(_m.TCIntf):
     def __init__(self, *args, **kwargs):
         # Only one IP broadcast domain per interface, VLANs are supported
         # by aliasing interfaces.
-        self.broadcast_domain = None
+        self._broadcast_domain = None  # type: Optional[BroadcastDomain]
         self.addresses = {4: [], 6: []}
         self.ra_prefixes = kwargs.pop('ra', [])
         self.rdnss_list = kwargs.pop('rdnss', [])
+        # The address generation of the node when self.addresses was read
+        self._addresses_generation = None  # type: Optional[int]
+        # The index kept up to date with the addresses of the interface
+        self.ip_index = None  # type: Optional[AddressIndex]
         super().__init__(*args, **kwargs)
-        self.isUp(setUp=True)
-        self._refresh_addresses()
+        self._setup()
+
+    def _setup(self):
+        """Set the interface up and discover its addresses, or let the
+        active DeferredIntfInit do it"""
+        if DeferredIntfInit.active is not None and self.node is not None:
+            DeferredIntfInit.active.register(self)
+        else:
+            self.isUp(setUp=True)
+            self._refresh_addresses()
+
+    @property
+    def broadcast_domain(self) -> Optional['BroadcastDomain']:
+        """Return the broadcast domain of this interface, recording its
+        interfaces in the active InputRecorder if any"""
+        if InputRecorder.active() is not None:
+            InputRecorder.record(self, 'broadcast_domain',
+                                 self._domain_interfaces(),
+                                 self._domain_interfaces)
+        return self._broadcast_domain
+
+    @broadcast_domain.setter
+    def broadcast_domain(self, domain: Optional['BroadcastDomain']):
+        self._broadcast_domain = domain
+
+    def _domain_interfaces(self) -> Optional[Set['IPIntf']]:
+        """Return the interfaces of the broadcast domain of this interface"""
+        domain = self._broadcast_domain
+        return None if domain is None else set(domain.interfaces)
 
     @property
     def igp_area(self) -> str:
@@ -52,14 +88,44 @@ class IPIntf(_m.TCIntf):
         interface, per address family"""
         return self.get('v4_width', 1), self.get('v6_width', 1)
 
+    @interface_width.setter
+    def interface_width(self, width: Tuple[int, int]):
+        self.params['v4_width'], self.params['v6_width'] = width
+        self._invalidate_domain()
+
+    def _invalidate_domain(self):
+        """Make the broadcast domain recompute its sizes"""
+        if self._broadcast_domain is not None:
+            self._broadcast_domain.invalidate()
+
+    def _addresses_updated(self):
+        """Propagate a refresh of self.addresses"""
+        self._invalidate_domain()
+        if self.ip_index is not None:
+            self.ip_index.update(self)
+
     def get(self, key, val):
         """Check for a given key in the interface parameters"""
-        return self.params.get(key, val)
+        value = self.params.get(key, val)
+        if InputRecorder.active() is not None:
+            InputRecorder.record(self, ('params', key), value,
+                                 lambda: self.params.get(key, val))
+        return value
+
+    def _addresses(self, version: int) \
+            -> List[Union[IPv4Interface, IPv6Interface]]:
+        """Return the addresses of a given IP version, recording them in the
+        active InputRecorder if any"""
+        addresses = self.addresses[version]
+        if InputRecorder.active() is not None:
+            InputRecorder.record(self, ('addresses', version), addresses,
+                                 lambda: self.addresses[version])
+        return addresses
 
     def __default(self, version: int) -> Union[IPv4Interface, IPv6Interface]:
         """Return the default addresses for a given IP version
         :raise IndexError:"""
-        return self.addresses[version][0]
+        return self._addresses(version)[0]
 
     def _ip(self, version: int) -> Optional[str]:
         """Return the main IP of the given version for this interface"""
@@ -90,7 +156,7 @@ class IPIntf(_m.TCIntf):
 
         :param exclude_lbs: Whether Loopback addresses should be included or not
         """
-        for i in self.addresses[4]:
+        for i in self._addresses(4):
             if not exclude_lbs or not i.is_loopback:
                 yield i
 
@@ -120,7 +186,7 @@ class IPIntf(_m.TCIntf):
         :param exclude_lls: Whether Link-locals should be included or not
         :param exclude_lbs: Whether Loopback addresses should be included or not
         """
-        for i in self.addresses[6]:
+        for i in self._addresses(6):
             if (not exclude_lls or not i.is_link_local) \
                     and (not exclude_lbs or not i.is_loopback):
                 yield i
@@ -135,10 +201,34 @@ class IPIntf(_m.TCIntf):
         if self.ip6 is not None:
             self.setIP6(self.ip6, prefixLen=prefixLen)
 
+    @staticmethod
+    def _parse_ips(ip: Union[str, IPv4Interface, IPv6Interface,
+                             Sequence[Union[str, IPv4Interface,
+                                            IPv6Interface]]],
+                   prefixLen: Optional[int] = None) \
+            -> List[Union[IPv4Interface, IPv6Interface]]:
+        """Return the addresses given to _set_ip as ip_interface objects"""
+        # We want to iterate over the new ip sets
+        if not is_container(ip):
+            ip = (ip,)
+        addrs = []  # type: List[Union[IPv4Interface, IPv6Interface]]
+        for addr in ip:
+            # Make sure we have ip_interface-like objects
+            if isinstance(addr, str):
+                if '/' not in addr and prefixLen is not None:
+                    # And use the default prefix if absent
+                    addr = ip_interface('%s/%s' % (addr, prefixLen))
+                else:
+                    # no prefixLen defaults to full /128 or /32
+                    addr = ip_interface(str(addr))
+            addrs.append(addr)
+        return addrs
+
     def _set_ip(self, ip: Union[str, IPv4Interface, IPv6Interface,
                                 Sequence[Union[str, IPv4Interface,
                                                IPv6Interface]]],
-                prefixLen: Optional[int] = None) -> Union[None, List[str], str]:
+                prefixLen: Optional[int] = None,
+                batch: Optional['IPBatch'] = None) -> Optional[str]:
         """Set one or more IP addresses, possibly from different families.
         This will remove previously set addresses of the affected families.
 
@@ -146,30 +236,19 @@ class IPIntf(_m.TCIntf):
                     or an ip_interface like, or a sequence of both
         :param prefixLen: the prefix length to use for all cases where
                           the addresses is given as a string without a given
-                          prefix."""
+                          prefix.
+        :param batch: the IPBatch of the node in which the commands are
+                      added. If None, the commands are run immediately.
+        :return: the output of the commands if they were run"""
         if not ip:
             return None
         setv4 = setv6 = False
         lb_v4_update = lb_v6_update = False
-        # Make sure we have an up-to-date view of our addresses
-        self._refresh_addresses()
         cmds = []
-        # We want to iterate over the new ip sets
-        if not is_container(ip):
-            ip = (ip,)
-        for addr in ip:
-            # Make sure we have ip_interface-like objects
-            if isinstance(addr, str):
-                if '/' not in addr and prefixLen is not None:
-                    # And use the default prefix if absent
-                    addr = ip_interface('%s/%s' % (addr, prefixLen))
-                else:
-                    # no prefixLen defaults to full /128 or /32
-                    addr = ip_interface(str(addr))
-
+        for addr in self._parse_ips(ip, prefixLen):
             # Prepare assignment commands
-            cmds.append('ip address add dev %s %s'
-                        % (self.name, addr.with_prefixlen))
+            cmds.append(('address', 'add', 'dev', self.name,
+                         addr.with_prefixlen))
             # Record assignment family
             if addr.version == 4:
                 setv4 = True
@@ -177,33 +256,64 @@ class IPIntf(_m.TCIntf):
             elif addr.version == 6:
                 setv6 = True
                 lb_v6_update = addr.is_loopback or lb_v6_update
-        # Clean-up old addresses
-        cleanup = []   # type: List
+        run = batch is None
+        if run:
+            batch = IPBatch(self.node)
+        # Clean-up old addresses, as seen by the kernel at the time of the
+        # batch execution: link-locals are kept, as well as loopback
+        # addresses unless new ones are set
+        flush = []  # type: List[Tuple[str, str]]
         if setv4:
-            cleanup.append(self.ips(exclude_lbs=not lb_v4_update))
+            flush.append(('0.0.0.0/0', 'global'))
+            flush.append(('0.0.0.0/0', 'link'))
+            if lb_v4_update:
+                flush.append(('0.0.0.0/0', 'host'))
         if setv6:
-            cleanup.append(self.ip6s(exclude_lls=True,
-                                     exclude_lbs=not lb_v6_update))
-        for old_ip in chain.from_iterable(cleanup):
-            self._del_ip(old_ip)
+            flush.append(('::/0', 'global'))
+            if lb_v6_update:
+                flush.append(('::/0', 'host'))
+        for prefix, scope in flush:
+            batch.add('address', 'flush', 'dev', self.name, 'to', prefix,
+                      'scope', scope)
         # Assign IP
-        rval = [self.cmd(cmd) for cmd in cmds]
-        self._refresh_addresses()
-        return rval.pop() if rval and len(rval) == 1 else rval
+        for cmd in cmds:
+            batch.add(*cmd)
+        batch.refresh(self)
+        return batch.run() if run else None
 
-    def _del_ip(self, ip: Union[IPv4Interface, IPv6Interface]):
+    def _del_ip(self, ip: Union[IPv4Interface, IPv6Interface],
+                batch: Optional['IPBatch'] = None):
         """Remove an assigned IP fom this interface.
         Does not update self.addresses!
 
-        :param ip: ip_interface-like"""
+        :param ip: ip_interface-like
+        :param batch: the IPBatch of the node in which the command is added.
+                      If None, the command is run immediately."""
+        if batch is not None:
+            batch.add('address', 'del', 'dev', self.name, ip.with_prefixlen)
+            return
         self.cmd('ip', 'address', 'del', 'dev', self.name, ip.with_prefixlen)
+        self.invalidate()
 
     setIP = setIP6 = _set_ip
 
+    def invalidate(self):
+        """Mark the cached addresses of all the interfaces of the node as
+        outdated, e.g., after changing them outside of IPIntf"""
+        invalidate_addresses(self.node)
+
+    @property
+    def addresses_outdated(self) -> bool:
+        """Whether the addresses of the node changed since self.addresses
+        was last refreshed"""
+        return self._addresses_generation != addresses_generation(self.node)
+
     def _refresh_addresses(self):
         """Request and parse the addresses of this interface"""
+        self._addresses_generation = addresses_generation(self.node)
         self.mac, self.addresses[4], self.addresses[6] = \
             _addresses_of(self.name, self.node)
+        self._addresses_updated()
 
     def updateIP(self) -> Optional[str]:
         self._refresh_addresses()
@@ -222,25 +332,309 @@ class IPIntf(_m.TCIntf):
         return self.ip, self.mac
 
 
-def _addresses_of(devname: str, node: Optional[Node] = None):
-    """Return the addresses of a named interface"""
-    cmdline = ['ip', 'address', 'show', 'dev', devname]
+class IPBatch:
+    """A batch of ip(8) commands for a node. They are all run in the
+    namespace of the node through a single `ip -batch` invocation, after
+    which the addresses of the affected interfaces are refreshed once."""
+
+    def __init__(self, node: Node):
+        """:param node: The node in which the commands are run"""
+        self.node = node
+        self.commands = []  # type: List[str]
+        self._refresh = []  # type: List[IPIntf]
+        # The exit status of ip and the indexes of the commands that failed,
+        # for the last run of the batch
+        self.returncode = 0
+        self.failed = set()  # type: Set[int]
+
+    def add(self, *args: str):
+        """Add a command, without the leading 'ip'
+
+        :param args: the command + arguments, e.g., 'address', 'add', ..."""
+        self.commands.append(' '.join(args))
+
+    def refresh(self, intf: IPIntf):
+        """Refresh the addresses of an interface once the batch is run.
+        If several interfaces must be refreshed, the addresses of all the
+        interfaces of the node are refreshed at once."""
+        if intf not in self._refresh:
+            self._refresh.append(intf)
+
+    def run(self) -> str:
+        """Run the commands of the batch and clear it. Its exit status and
+        the indexes of the failed commands are then in self.returncode and
+        self.failed.
+
+        :return: the output of the commands"""
+        out = ''
+        self.returncode = 0
+        self.failed = set()
+        if self.commands:
+            batch = '\n'.join(self.commands) + '\n'
+            # Keep going if a command fails
+            p = self.node.popen(['ip', '-force', '-batch', '-'],
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+            out = p.communicate(batch.encode())[0].decode(errors='replace')
+            self.returncode = p.returncode
+            # Command failed -:3
+            self.failed = {int(m) - 1 for m in
+                           re.findall(r'^Command failed -:(\d+)$', out,
+                                      re.MULTILINE)}
+            if p.returncode:
+                log.error('Some ip commands failed on %s:\n%s\n'
+                          % (self.node.name, out))
+            invalidate_addresses(self.node)
+        if len(self._refresh) > 1:
+            refresh_addresses(self.node)
+        elif self._refresh:
+            self._refresh[0]._refresh_addresses()
+        self.commands = []
+        self._refresh = []
+        return out
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __enter__(self) -> 'IPBatch':
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.run()
+
+
+class DeferredIntfInit:
+    """Defer the link-up and the address discovery of the IPIntf created
+    while this context is active. When leaving it, all the interfaces of a
+    node are set up through a single IPBatch and their addresses are
+    discovered in a single dump."""
+
+    # The context in which IPIntf are currently registered, if any
+    active = None  # type: Optional[DeferredIntfInit]
+
+    def __init__(self):
+        self.intfs = {}  # type: Dict[Node, List[IPIntf]]
+        self._outer = None  # type: Optional[DeferredIntfInit]
+
+    def register(self, intf: IPIntf):
+        """Initialize an interface when leaving the context"""
+        self.intfs.setdefault(intf.node, []).append(intf)
+
+    def run(self):
+        """Set up and refresh the addresses of the registered interfaces"""
+        for node, intfs in self.intfs.items():
+            batch = IPBatch(node)
+            for intf in intfs:
+                batch.add('link', 'set', 'dev', intf.name, 'up')
+                batch.refresh(intf)
+            batch.run()
+        self.intfs = {}
+
+    def __enter__(self) -> 'DeferredIntfInit':
+        self._outer = DeferredIntfInit.active
+        DeferredIntfInit.active = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        DeferredIntfInit.active = self._outer
+        if exc_type is None:
+            self.run()
+
+
+# Whether `ip -j` is supported
+_ip_json = True
+
+# The mac address and the sorted IPv4 and IPv6 addresses of an interface
+InterfaceAddresses = Tuple[Optional[str], List[IPv4Interface],
+                           List[IPv6Interface]]
+
+
+class AddressIndex:
+    """An index of the addresses of the interfaces of a network, in a
+    PrefixTrie. Every address is mapped to the interfaces owning it and
+    every subnet of these addresses to the interfaces having an address in
+    it. The interfaces added to the index update it whenever their addresses
+    are refreshed."""
+
+    def __init__(self):
+        # The interfaces of each indexed prefix
+        self._trie = PrefixTrie()
+        # The addresses under which each interface is indexed
+        self._indexed = {}  # type: Dict[IPIntf, List[IPNetwork]]
+
+    def add(self, intf: IPIntf):
+        """Index the addresses of an interface and follow their changes"""
+        intf.ip_index = self
+        self.update(intf)
+
+    def remove(self, intf: IPIntf):
+        """Forget the addresses of an interface"""
+        if intf.ip_index is self:
+            intf.ip_index = None
+        self._index(intf, [])
+
+    def update(self, intf: IPIntf):
+        """Index the current addresses of an interface"""
+        prefixes = []  # type: List[IPNetwork]
+        # Link-local addresses are indexed since traceroute can return them
+        for ip in list(intf.ips()) + list(intf.ip6s()):
+            prefixes.append(ip.network)
+            prefixes.append(ip_interface(ip.ip).network)
+        self._index(intf, prefixes)
+
+    def _index(self, intf: IPIntf, prefixes: List[IPNetwork]):
+        old = self._indexed.pop(intf, [])
+        if prefixes:
+            self._indexed[intf] = prefixes
+        if old == prefixes:
+            return
+        for prefix in old:
+            intfs = self._trie.get(prefix)
+            if intfs is not None:
+                intfs.discard(intf)
+                if not intfs:
+                    del self._trie[prefix]
+        for prefix in prefixes:
+            self._trie.setdefault(prefix, set()).add(intf)
+
+    def owners(self, address) -> List[IPIntf]:
+        """Return the interfaces owning an address, sorted by name
+
+        :param address: An IP address, its prefix length is ignored"""
+        match = self._trie.longest_match(address)
+        if match is None or match[0].prefixlen != match[0].max_prefixlen:
+            return []
+        return sorted(match[1], key=lambda i: i.name)
+
+    def subnet(self, address) -> Optional[Tuple[IPNetwork, List[IPIntf]]]:
+        """Return the longest subnet of the index that contains an address,
+        and the interfaces having an address in it, sorted by name
+
+        :param address: An IP address, its prefix length is ignored"""
+        for net, intfs in self._trie.matches(address):
+            if net.prefixlen != net.max_prefixlen:
+                return net, sorted(intfs, key=lambda i: i.name)
+        return None
+
+
+def _ip_address_show(node: Optional[Node], devname: Optional[str] = None,
+                     use_json=False) -> Optional[str]:
+    """Run `ip address show`, in the namespace of the node if any"""
+    cmdline = ['ip', '-j'] if use_json else ['ip']
+    cmdline.extend(('address', 'show'))
+    if devname is not None:
+        cmdline.extend(('dev', devname))
     try:
         if node is not None:
-            addrstr = node.cmd(*cmdline)
-        else:
-            addrstr = subprocess.check_output(cmdline).decode("utf-8")
+            return node.cmd(*cmdline)
+        return subprocess.check_output(cmdline).decode("utf-8")
     except (OSError, subprocess.CalledProcessError):
-        addrstr = None
-    if not addrstr:
+        return None
+
+
+def addresses_by_interface(node: Optional[Node] = None,
+                           devname: Optional[str] = None) \
+        -> Dict[str, InterfaceAddresses]:
+    """Return the addresses of all the interfaces of a node in a single dump
+
+    :param node: The node, or None for the root namespace
+    :param devname: Only dump the addresses of this interface
+    :return: The addresses of each interface, by interface name"""
+    global _ip_json
+    if _ip_json:
+        out = _ip_address_show(node, devname, use_json=True) or ''
+        try:
+            return _parse_json_addresses(out)
+        except ValueError:
+            if 'Option "-j"' not in out:
+                return {}  # e.g., an unknown interface
+            # This version of ip does not support JSON output
+            _ip_json = False
+    out = _ip_address_show(node, devname)
+    if not out:
         log.warning('Failed to run ip address!')
-        return None, (), ()
-    mac, v4, v6 = _parse_addresses(addrstr)
+        return {}
+    dump = {}
+    name = None
+    block = []  # type: List[str]
+    # 2: eth0@if3: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 ...
+    for line in out.strip(' \n\t\r').split('\n'):
+        if line[:1].isdigit():
+            if name is not None:
+                dump[name] = _sorted_addresses(*_parse_addresses(
+                    '\n'.join(block)))
+            name = line.split(':')[1].strip().split('@')[0]
+            block = []
+        block.append(line)
+    if name is not None:
+        dump[name] = _sorted_addresses(*_parse_addresses('\n'.join(block)))
+    if devname is not None:
+        return {devname: dump[devname]} if devname in dump else {}
+    return dump
+
+
+def _parse_json_addresses(out: str) -> Dict[str, InterfaceAddresses]:
+    """Parse the output of `ip -j address show`
+
+    :raise ValueError: if the output is not valid"""
+    dump = {}
+    for itf in json.loads(out):
+        v4 = []
+        v6 = []
+        for addr in itf.get('addr_info', ()):
+            if 'local' not in addr:
+                continue
+            family = addr.get('family')
+            if family == 'inet':
+                v4.append(IPv4Interface('%s/%s' % (addr['local'],
+                                                   addr['prefixlen'])))
+            elif family == 'inet6':
+                v6.append(IPv6Interface('%s/%s' % (addr['local'],
+                                                   addr['prefixlen'])))
+        dump[itf['ifname']] = _sorted_addresses(itf.get('address'), v4, v6)
+    return dump
+
+
+def _sorted_addresses(mac: Optional[str], v4: List[IPv4Interface],
+                      v6: List[IPv6Interface]) -> InterfaceAddresses:
     return (mac,
             sorted(v4, key=OrderedAddress, reverse=True),
             sorted(v6, key=OrderedAddress, reverse=True))
 
 
+def addresses_generation(node: Optional[Node]) -> int:
+    """Return the generation of the addresses of a node, i.e., a counter
+    increased every time they are changed through IPIntf"""
+    return getattr(node, '_addresses_generation', 0)
+
+
+def invalidate_addresses(node: Optional[Node]):
+    """Bump the generation of the addresses of a node, so that the addresses
+    cached by its interfaces are refreshed on their next use"""
+    if node is not None:
+        node._addresses_generation = addresses_generation(node) + 1
+
+
+def refresh_addresses(node: Node):
+    """Refresh the addresses of all the IPIntf of a node in a single dump"""
+    generation = addresses_generation(node)
+    dump = addresses_by_interface(node)
+    for intf in node.intfList():
+        if isinstance(intf, IPIntf):
+            intf._addresses_generation = generation
+            intf.mac, intf.addresses[4], intf.addresses[6] = \
+                dump.get(intf.name, (None, [], []))
+            intf._addresses_updated()
+
+
+def _addresses_of(devname: str, node: Optional[Node] = None) \
+        -> InterfaceAddresses:
+    """Return the addresses of a named interface"""
+    return addresses_by_interface(node, devname).get(devname, (None, [], []))
+
+
 def _parse_addresses(out: str) -> Tuple[Optional[str], List[IPv4Interface],
                                         List[IPv6Interface]]:
     """Parse the output of an ip address command
@@ -271,11 +665,68 @@ def _parse_addresses(out: str) -> Tuple[Optional[str], List[IPv4Interface],
 
 class IPLink(_m.Link):
     """A Link class that defaults to IPIntf"""
+
+    # The names of the veth pairs that were already created by
+    # make_veth_pairs() and that are waiting for their IPLink
+    _created_pairs = set()  # type: Set[Tuple[str, str]]
+
     def __init__(self, node1: str, node2: str, intf: Type[IPIntf] = IPIntf,
                  *args, **kwargs):
         """We override Link intf default to use IPIntf"""
         super().__init__(node1=node1, node2=node2, intf=intf, *args, **kwargs)
 
+    @classmethod
+    def makeIntfPair(cls, intfname1: str, intfname2: str, *args, **kwargs):
+        """Create the veth pair unless it was already created in bulk"""
+        try:
+            IPLink._created_pairs.remove((intfname1, intfname2))
+        except KeyError:
+            return super().makeIntfPair(intfname1, intfname2, *args,
+                                        **kwargs)
+        return None
+
+
+# A veth pair to create, i.e., the node, interface name and mac address of
+# both of its ends
+VethPair = Tuple[Node, str, str, Node, str, str]
+
+
+def make_veth_pairs(pairs: Sequence[VethPair]):
+    """Create veth pairs directly in the namespaces of their nodes and with
+    their final names, through a single `ip -batch` invocation per
+    namespace. The IPLink objects of these pairs then skip their creation.
+
+    :raise RuntimeError: if a batch fails, after removing the pairs that it
+                         created"""
+    by_node = {}  # type: Dict[Node, List[VethPair]]
+    for pair in pairs:
+        by_node.setdefault(pair[0], []).append(pair)
+    for node1, node_pairs in by_node.items():
+        batch = IPBatch(node1)
+        for _, intf1, addr1, node2, intf2, addr2 in node_pairs:
+            batch.add('link', 'add', 'name', intf1, 'address', addr1,
+                      'type', 'veth', 'peer', 'name', intf2,
+                      'address', addr2, 'netns', str(node2.pid))
+        out = batch.run()
+        if batch.returncode:
+            # The pairs whose command failed were not created, e.g., since
+            # an interface with the same name already exists
+            failed = batch.failed
+            for i, (_, intf1, _, _, _, _) in enumerate(node_pairs):
+                if i not in failed:
+                    batch.add('link', 'del', 'dev', intf1)
+            batch.run()
+            raise RuntimeError('Error creating the veth pairs of %s: %s'
+                               % (node1.name, out))
+        IPLink._created_pairs.update((intf1, intf2)
+                                     for _, intf1, _, _, intf2, _
+                                     in node_pairs)
+
+
+def clear_veth_pairs():
+    """Forget the veth pairs created in bulk but never used by an IPLink"""
+    IPLink._created_pairs.clear()
+
 
 # This aliases is there for a historical reason: IPIntf used to extend
 # mininet's Intf and not the mininet's TCIntf
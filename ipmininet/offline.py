@@ -0,0 +1,238 @@
+"""This module builds an IPNet without any network namespace, veth pair or
+daemon, e.g., on an unprivileged machine. The broadcast domains, the
+addresses, the router ids and the configuration files of the daemons are
+computed exactly as in an emulated network, but the nodes and their
+interfaces only exist in memory.
+
+    net = OfflineNet(topo=MyTopo(), cwd='/tmp/configs')
+    files = net.render()"""
+import time
+from ipaddress import IPv6Interface
+from typing import Dict, List, Optional, Tuple
+
+from mininet.log import lg as log
+from mininet.net import Mininet
+
+from .ipnet import IPNet
+from .link import IPIntf, OrderedAddress
+from .render import ConfigRenderer
+
+
+class OfflineIntf:
+    """An IPIntf whose addresses are only kept in memory. This mixin must
+    come before the interface class in the bases."""
+
+    def _setup(self):
+        if self.name == 'lo':
+            self._set_ip(['127.0.0.1/8', '::1/128'])
+        elif self.mac is not None:
+            # The link-local address that the kernel would generate
+            self._set_ip(link_local(self.mac))
+
+    def isUp(self, setUp=False) -> bool:
+        return True
+
+    @property
+    def addresses_outdated(self) -> bool:
+        return False
+
+    def _refresh_addresses(self):
+        pass
+
+    def _set_ip(self, ip, prefixLen: Optional[int] = None,
+                batch=None) -> Optional[str]:
+        """Replace the addresses of the affected families, keeping the
+        link-locals and the loopback addresses unless new ones are set,
+        as IPIntf._set_ip does."""
+        if not ip:
+            return None
+        new = self._parse_ips(ip, prefixLen)
+        for version in (4, 6):
+            addrs = [a for a in new if a.version == version]
+            if not addrs:
+                continue
+            keep_lbs = not any(a.is_loopback for a in addrs)
+            kept = [a for a in self.addresses[version]
+                    if (keep_lbs and a.is_loopback)
+                    or (version == 6 and a.is_link_local)]
+            self.addresses[version] = sorted(
+                dict.fromkeys(kept + addrs), key=OrderedAddress,
+                reverse=True)
+        self._addresses_updated()
+        return None
+
+    def _del_ip(self, ip, batch=None):
+        try:
+            self.addresses[ip.version].remove(ip)
+        except ValueError:
+            return
+        self._addresses_updated()
+
+    setIP = setIP6 = _set_ip
+
+
+class OfflineNode:
+    """A node without shell nor namespace. Commands do nothing and
+    processes cannot be started. This mixin must come before the node class
+    in the bases."""
+
+    OFFLINE = True
+
+    @classmethod
+    def checkSetup(cls):
+        pass
+
+    def startShell(self, *args, **kwargs):
+        pass
+
+    def mountPrivateDirs(self):
+        pass
+
+    def unmountPrivateDirs(self):
+        pass
+
+    def addIntf(self, intf, port=None, moveIntfFn=None):
+        super().addIntf(intf, port=port, moveIntfFn=lambda *args: None)
+
+    def cmd(self, *args, **kwargs) -> str:
+        return ''
+
+    def popen(self, *args, **kwargs):
+        raise RuntimeError('Cannot start %s on the offline node %s'
+                           % (' '.join(str(a) for a in args), self.name))
+
+    def terminate(self):
+        """Keep the configuration files"""
+
+
+class OfflineLink:
+    """A link whose veth pair is never created. This mixin must come
+    before the link class in the bases."""
+
+    @classmethod
+    def makeIntfPair(cls, *args, **kwargs):
+        return None
+
+
+# The offline classes already created, by base class and mixin
+_offline_classes = {}  # type: Dict[Tuple[type, type], type]
+
+
+def offline_class(cls: type, mixin: type) -> type:
+    """Return a subclass of cls extended with the offline mixin
+
+    :param cls: The class of the node, link or interface
+    :param mixin: OfflineNode, OfflineLink or OfflineIntf"""
+    if issubclass(cls, mixin):
+        return cls
+    try:
+        return _offline_classes[cls, mixin]
+    except KeyError:
+        pass
+    attrs = {}
+    lo = getattr(cls, 'LOOPBACK_INTF', None)
+    if lo is not None:
+        attrs['LOOPBACK_INTF'] = offline_class(lo, OfflineIntf)
+    new = type('Offline%s' % cls.__name__, (mixin, cls), attrs)
+    _offline_classes[cls, mixin] = new
+    return new
+
+
+def link_local(mac: str) -> IPv6Interface:
+    """Return the EUI-64 link-local address of a mac address"""
+    b = [int(x, 16) for x in mac.split(':')]
+    b[0] ^= 0x02
+    eui = b[:3] + [0xff, 0xfe] + b[3:]
+    return IPv6Interface((0xfe80 << 112 | int.from_bytes(bytes(eui), 'big'),
+                          64))
+
+
+class OfflineNet(IPNet):
+    """An IPNet whose nodes, links and interfaces only exist in memory. It
+    does not require root privileges and never changes the system, but
+    still writes the configuration files of the daemons."""
+
+    def __init__(self, cwd: Optional[str] = None, *args, **kwargs):
+        """:param cwd: The directory in which the configuration files are
+                       written, defaults to the one of each node"""
+        self.cwd = cwd
+        # Veth pairs are never created
+        kwargs['bulk_links'] = False
+        # Do not require root privileges
+        inited = Mininet.inited
+        Mininet.inited = True
+        try:
+            super().__init__(*args, **kwargs)
+        finally:
+            Mininet.inited = inited
+
+    def _node_params(self, params):
+        if self.cwd is not None:
+            params.setdefault('cwd', self.cwd)
+        return params
+
+    def addRouter(self, name: str, cls=None, **params):
+        return super().addRouter(name, cls=offline_class(cls or self.router,
+                                                         OfflineNode),
+                                 **self._node_params(params))
+
+    def addHost(self, name: str, cls=None, **params):
+        return super().addHost(name, cls=offline_class(cls or self.host,
+                                                       OfflineNode),
+                               **self._node_params(params))
+
+    def addSwitch(self, name: str, cls=None, **params):
+        return super().addSwitch(name, cls=offline_class(cls or self.switch,
+                                                         OfflineNode),
+                                 **params)
+
+    def addLink(self, node1, node2, *args, **params):
+        params['cls'] = offline_class(params.get('cls') or self.link,
+                                      OfflineLink)
+        params['intf'] = params.get('intf') or self.intf
+        for key in ('intf', 'cls1', 'cls2'):
+            intf = params.get(key)
+            if intf is not None and issubclass(intf, IPIntf):
+                params[key] = offline_class(intf, OfflineIntf)
+        return super().addLink(node1, node2, *args, **params)
+
+    def buildFromTopo(self, topo):
+        super().buildFromTopo(topo)
+        if self.physical_interface:
+            log.warning('*** Ignoring the physical interfaces %s of an '
+                        'offline network\n'
+                        % ', '.join(self.physical_interface))
+            self.physical_interface.clear()
+
+    def render(self) -> Dict[str, List[str]]:
+        """Compute the router ids and write the configuration files of all
+        the routers and hosts
+
+        :return: The configuration files of each node"""
+        if not self.built:
+            self.build()
+        start = time.time()
+        for r in self.routers:
+            self.routerid_allocator.reserve_router(r)
+        nodes = self.routers + self.hosts
+        renderer = ConfigRenderer(max_workers=self.render_workers)
+        renderer.render(nodes)
+        files = {n.name: [f for d in n.nconfig.daemons
+                          for f in d.cfg_filenames]
+                 for n in nodes}  # type: Dict[str, List[str]]
+        self.metrics['render_time'] = time.time() - start
+        self.metrics['daemon_render_time'] = dict(renderer.daemon_time)
+        log.info('*** Rendered the configuration of %d nodes in %.3fs\n'
+                 % (len(files), self.metrics['render_time']))
+        return files
+
+    def start(self):
+        """Render the configurations, no daemon is started"""
+        self.render()
+
+    def reconfigure(self) -> Dict[str, List[str]]:
+        """Update the configuration files, no daemon is running"""
+        return self.update_configs()
+
+    def stop(self):
+        """Nothing is running, the configuration files are kept"""
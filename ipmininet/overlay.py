@@ -6,6 +6,8 @@ from typing import List, Sequence, Tuple, Optional, Dict, TYPE_CHECKING, Any, \
 from ipaddress import ip_network
 from mininet.log import lg
 
+from ipmininet.allocator import PrefixIndex
+
 if TYPE_CHECKING:
     from ipmininet.iptopo import IPTopo
 
@@ -109,7 +111,7 @@ class Subnet(Overlay):
             if not topo.isSwitch(y):
                 self.nodes.append(y)
 
-        if not self._check_subnets() \
+        if not self._check_subnets(topo) \
                 or not self._find_nodes_in_lan(topo, self.nodes):
             self.consistent = False
             return
@@ -124,18 +126,33 @@ class Subnet(Overlay):
                     addrs = tuple(attrs.get("ip", tuple()))
                     attrs["ip"] = addrs + (addr,)
 
-    def _check_subnets(self) -> bool:
+    def _check_subnets(self, topo: 'IPTopo') -> bool:
         """
         :return: True if there is enough addresses in each subnet
-         for each node in the overlay and that each subnet is valid
+         for each node in the overlay, that each subnet is valid and
+         that it does not overlap the subnets of the previous Subnet overlays
         """
+        # The subnets declared before this overlay
+        declared = PrefixIndex()
+        for o in topo.overlays:
+            if o is self:
+                break
+            if isinstance(o, Subnet) and o.consistent:
+                declared.update(o.subnets)
         try:
             for subnet in self.subnets:
-                if ip_network(str(subnet)).num_addresses - 1 < len(self.nodes):
+                net = ip_network(str(subnet))
+                if net.num_addresses - 1 < len(self.nodes):
                     lg.error("The subnet %s does not contain enough addresses."
                              " We need %s addresses\n"
                              % (subnet, len(self.nodes)))
                     return False
+                conflicts = declared.conflicts(net)
+                if conflicts:
+                    lg.error("The subnet %s overlaps the subnet %s of another"
+                             " LAN\n" % (subnet, conflicts[0]))
+                    return False
+                declared.add(net)
         except ValueError as e:
             lg.error("One of the subnet is invalid: %s\n" % e)
             return False
@@ -0,0 +1,191 @@
+"""This module stores the address allocation of a network, i.e., its
+broadcast domains, their subnets and the addresses given to their
+interfaces, so that it can be applied again without any computation when
+the same topology is built later on."""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from ipmininet.utils import cache_dir, otherIntf
+
+if TYPE_CHECKING:
+    from ipmininet.ipnet import IPNet, BroadcastDomain
+
+# The version of the allocation algorithm and of the plan format, plans
+# computed by another version are never used
+PLAN_VERSION = 2
+
+
+def topology_fingerprint(net: 'IPNet') -> str:
+    """Return a stable hash of everything the address allocation of a built
+    network depends on: its nodes, links, interface widths, fixed addresses,
+    prefix spaces, prefix length limits, point-to-point packing and
+    aggregation
+
+    :param net: The network, built but not yet addressed"""
+    items = [PLAN_VERSION, net.use_v4, net.use_v6,
+             [str(p) for p in net._unallocated_ipbase],
+             [str(p) for p in net._unallocated_ip6base],
+             net.max_v4_prefixlen, net.max_v6_prefixlen,
+             net.pack_v4_p2p, net.pack_v6_p2p,
+             list(net.aggregate_by)]  # type: List[Any]
+    for name in sorted(net):
+        node = net[name]
+        cls = type(node)
+        itfs = []
+        for itf in sorted(node.intfList(), key=lambda i: i.name):
+            other = otherIntf(itf)
+            width = getattr(itf, 'interface_width', None)
+            addresses = []
+            if hasattr(itf, 'ips'):
+                addresses = sorted(ip.with_prefixlen for ip in
+                                   list(itf.ips())
+                                   + list(itf.ip6s(exclude_lls=True)))
+            itfs.append([itf.name,
+                         other.node.name if other is not None else None,
+                         other.name if other is not None else None,
+                         width, addresses])
+        items.append([name, '%s.%s' % (cls.__module__, cls.__qualname__),
+                      getattr(node, 'use_v4', None),
+                      getattr(node, 'use_v6', None), itfs])
+    return hashlib.sha256(json.dumps(items).encode()).hexdigest()
+
+
+class AllocationPlan:
+    """The address allocation of a network: the interfaces of every
+    broadcast domain, the subnets of the domain and the addresses that were
+    allocated to each interface, as well as the blocks of the aggregated
+    groups of domains and the free prefix space left"""
+
+    def __init__(self, fingerprint: str,
+                 domains: Optional[List[Dict[str, Any]]] = None,
+                 free: Optional[Dict[str, List[str]]] = None,
+                 aggregates: Optional[List[List[Any]]] = None):
+        """:param fingerprint: The fingerprint of the topology
+        :param domains: The broadcast domains, as dictionaries
+        :param free: The free subnets of each IP version
+        :param aggregates: The [(level, key) path, block] of each
+                           aggregate"""
+        self.fingerprint = fingerprint
+        self.domains = domains if domains is not None else []
+        self.free = free if free is not None else {}
+        self.aggregates = aggregates if aggregates is not None else []
+
+    @classmethod
+    def from_network(cls, fingerprint: str, net: 'IPNet') \
+            -> 'AllocationPlan':
+        """Record the allocation of an addressed network
+
+        :param fingerprint: The fingerprint of the network before its
+                            allocation
+        :param net: The network"""
+        plan = cls(fingerprint)
+        for domain in net.broadcast_domains:
+            plan.domains.append(cls._domain(domain))
+        plan.free = {'4': [str(p) for p in net._unallocated_ipbase],
+                     '6': [str(p) for p in net._unallocated_ip6base]}
+        plan.aggregates = [[[list(k) for k in path], str(block)]
+                           for path, block in net.aggregates]
+        return plan
+
+    @staticmethod
+    def _domain(domain: 'BroadcastDomain') -> Dict[str, Any]:
+        itfs = sorted(domain, key=lambda i: (i.node.name, i.name))
+        # The addresses in the subnets of the domain were allocated since
+        # the allocated subnets never overlap the fixed ones
+        addresses = []
+        for itf in itfs:
+            addresses.append(
+                [[ip.with_prefixlen for ip in itf.ips()
+                  if domain.net is not None and ip in domain.net],
+                 [ip.with_prefixlen for ip in itf.ip6s(exclude_lls=True)
+                  if domain.net6 is not None and ip in domain.net6]])
+        return {'interfaces': [[i.node.name, i.name] for i in itfs],
+                'net': str(domain.net) if domain.net else None,
+                'net6': str(domain.net6) if domain.net6 else None,
+                'allocated_v4': domain._allocated_v4,
+                'allocated_v6': domain._allocated_v6,
+                'addresses': addresses}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'version': PLAN_VERSION, 'fingerprint': self.fingerprint,
+                'domains': self.domains, 'free': self.free,
+                'aggregates': self.aggregates}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional['AllocationPlan']:
+        """Return the plan stored in a dictionary, or None if it was not
+        produced by this version"""
+        if not isinstance(data, dict) or data.get('version') != PLAN_VERSION:
+            return None
+        return cls(data['fingerprint'], data['domains'], data['free'],
+                   data['aggregates'])
+
+
+class PlanCache:
+    """A persistent cache of allocation plans, indexed by the fingerprint of
+    their topology (see topology_fingerprint). Each plan is stored in its
+    own file."""
+
+    DIRNAME = 'allocation_plans'
+    # The maximal number of plans remembered, the least recently used ones
+    # are forgotten first
+    MAX_ENTRIES = 100
+
+    def __init__(self, path: Optional[str] = None):
+        """:param path: The directory storing the plans, defaults to a
+                        directory in ipmininet.utils.cache_dir()"""
+        if path is None:
+            directory = cache_dir()
+            if directory is not None:
+                path = os.path.join(directory, self.DIRNAME)
+        if path is not None:
+            try:
+                os.makedirs(path, exist_ok=True)
+            except OSError as e:
+                log.debug('Cannot use the plan cache %s: %s\n' % (path, e))
+                path = None
+        self.path = path
+
+    def _file(self, fingerprint: str) -> str:
+        return os.path.join(self.path, '%s.json' % fingerprint)
+
+    def load(self, fingerprint: str) -> Optional[AllocationPlan]:
+        """Return the plan of a topology, if any"""
+        if self.path is None:
+            return None
+        path = self._file(fingerprint)
+        try:
+            with open(path) as f:
+                plan = AllocationPlan.from_dict(json.load(f))
+            # Mark the plan as recently used
+            os.utime(path)
+        except (IOError, OSError, ValueError, KeyError) as e:
+            if os.path.exists(path):
+                log.debug('Ignoring the plan %s: %s\n' % (path, e))
+            return None
+        if plan is None or plan.fingerprint != fingerprint:
+            return None
+        return plan
+
+    def save(self, plan: AllocationPlan):
+        """Write down a plan, and forget the oldest ones"""
+        if self.path is None:
+            return
+        path = self._file(plan.fingerprint)
+        tmp = '%s.%d' % (path, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(plan.to_dict(), f)
+            os.replace(tmp, path)
+            plans = [os.path.join(self.path, p) for p in os.listdir(self.path)
+                     if p.endswith('.json')]
+            if len(plans) > self.MAX_ENTRIES:
+                plans.sort(key=os.path.getmtime)
+                for p in plans[:len(plans) - self.MAX_ENTRIES]:
+                    os.remove(p)
+        except (IOError, OSError) as e:
+            log.debug('Cannot save the plan %s: %s\n' % (path, e))
@@ -0,0 +1,98 @@
+"""This module renders the configuration files of the daemons of all the nodes
+of a network before any daemon is started"""
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from ipmininet.router.config.base import RenderJob
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+    from ipmininet.router.config.base import Daemon
+
+
+def _run_job(data: bytes) -> Dict[str, Tuple[str, float]]:
+    return pickle.loads(data).run()
+
+
+class ConfigRenderer:
+    """Build the configurations of the daemons of a set of nodes, then render
+    and write their files.
+
+    Building a configuration tree (see Daemon.build) needs the whole network
+    so it is done in this process. Rendering the templates from the trees
+    only needs a snapshot of each node (see RenderJob), so the snapshots are
+    rendered by a pool of processes. The compiled templates are shared by
+    the processes through the module directory of the template lookups."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """:param max_workers: The maximal number of processes rendering
+                               configurations at the same time, defaults to
+                               the number of CPUs"""
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # The time needed by the last rendering, in seconds
+        self.duration = 0.
+        # The time spent rendering the files of each daemon during the last
+        # rendering, summed over all the nodes
+        self.daemon_time = {}  # type: Dict[str, float]
+
+    def render(self, nodes: Sequence['IPNode']):
+        """Build the configurations of all the daemons of the nodes and write
+        their files
+
+        :param nodes: The nodes to configure"""
+        start = time.time()
+        self.daemon_time.clear()
+        parallel = self.max_workers > 1 and len(nodes) > 1
+        jobs = []  # type: List[Tuple[IPNode, bytes]]
+        # The addresses of the nodes are the same for all the nodes connected
+        # to each other, so they are only listed once per component
+        network_ips = {}  # type: Dict[str, Dict[str, List[str]]]
+        for n in nodes:
+            ips = network_ips.get(n.name)
+            if ips is None:
+                ips = n.network_ips()
+                network_ips.update((name, ips) for name in ips)
+            n.nconfig.build_daemons(network_ips=ips)
+            if not parallel:
+                for d in n.nconfig.daemons:
+                    self._render_daemon(n, d)
+                continue
+            job, local = n.nconfig.render_job()
+            for d in local:
+                self._render_daemon(n, d)
+            if not job.daemons:
+                continue
+            try:
+                jobs.append((n, pickle.dumps(job)))
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                log.debug('[%s] Rendering the configurations in the main '
+                          'process: %s\n' % (n.name, e))
+                for name, *_ in job.daemons:
+                    self._render_daemon(n, n.nconfig.daemon(name))
+        if jobs:
+            workers = min(self.max_workers, len(jobs))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(
+                    _run_job, [data for _, data in jobs],
+                    chunksize=max(1, len(jobs) // (4 * workers))))
+            for (n, _), result in zip(jobs, results):
+                for name, (digest, duration) in result.items():
+                    d = n.nconfig.daemon(name)
+                    d.files.extend(f for f in d.cfg_filenames
+                                   if f not in d.files)
+                    d.cfg_digest = digest
+                    self._add_time(name, duration)
+        self.duration = time.time() - start
+
+    def _render_daemon(self, node: 'IPNode', d: 'Daemon'):
+        start = time.time()
+        node.nconfig.render_daemon(d)
+        self._add_time(d.NAME, time.time() - start)
+
+    def _add_time(self, name: str, duration: float):
+        self.daemon_time[name] = self.daemon_time.get(name, 0.) + duration
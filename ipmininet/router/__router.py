@@ -1,15 +1,21 @@
 """This modules defines a L3 router class,
    with a modular config system."""
+import os
 import subprocess
 import sys
+import threading
 import time
 from ipaddress import IPv4Interface, IPv6Interface
-from typing import Type, Optional, Tuple, Union, Dict, List, Sequence, Set
+from typing import Type, Optional, Tuple, Union, Dict, List, Sequence, Set, \
+    Iterable
 
 from ipmininet import DEBUG_FLAG
-from ipmininet.utils import L3Router, realIntfList, otherIntf
+from ipmininet.utils import L3Router, realIntfList, otherIntf, \
+    InputRecorder
 from ipmininet.link import IPIntf
 from .config import BasicRouterConfig, NodeConfig, RouterConfig
+from .config.base import Daemon
+from .config.readiness import DaemonStartupError
 
 import mininet.clean
 from mininet.node import Node, Host
@@ -28,6 +34,8 @@ class ProcessHelper:
         self.node = node
         self._pid_gen = 0
         self._processes = {}  # type: Dict[int, subprocess.Popen]
+        # Daemons of the same node can be started from several threads
+        self._lock = threading.Lock()
 
     def call(self, *args, **kwargs) -> Optional[str]:
         """Call a command, wait for it to end and return its output.
@@ -42,9 +50,11 @@ class ProcessHelper:
         :param args: the command + arguments
         :param kwargs: key-val arguments, as used in subprocess.Popen
         :return: a process index in this family"""
-        self._pid_gen += 1
-        self._processes[self._pid_gen] = self.node.popen(*args, **kwargs)
-        return self._pid_gen
+        p = self.node.popen(*args, **kwargs)
+        with self._lock:
+            self._pid_gen += 1
+            self._processes[self._pid_gen] = p
+            return self._pid_gen
 
     def pexec(self, *args, **kw) -> Tuple[str, str, int]:
         """Call a command, wait for it to terminate and save stdout, stderr and
@@ -57,6 +67,22 @@ class ProcessHelper:
         :param pid: a process index, as return by popen"""
         return self._processes[pid]
 
+    def stop(self, pid: int, timeout=10.):
+        """Terminate a process of this family and wait until it exits
+
+        :param pid: a process index, as return by popen
+        :param timeout: the time to wait before killing the process"""
+        with self._lock:
+            p = self._processes.pop(pid)
+        try:
+            p.terminate()
+            p.wait(timeout)
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+        except OSError:
+            pass  # Process is already dead
+
     def terminate(self):
         """Terminate all processes in this family"""
         for p in self._processes.values():
@@ -69,6 +95,12 @@ class ProcessHelper:
 class IPNode(Node):
     """A Node which manages a set of daemons"""
 
+    # The root of the sysctl tree, as seen from the namespace of the node
+    SYSCTL_ROOT = '/proc/sys'
+    # Whether the node only exists in memory, without namespace nor
+    # processes (see ipmininet.offline)
+    OFFLINE = False
+
     def __init__(self, name: str,
                  config: Union[Type[NodeConfig],
                                Tuple[Type[NodeConfig], Dict]] = NodeConfig,
@@ -91,7 +123,8 @@ class IPNode(Node):
         self.use_v4 = use_v4
         self.use_v6 = use_v6
         self.cwd = cwd
-        self._old_sysctl = {}  # type: Dict[str, Union[str, int]]
+        # The values of the sysctls before they were changed
+        self._old_sysctl = {}  # type: Dict[str, str]
         if isinstance(config, tuple):
             try:
                 self.nconfig = config[0](self, **config[1])
@@ -101,62 +134,247 @@ class IPNode(Node):
         else:
             self.nconfig = config(self)
         self._processes = process_manager(self)
+        # The process index of each started daemon, by daemon name
+        self._daemon_processes = {}  # type: Dict[str, int]
+        # The configuration files that each started daemon loaded, by daemon
+        # name (see Daemon.read_cfg)
+        self._loaded_configs = {}  # type: Dict[str, Dict[str, str]]
 
     def start(self):
         """Start the node: Configure the daemons, set the relevant sysctls,
         and fire up all needed processes"""
         # Build the config
-        self.nconfig.build()
+        self.build_config()
         # Check them
+        if not self.check_config():
+            lg.error('Config checks failed, aborting!')
+            mininet.clean.cleanup()
+            sys.exit(1)
+        # Set relevant sysctls
+        self.set_sysctls()
+        # Fire up all daemons
+        for d in self.nconfig.daemons:
+            self.start_daemon(d)
+
+    def build_config(self):
+        """Build and write the configuration files of all daemons"""
+        self.nconfig.build()
+
+    def update_config(self) -> List[Daemon]:
+        """Build again and write the configuration files of the daemons
+        whose inputs changed since their last build (see NodeConfig.update)
+
+        :return: The daemons whose configuration files changed"""
+        return self.nconfig.update()
+
+    def check_config(self) -> bool:
+        """Run the dry-run of every daemon of this node
+
+        :return: True iff all the daemon configurations are valid"""
         err_code = False
         for d in self.nconfig.daemons:
-            out, err, code = self._processes.pexec(shlex.split(d.dry_run))
+            out, err, code = self.check_daemon(d)
             err_code = err_code or code
             if code:
                 lg.error(d.NAME, 'configuration check failed ['
                          'rcode:', code, ']\n'
                          'stdout:', out, '\n'
                          'stderr:', err)
-        if err_code:
-            lg.error('Config checks failed, aborting!')
-            mininet.clean.cleanup()
-            sys.exit(1)
-        # Set relevant sysctls
-        for opt, val in self.nconfig.sysctl:
-            self._old_sysctl[opt] = self._set_sysctl(opt, val)
-        # Fire up all daemons
-        for d in self.nconfig.daemons:
-            self._processes.popen(shlex.split(d.startup_line))
-            # Busy-wait if the daemon needs some time before being started
+        return not err_code
+
+    def check_daemon(self, d: Daemon) -> Tuple[str, str, int]:
+        """Run the dry-run of a daemon of this node
+
+        :param d: the daemon to check
+        :return: the stdout, stderr and return code of the dry-run"""
+        return self._processes.pexec(shlex.split(d.dry_run))
+
+    def set_sysctls(self):
+        """Apply the sysctls requested by the node configuration"""
+        for opt, val in self._set_sysctls(self.nconfig.sysctl).items():
+            self._old_sysctl.setdefault(opt, val)
+
+    def start_daemon(self, d: Daemon):
+        """Start one daemon of this node and wait until it is ready
+
+        :param d: the daemon to start
+        :raise DaemonStartupError: if the daemon does not become ready"""
+        probe = d.readiness_probe()
+        if probe is not None:
+            probe.reset()
+        self._loaded_configs[d.NAME] = d.read_cfg()
+        pid = self._processes.popen(shlex.split(d.startup_line))
+        self._daemon_processes[d.NAME] = pid
+        if probe is None:
+            # Daemons might still only override has_started()
             while not d.has_started():
                 time.sleep(.001)
+            return
+        p = self._processes.get_process(pid)
+
+        def alive() -> bool:
+            # Daemons forking in the background exit with 0
+            return p.poll() in (None, 0)
+
+        if probe.wait(d.STARTUP_TIMEOUT, alive=alive):
+            return
+        code = p.poll()
+        if code is None:
+            reason = 'was not ready after %ss' % d.STARTUP_TIMEOUT
+        else:
+            out, err = p.communicate()
+            reason = 'exited with code %s\nstdout: %s\nstderr: %s' % (
+                code, (out or b'').decode(errors='replace'),
+                (err or b'').decode(errors='replace'))
+        msg = '%s on %s is not ready (waiting for %s): it %s' % (
+            d.NAME, self.name, probe, reason)
+        lg.error(msg + '\n')
+        raise DaemonStartupError(msg)
+
+    def stop_daemon(self, d: Daemon):
+        """Stop one daemon of this node, if it was started by start_daemon()
+
+        :param d: the daemon to stop"""
+        self._loaded_configs.pop(d.NAME, None)
+        pid = self._daemon_processes.pop(d.NAME, None)
+        if pid is not None:
+            self._processes.stop(pid)
+
+    def restart_daemon(self, d: Daemon):
+        """Stop one daemon of this node, then start it again with its current
+        configuration files
+
+        :param d: the daemon to restart
+        :raise DaemonStartupError: if the daemon does not become ready"""
+        self.stop_daemon(d)
+        self.start_daemon(d)
+
+    def reconfigure(self) -> List[Daemon]:
+        """Update the configuration files of the daemons whose inputs changed
+        (see update_config()) and apply them to the running daemons. Each
+        running daemon is compared with the configuration files that it
+        loaded last, so that the files already updated by update_config() are
+        applied as well. The daemons that can be reconfigured while running,
+        e.g., the FRRouting daemons through vtysh, only get the changed part
+        of their configuration, and keep their sessions up
+        (see Daemon.reload). The other ones are restarted.
+
+        :return: The daemons whose configuration was applied"""
+        changed = self.update_config()
+        applied = []  # type: List[Daemon]
+        for d in self.nconfig.daemons:
+            loaded = self._loaded_configs.get(d.NAME)
+            if loaded is None:
+                if d in changed:
+                    self.start_daemon(d)
+                    applied.append(d)
+                continue
+            current = d.read_cfg()
+            if current == loaded:
+                continue
+            if d.reload(loaded):
+                self._loaded_configs[d.NAME] = current
+            else:
+                lg.info('Restarting', d.NAME, 'on', self.name, '\n')
+                self.restart_daemon(d)
+            applied.append(d)
+        return applied
 
     def terminate(self):
         """Stops this node and sets back all sysctls to their old values"""
         self._processes.terminate()
         if not DEBUG_FLAG:
             self.nconfig.cleanup()
-        for opt, val in self._old_sysctl.items():
-            self._set_sysctl(opt, val)
+        self._set_sysctls(self._old_sysctl.items())
+        self._old_sysctl.clear()
         super().terminate()
 
-    def _set_sysctl(self, key: str, val: Union[str, int]):
-        """Change a sysctl value, and return the previous set value"""
-        try:
-            v = None
-            out = self._processes.call('sysctl', key)
-            if out is not None:
-                v = out.split('=')[1]\
-                    .strip(' \n\t\r')
-        except IndexError:
-            v = None
-        if v != val:
-            self._processes.call('sysctl', '-w', '%s=%s' % (key, val))
-        return v
+    def _set_sysctls(self, values: Iterable[Tuple[str, Union[str, int]]]) \
+            -> Dict[str, str]:
+        """Change sysctl values, in a single process running in the
+        namespace of the node. Values that are already set are not written.
+
+        :param values: the (key, value) pairs to set
+        :return: the previous values of the changed sysctls"""
+        values = [(k, str(v)) for k, v in values]
+        if not values:
+            return {}
+        out, _, _ = self._processes.pexec(
+            ['sh', '-c', self._sysctl_script(values)])
+        return self._parse_sysctl_output(values, out, self.name)
+
+    @classmethod
+    def _sysctl_script(cls, values: Sequence[Tuple[str, str]]) -> str:
+        """Return a shell script reading the sysctls and writing those that
+        differ. It prints one line per sysctl: '@@' followed by '=' if the
+        value was already set, '+' if it was written, '-' if it could not be
+        written, each of these being followed by the previous value, or '!'
+        if the sysctl does not exist."""
+        lines = ['set -f']  # Do not expand wildcards in the values
+        for key, val in values:
+            path = shlex.quote(cls._sysctl_path(key))
+            lines.append(
+                # Compare the values with normalized whitespaces
+                'if read -r o < {p}; then set -- $o; '
+                'if [ "$*" = {w} ]; then echo "@@=$o"; '
+                'elif printf "%s\\n" {v} > {p}; then echo "@@+$o"; '
+                'else echo "@@-$o"; fi; '
+                'else echo "@@!"; fi 2>/dev/null'.format(
+                    p=path, v=shlex.quote(val),
+                    w=shlex.quote(' '.join(val.split()))))
+        return '\n'.join(lines)
+
+    @classmethod
+    def _sysctl_path(cls, key: str) -> str:
+        """Return the path of a sysctl. As for sysctl(8), the components of
+        the key are separated by '/' if it contains any, or else by '.'.
+        The names of interfaces, e.g., in net.ipv4.conf.eth0.100.rp_filter,
+        can contain dots."""
+        if '/' in key:
+            parts = key.strip('/').split('/')
+        else:
+            parts = key.split('.')
+            # net.<family>.(conf|neigh).<interface>.<name>
+            if len(parts) > 5 and parts[0] == 'net' \
+                    and parts[2] in ('conf', 'neigh'):
+                parts = parts[:3] + ['.'.join(parts[3:-1]), parts[-1]]
+        return os.path.join(cls.SYSCTL_ROOT, *parts)
+
+    @staticmethod
+    def _parse_sysctl_output(values: Sequence[Tuple[str, str]], out: str,
+                             name: str) -> Dict[str, str]:
+        """Parse the output of _sysctl_script
+
+        :return: the previous values of the changed sysctls"""
+        results = [line[2:] for line in out.splitlines()
+                   if line.startswith('@@')]
+        if len(results) != len(values):
+            lg.error('Cannot set the sysctls of %s: %s\n' % (name, out))
+            return {}
+        old = {}
+        for (key, val), r in zip(values, results):
+            status, prev = r[:1], r[1:]
+            if status == '!':
+                lg.error('Unknown sysctl %s on %s\n' % (key, name))
+            elif status == '-':
+                lg.error('Cannot set sysctl %s=%s on %s\n' % (key, val, name))
+            elif status == '+':
+                old[key] = prev
+        return old
 
     def get(self, key, val=None):
         """Check for a given key in the node parameters"""
-        return self.params.get(key, val)
+        value = self.params.get(key, val)
+        if InputRecorder.active() is not None:
+            InputRecorder.record(self, ('params', key), value,
+                                 lambda: self.params.get(key, val))
+        return value
+
+    def intfList(self) -> List[IPIntf]:
+        intfs = super().intfList()
+        if InputRecorder.active() is not None:
+            InputRecorder.record(self, 'intfs', intfs, super().intfList)
+        return intfs
 
     def network_ips(self) -> Dict[str, List[str]]:
         """Return all the addresses of the nodes connected directly or not
@@ -185,6 +403,9 @@ class IPNode(Node):
 class Router(IPNode, L3Router):
     """The actual router, which manages a set of daemons"""
 
+    # The class of the loopback interface
+    LOOPBACK_INTF = IPIntf  # type: Type[IPIntf]
+
     def __init__(self, name,
                  config: Union[Type[RouterConfig],
                                Tuple[Type[RouterConfig],
@@ -201,7 +422,8 @@ class Router(IPNode, L3Router):
 
         # This interface already exists in the node,
         # so no need to move it
-        lo = IPIntf('lo', node=self, port=-1, moveIntfFn=lambda x, y: None)
+        lo = self.LOOPBACK_INTF('lo', node=self, port=-1,
+                                moveIntfFn=lambda x, y: None)
         lo.ip = lo_addresses
 
     @property
@@ -4,16 +4,19 @@ It also defines the base class for a daemon, as well as a minimalistic
 configuration for a router."""
 import os
 import abc
+import hashlib
+import time
 from contextlib import closing
 from operator import attrgetter
-from ipaddress import ip_address
+from ipaddress import ip_address, IPv4Address, IPv4Interface
 from mako.lookup import TemplateLookup
 from typing import TYPE_CHECKING, Iterable, Optional, Dict, Union, Type, \
     Tuple, Sequence, List, Set
 
-from .utils import ConfigDict, ip_statement
-from ipmininet.utils import require_cmd, realIntfList
-from ipmininet.link import OrderedAddress, IPIntf
+from .readiness import ReadinessProbe
+from .utils import ConfigDict, ip_statement, template_lookup
+from ipmininet.utils import require_cmd, InputRecorder, realIntfList
+from ipmininet.link import OrderedAddress
 
 import mako.exceptions
 
@@ -24,11 +27,103 @@ if TYPE_CHECKING:
     from ipmininet.iptopo import IPTopo, NodeDescription
 DaemonOption = Union['Daemon', Type['Daemon'],
                      Tuple[Union['Daemon', Type['Daemon']], Dict]]
-
-last_routerid = ip_address('0.0.0.1')
+RenderedDaemon = Tuple[str, Tuple[str, ...], Optional[str], List[str],
+                       List[str]]
 
 __TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates')
-router_template_lookup = TemplateLookup(directories=[__TEMPLATES_DIR])
+router_template_lookup = template_lookup(__TEMPLATES_DIR)
+
+
+def render_templates(lookup: TemplateLookup, cfg: ConfigDict,
+                     filenames: Sequence[str], templates: Sequence[str],
+                     owner: Tuple[str, str], **kwargs) -> Dict[str, str]:
+    """Render the configuration files of a daemon
+
+    :param lookup: The TemplateLookup object of the template directory
+    :param cfg: The global config for the node
+    :param filenames: The configuration files
+    :param templates: The template of each configuration file
+    :param owner: The names of the node and of the daemon
+    :param kwargs: Additional keywords args. will be passed directly
+                   to the template
+    :return: The configuration content of each file"""
+    cfg_content = {}
+    for filename, template_filename in zip(filenames, templates):
+        log.debug('Generating %s\n' % filename)
+        try:
+            cfg.current_filename = filename
+            kwargs["node"] = cfg
+            kwargs["ip_statement"] = ip_statement
+            template = lookup.get_template(template_filename)
+            cfg_content[filename] = template.render(**kwargs)
+        except Exception:
+            # Display template errors in a less cryptic way
+            log.error('Couldn''t render a config file(',
+                      template_filename, ')')
+            log.error(mako.exceptions.text_error_template().render())
+            raise ValueError('Cannot render a configuration [%s: %s]'
+                             % owner)
+    return cfg_content
+
+
+def write_files(cfg: Dict[str, str], filenames: Sequence[str]) -> str:
+    """Write down configuration files
+
+    :param cfg: The configuration string for each filename
+    :param filenames: The files to write, in order
+    :return: The hash of the files (see Daemon.cfg_digest)"""
+    digest = hashlib.sha256()
+    for filename in filenames:
+        with closing(open(filename, 'w')) as f:
+            f.write(cfg[filename])
+        digest.update(filename.encode() + b'\0')
+        digest.update(cfg[filename].encode() + b'\0')
+    return digest.hexdigest()
+
+
+class RenderJob:
+    """A picklable snapshot of the configuration of a node, i.e., its global
+    ConfigDict and where the files of its daemons come from and go to.
+    Rendering it does not need the node, its interfaces or the rest of the
+    network, so it can be done in another process (see ipmininet.render)."""
+
+    # The template lookups of this process, by directories
+    _lookups = {}  # type: Dict[Tuple, TemplateLookup]
+
+    def __init__(self, node: str, cfg: ConfigDict):
+        """:param node: The name of the node
+        :param cfg: The global config for the node"""
+        self.node = node
+        self.cfg = cfg
+        # The name, template directories, module directory, templates and
+        # configuration files of each daemon
+        self.daemons = []  # type: List[RenderedDaemon]
+
+    def add(self, d: 'Daemon'):
+        """Render the files of a daemon as part of this job"""
+        self.daemons.append((d.NAME, tuple(d.template_lookup.directories),
+                             d.template_lookup.module_directory,
+                             d.template_filenames, d.cfg_filenames))
+
+    def run(self) -> Dict[str, Tuple[str, float]]:
+        """Render and write the files of all the daemons
+
+        :return: The hash of the files of each daemon and the time spent
+                 rendering them"""
+        results = {}
+        for name, directories, module_dir, templates, filenames \
+                in self.daemons:
+            start = time.time()
+            key = (directories, module_dir)
+            lookup = self._lookups.get(key)
+            if lookup is None:
+                lookup = TemplateLookup(directories=list(directories),
+                                        module_directory=module_dir)
+                self._lookups[key] = lookup
+            cfg = render_templates(lookup, self.cfg, filenames, templates,
+                                   (self.node, name))
+            results[name] = (write_files(cfg, filenames), time.time() - start)
+        return results
 
 
 class NodeConfig:
@@ -56,32 +151,99 @@ class NodeConfig:
     def build(self):
         """Build the configuration for each daemon, then write the
         configuration files"""
+        self.build_daemons()
+        for d in self._daemons.values():
+            self.render_daemon(d)
+
+    def build_daemons(self,
+                      network_ips: Optional[Dict[str, List[str]]] = None):
+        """Build the configuration tree of each daemon, without rendering
+        their configuration files (see render_daemon() and render_job())
+
+        :param network_ips: The addresses of the nodes of the network of this
+                            node, if already known (see IPNode.network_ips)"""
 
         # Mount a separate /etc/resolv.conf and /etc/hosts for the node
         resolv_file_mount = os.path.join(self._node.cwd, 'resolv_%(name)s.conf')
         open(resolv_file_mount % self._node.__dict__, "w").close()
         host_file_mount = os.path.join(self._node.cwd, 'hosts_%(name)s')
-        self.build_host_file(host_file_mount % self._node.__dict__)
+        self.build_host_file(host_file_mount % self._node.__dict__,
+                             network_ips)
         self.add_private_fs_path([('/etc/resolv.conf', resolv_file_mount),
                                   ('/etc/hosts', host_file_mount)])
 
         self._cfg.clear()
         self._cfg.name = self._node.name
-        # Check that all daemons have their dependencies satisfied
+        self.register_dependencies()
+        # Execute any post registering action
+        self.post_register_daemons()
+        # Build their config
+        for d in self._daemons.values():
+            self.build_daemon(d)
+
+    def build_daemon(self, d: 'Daemon'):
+        """Build the configuration tree of a daemon, and record the inputs
+        that it reads in Daemon.inputs"""
+        recorder = InputRecorder()
+        recorder.add(d, 'options', d.options, lambda: d.options)
+        with recorder:
+            self._cfg[d.NAME] = d.build()
+        d.inputs = recorder
+
+    def update(self) -> List['Daemon']:
+        """Build again the configuration trees of the daemons whose inputs
+        changed since their last build (see Daemon.inputs) or that were never
+        built, and write their files again. The configuration trees of the
+        other daemons, the hosts file and the mounts of the node are kept.
+
+        :return: The daemons whose configuration files changed"""
+        self._cfg.name = self._node.name
+        self.register_dependencies()
+        self.post_register_daemons()
+        changed = []
+        for d in self.daemons:
+            if d.inputs is not None:
+                changes = d.inputs.changes()
+                if not changes:
+                    continue
+                log.debug('[%s] Updating %s, changed inputs: %s\n'
+                          % (self._node.name, d.NAME,
+                             ', '.join('%s %s' % c for c in changes)))
+            digest = d.cfg_digest
+            self.build_daemon(d)
+            self.render_daemon(d)
+            if d.cfg_digest != digest:
+                changed.append(d)
+        return changed
+
+    def register_dependencies(self):
+        """Register the daemons that the registered ones depend on"""
         for cls in list(self._daemons.values()):
             for c in cls.DEPENDS:
                 if c.NAME not in self._daemons:
                     self.register_daemon(c)
-        # Execute any post registering action
-        self.post_register_daemons()
-        # Build their config
-        for name, d in self._daemons.items():
-            self._cfg[name] = d.build()
-        # Write their config, using the global ConfigDict to handle
-        # dependencies
+
+    def render_daemon(self, d: 'Daemon'):
+        """Write the configuration files of a daemon, using the global
+        ConfigDict to handle dependencies"""
+        cfg = d.render(self._cfg)
+        d.write(cfg)
+
+    def render_job(self) -> Tuple['RenderJob', List['Daemon']]:
+        """Return a snapshot of the built configuration trees, from which
+        another process can render and write the files of the daemons.
+        Daemons overriding Daemon.render() or Daemon.write() are left out.
+
+        :return: The snapshot and the daemons that it leaves out"""
+        job = RenderJob(self._node.name, self._cfg)
+        local = []
         for d in self._daemons.values():
-            cfg = d.render(self._cfg)
-            d.write(cfg)
+            if type(d).render is Daemon.render \
+                    and type(d).write is Daemon.write:
+                job.add(d)
+            else:
+                local.append(d)
+        return job, local
 
     def post_register_daemons(self):
         """Method called after all daemon classes were instantiated"""
@@ -114,7 +276,9 @@ class NodeConfig:
         else:
             cls.options.update(daemon_opts)
         self._daemons[cls.NAME] = cls
-        require_cmd(cls.NAME, 'Could not find an executable for a daemon!')
+        if not self._node.OFFLINE:
+            require_cmd(cls.NAME,
+                        'Could not find an executable for a daemon!')
 
     @property
     def sysctl(self):
@@ -162,14 +326,17 @@ class NodeConfig:
         finally:
             self._node.privateDirs = old_private_dirs
 
-    def build_host_file(self, filename: str):
+    def build_host_file(self, filename: str,
+                        network_ips: Optional[Dict[str, List[str]]] = None):
         # Copy the base file
         lines = []
         with open("/etc/hosts", "rb") as fileobj:
             lines.extend(fileobj.readlines())
 
+        if network_ips is None:
+            network_ips = self._node.network_ips()
         with open(filename, "wb") as fileobj:
-            for node_name, ips in self._node.network_ips().items():
+            for node_name, ips in network_ips.items():
                 for ip in ips:
                     fileobj.write("{ip}\t{name}\n"
                                   .format(ip=ip, name=node_name).encode())
@@ -177,6 +344,77 @@ class NodeConfig:
             fileobj.write(b"".join(lines))
 
 
+def most_visible_ipv4(node: 'IPNode') -> Optional[IPv4Interface]:
+    """Return the most-visible IPv4 address of a node, if any"""
+    ip_list = sorted((ip for itf in node.intfList() for ip in itf.ips()),
+                     key=OrderedAddress)
+    return ip_list.pop() if ip_list else None
+
+
+class RouterIdAllocator:
+    """Hands out unique router ids to the routers of a network.
+
+    The router ids that are already taken, i.e., explicitly set on a daemon
+    or derived from the IPv4 addresses of a router, are reserved up front.
+    The routers without any of them then get the first free id of the
+    sequence 0.0.0.2, 0.0.0.3, ... in constant amortized time. The id
+    generated for a router is kept when its configuration is built again."""
+
+    def __init__(self):
+        self._taken = set()  # type: Set[int]
+        self._next = int(ip_address('0.0.0.2'))
+        # The generated router ids, by router name
+        self._generated = {}  # type: Dict[str, str]
+
+    def reserve(self, routerid: Union[str, IPv4Address]):
+        """Prevent a router id from being generated"""
+        self._taken.add(int(ip_address(str(routerid))))
+
+    def reserve_router(self, router: 'Router'):
+        """Reserve the router ids that a router uses without generating
+        one, i.e., the ids of its daemons and its most-visible address"""
+        routerid = getattr(router.nconfig, 'routerid', None)
+        if routerid:
+            self.reserve(routerid)
+        for d in router.nconfig.daemons:
+            if d.options.routerid:
+                self.reserve(d.options.routerid)
+        ip = most_visible_ipv4(router)
+        if ip is not None:
+            self.reserve(ip.ip)
+
+    def reserve_network(self, router: 'Router'):
+        """Reserve the router ids of all the routers reachable from a
+        router through their broadcast domains, including itself"""
+        visited = set()  # type: Set[Router]
+        to_visit = [router]
+        while to_visit:
+            n = to_visit.pop()
+            if n in visited:
+                continue
+            visited.add(n)
+            self.reserve_router(n)
+            for i in realIntfList(n):
+                if i.broadcast_domain is not None:
+                    to_visit.extend(itf.node for itf
+                                    in i.broadcast_domain.routers)
+
+    def generate(self, router: 'Router') -> str:
+        """Return the generated router id of a router"""
+        routerid = self._generated.get(router.name)
+        if routerid is None:
+            while self._next in self._taken:
+                self._next += 1
+            self._taken.add(self._next)
+            routerid = ip_address(self._next).compressed
+            self._generated[router.name] = routerid
+        return routerid
+
+
+# The allocator of the routers that do not belong to a network
+default_routerid_allocator = RouterIdAllocator()
+
+
 class RouterConfig(NodeConfig):
 
     def __init__(self, node: 'Router', sysctl=None, *args, **kwargs):
@@ -186,43 +424,14 @@ class RouterConfig(NodeConfig):
             self._sysctl.update(sysctl)
         super().__init__(node, sysctl=self._sysctl, *args, **kwargs)
         self.routerid = None
+        # The allocator of the generated router ids, set by the network
+        self.routerid_allocator = None  # type: Optional[RouterIdAllocator]
 
     def post_register_daemons(self):
         self._cfg.password = self._node.password
         # Set the router id
         self.routerid = self.compute_routerid()
 
-    @staticmethod
-    def incr_last_routerid():
-        global last_routerid
-        last_routerid += 1
-
-    def _equal_routerid(self, n: 'Router') -> bool:
-
-        # Router id of 'n' already set
-        if n.nconfig.routerid:
-            return str(n.nconfig.routerid) != str(last_routerid)
-
-        # Check that a router id explicitly set
-        # in any other daemon is not in conflict
-        # with the current router id
-        for d in n.nconfig.daemons:
-            if d != self \
-                    and d.options.routerid \
-                    and str(d.options.routerid) == str(last_routerid):
-                return True
-
-        # Check that the most-visible IPv4 address is not in conflict
-        # with the current router id
-        ip_list = sorted((ip for itf in n.intfList()
-                          for ip in itf.ips()),
-                         key=OrderedAddress)
-        if len(ip_list) != 0 \
-                and str(ip_list.pop().ip) == str(last_routerid):
-            return True
-
-        return False
-
     def compute_routerid(self) -> str:
         """Computes the default router id for all daemons.
         If a router ids were explicitly set for some of its daemons,
@@ -230,34 +439,22 @@ class RouterConfig(NodeConfig):
         as the global router id.
         Otherwise if it has IPv4 addresses, it returns the most-visible one
         among its router interfaces.
-        If both conditions are wrong, it generates a unique router id."""
+        If both conditions are wrong, it generates a unique router id
+        (see RouterIdAllocator)."""
 
         for d in self.daemons:
             if d.options.routerid:
                 return d.options.routerid
 
-        ip_list = sorted((ip for itf in self._node.intfList()
-                          for ip in itf.ips()),
-                         key=OrderedAddress)
-        if len(ip_list) == 0:
-
-            to_visit = realIntfList(self._node)
-            # Explore all routers to check that none has the same router id
-            while to_visit:
-                self.incr_last_routerid()
-                visited = set()  # type: Set[IPIntf]
-                while to_visit:
-                    i = to_visit.pop()
-                    if i in visited:
-                        continue
-                    visited.add(i)
-                    for n in i.broadcast_domain.routers:
-                        if self._equal_routerid(n.node):
-                            break  # We need to change the router id
-                        to_visit.extend(realIntfList(n.node))
-                to_visit = realIntfList(self._node) if to_visit else []
-            return last_routerid.compressed
-        return ip_list.pop().ip.compressed
+        ip = most_visible_ipv4(self._node)
+        if ip is not None:
+            return ip.ip.compressed
+        allocator = self.routerid_allocator
+        if allocator is None:
+            # No allocator is shared by the routers of the network
+            allocator = default_routerid_allocator
+            allocator.reserve_network(self._node)
+        return allocator.generate(self._node)
 
 
 class Daemon(metaclass=abc.ABCMeta):
@@ -271,6 +468,8 @@ class Daemon(metaclass=abc.ABCMeta):
     DEPENDS = ()  # type: Sequence[Type[Daemon]]
     # The kill patterns to cleanup any processes started by this daemon
     KILL_PATTERNS = ()  # type: Sequence[str]
+    # The maximal time (in seconds) to wait for this daemon to be ready
+    STARTUP_TIMEOUT = 30
 
     def __init__(self, node: 'IPNode',
                  template_lookup: TemplateLookup = router_template_lookup,
@@ -282,12 +481,19 @@ class Daemon(metaclass=abc.ABCMeta):
         self._node = node
         self._startup_line = None  # type: Optional[str]
         self.files = []  # type: List[str]
+        # The hash of the last configuration written
+        self.cfg_digest = None  # type: Optional[str]
         self.template_lookup = template_lookup
+        # The inputs read by the last build of the configuration tree
+        self.inputs = None  # type: Optional[InputRecorder]
         self._options = self._defaults(**kwargs)
 
     @property
     def options(self) -> ConfigDict:
         """Get the options ConfigDict for this daemon"""
+        if InputRecorder.active() is not None:
+            InputRecorder.record(self, 'options', self._options,
+                                 lambda: self._options)
         return self._options
 
     def build(self) -> ConfigDict:
@@ -313,33 +519,38 @@ class Daemon(metaclass=abc.ABCMeta):
         :param cfg: The global config for the node
         :param kwargs: Additional keywords args. will be passed directly
                        to the template"""
-        self.files.extend(self.cfg_filenames)
-        cfg_content = {}
-        for i, filename in enumerate(self.cfg_filenames):
-            log.debug('Generating %s\n' % filename)
-            try:
-                cfg.current_filename = filename
-                kwargs["node"] = cfg
-                kwargs["ip_statement"] = ip_statement
-                template = self.template_lookup.get_template(
-                    self.template_filenames[i])
-                cfg_content[filename] = template.render(**kwargs)
-            except Exception:
-                # Display template errors in a less cryptic way
-                log.error('Couldn''t render a config file(',
-                          self.template_filenames[i], ')')
-                log.error(mako.exceptions.text_error_template().render())
-                raise ValueError('Cannot render a configuration [%s: %s]' % (
-                    self._node.name, self.NAME))
-        return cfg_content
+        self.files.extend(f for f in self.cfg_filenames if f not in self.files)
+        return render_templates(self.template_lookup, cfg, self.cfg_filenames,
+                                self.template_filenames,
+                                (self._node.name, self.NAME), **kwargs)
 
     def write(self, cfg: Dict[str, str]):
         """Write down the configuration files for this daemon
 
         :param cfg: The configuration string for each filename"""
+        self.cfg_digest = write_files(cfg, self.cfg_filenames)
+
+    def read_cfg(self) -> Dict[str, str]:
+        """Return the content of the configuration files of this daemon as
+        they are written, by filename. Missing files are left out."""
+        content = {}
         for filename in self.cfg_filenames:
-            with closing(open(filename, 'w')) as f:
-                f.write(cfg[filename])
+            try:
+                with open(filename) as f:
+                    content[filename] = f.read()
+            except (IOError, OSError):
+                pass
+        return content
+
+    def reload(self, previous: Dict[str, str]) -> bool:
+        """Apply the configuration files written last to the running daemon,
+        without restarting it (see IPNode.reconfigure)
+
+        :param previous: The content of the configuration files that the
+                         running daemon loaded, by filename
+        :return: Whether the daemon was reconfigured, otherwise it has to be
+                 restarted"""
+        return False
 
     @property
     @abc.abstractmethod
@@ -399,7 +610,13 @@ class Daemon(metaclass=abc.ABCMeta):
 
     def has_started(self) -> bool:
         """Return whether this daemon has started or not"""
-        return True
+        probe = self.readiness_probe()
+        return probe is None or probe.ready()
+
+    def readiness_probe(self) -> Optional[ReadinessProbe]:
+        """Return the probe to use to know when this daemon is ready
+        after its startup, or None if it is ready as soon as it is launched"""
+        return None
 
     @classmethod
     def get_config(cls, topo: 'IPTopo', node: 'NodeDescription', **kwargs):
@@ -411,8 +628,13 @@ class RouterDaemon(Daemon, metaclass=abc.ABCMeta):
 
     def build(self):
         cfg = super().build()
-        cfg.routerid = self._options.routerid if self._options.routerid \
-            else self._node.nconfig.routerid
+        if self._options.routerid:
+            cfg.routerid = self._options.routerid
+        else:
+            nconfig = self._node.nconfig
+            cfg.routerid = nconfig.routerid
+            InputRecorder.record(nconfig, 'routerid', nconfig.routerid,
+                                 lambda: nconfig.routerid)
         return cfg
 
     @abc.abstractmethod
@@ -1,6 +1,8 @@
 """Base classes to configure a BGP daemon"""
+import copy
 import heapq
-from typing import Sequence, TYPE_CHECKING, Optional, Union, Tuple, List, Set
+from typing import Sequence, TYPE_CHECKING, Optional, Union, Tuple, List, \
+    Set, Dict
 
 import itertools
 
@@ -358,6 +360,9 @@ class BGP(QuaggaDaemon):
                  *args, **kwargs):
         super().__init__(node=node, *args, **kwargs)
         self.port = port
+        # The names generated for the unnamed route maps of the node, kept
+        # when the configuration is built again
+        self._route_map_names = {}  # type: Dict[Tuple[int, str, str], str]
 
     def build(self):
         cfg = super().build()
@@ -365,6 +370,7 @@ class BGP(QuaggaDaemon):
         cfg.neighbors = self._build_neighbors()
         cfg.address_families = self._address_families(
             self.options.address_families, cfg.neighbors)
+        self._set_aggregates(cfg.address_families)
         cfg.access_lists = self.build_access_list()
         cfg.community_lists = self.build_community_list()
         cfg.route_maps = self.build_route_map(cfg.neighbors)
@@ -410,7 +416,8 @@ class BGP(QuaggaDaemon):
         node_route_maps = self._node.get('bgp_route_maps')
         route_maps = []  # type: List[RouteMap]
         if node_route_maps is not None:
-            for kwargs in node_route_maps:
+            for i, kwargs in enumerate(node_route_maps):
+                kwargs = dict(kwargs)
                 remote_peer = kwargs.pop('peer')
                 peers = []
                 for neighbor in neighbors:
@@ -419,6 +426,9 @@ class BGP(QuaggaDaemon):
                 for peer in peers:
                     kwargs['neighbor'] = peer
                     rm = RouteMap(**kwargs)
+                    if not kwargs.get('name'):
+                        rm.name = self._route_map_names.setdefault(
+                            (i, peer.node, peer.family), rm.name)
                     # If route map already exist, add conditions and actions
                     # to it
                     try:
@@ -452,10 +462,23 @@ class BGP(QuaggaDaemon):
     def _address_families(af: List['AddressFamily'], nei: List['Peer']) \
             -> List['AddressFamily']:
         """Complete the address families: add extra networks, or activate
-        neighbors. The default is to activate all given neighbors"""
+        neighbors. The default is to activate all given neighbors.
+        The address families of the options are copied so that the
+        configuration can be built again."""
+        families = []
         for a in af:
-            a.neighbors.extend(nei)
-        return af
+            a = copy.copy(a)
+            a.neighbors = a.neighbors + list(nei)
+            families.append(a)
+        return families
+
+    def _set_aggregates(self, af: List['AddressFamily']):
+        """Summarize the aggregates of the AS of the router in the address
+        families of their IP version (see IPNet.summarize_aggregates)"""
+        aggregates = self._node.get('bgp_aggregates', [])
+        for a in af:
+            version = 6 if a.name == 'ipv6' else 4
+            a.aggregates = [n for n in aggregates if n.version == version]
 
     @classmethod
     def get_config(cls, topo: 'IPTopo', node: 'RouterDescription', **kwargs):
@@ -471,6 +494,8 @@ class AddressFamily:
         self.networks = [ip_network(str(n)) for n in networks]
         self.redistribute = redistribute
         self.neighbors = []  # type: List[Peer]
+        # The prefixes advertised instead of their more specific ones
+        self.aggregates = []  # type: List[Union[IPv4Network, IPv6Network]]
 
 
 def AF_INET(*args, **kwargs):
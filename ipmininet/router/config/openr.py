@@ -76,8 +76,7 @@ class Openr(OpenrDaemon):
     def _build_prefixes(interfaces):
         ipv6_addresses = []
         for itf in interfaces:
-            ipv6_addresses += itf.addresses[6]
-        ipv6_addresses = filter(lambda x: not x.is_link_local, ipv6_addresses)
+            ipv6_addresses += itf.ip6s(exclude_lls=True, exclude_lbs=False)
         return ",".join(map(lambda x: x.with_prefixlen, ipv6_addresses))
 
     def set_defaults(self, defaults):
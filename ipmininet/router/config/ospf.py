@@ -56,8 +56,16 @@ class OSPF(QuaggaDaemon):
         interfaces = self._node.intfList()
         cfg.interfaces = self._build_interfaces(interfaces)
         cfg.networks = self._build_networks(interfaces)
+        cfg.area_ranges = self._build_area_ranges()
         return cfg
 
+    def _build_area_ranges(self, version=4) -> List[ConfigDict]:
+        """Return the summarized prefixes of the areas of the router (see
+        IPNet.summarize_aggregates)"""
+        return [ConfigDict(area=area, prefix=prefix)
+                for area, prefix in self._node.get('ospf_area_ranges', [])
+                if prefix.version == version]
+
     @staticmethod
     def _build_networks(interfaces: List[IPIntf]) -> List['OSPFNetwork']:
         """Return the list of OSPF networks to advertize from the list of
@@ -80,6 +88,8 @@ class OSPF(QuaggaDaemon):
                            hello_int=i.get('ospf_hello_int',
                                            self.options.hello_int),
                            cost=i.igp_metric,
+                           # RFC 3021 subnets have no broadcast address
+                           point_to_point=i.prefixLen == 31,
                            # Is the interface forcefully disabled?
                            passive=i.get('igp_passive', False))
                 for i in interfaces]
@@ -12,6 +12,9 @@ class OSPF6(OSPF):
     DEAD_INT = 3
     KILL_PATTERNS = (NAME,)
 
+    def _build_area_ranges(self, version=6):
+        return super()._build_area_ranges(version=version)
+
     def _build_interfaces(self, interfaces):
         """Return the list of OSPF6 interface properties from the list of
         active interfaces"""
@@ -1,12 +1,17 @@
+import copy
 from ipaddress import ip_address, IPv6Network, IPv6Address
-from typing import Sequence, Union
+from typing import Sequence, Union, List, TYPE_CHECKING
 
-from ipmininet.utils import find_node
+from ipmininet.utils import find_node, InputRecorder
 from ipmininet.utils import realIntfList
 from .base import RouterDaemon
+from .readiness import PidFileProbe
 from .utils import ConfigDict
 from ipmininet.utils import is_container
 
+if TYPE_CHECKING:
+    from ipmininet.link import IPIntf
+
 RA_DEFAULT_VALID = 86400
 RA_DEFAULT_PREF = 14400
 DEFAULT_ADV_RDNSS_LIFETIME = 25
@@ -74,33 +79,45 @@ class RADVD(RouterDaemon):
         # Update with preset defaults
         cfg.update(self.options)
         # Track interfaces
-        cfg.interfaces = (ConfigDict(name=itf.name, description=itf.describe,
-                                     ra_prefixes=itf.ra_prefixes,
-                                     rdnss_list=itf.rdnss_list)
+        cfg.interfaces = [ConfigDict(name=itf.name, description=itf.describe,
+                                     ra_prefixes=self._build_prefixes(itf),
+                                     rdnss_list=self._build_rdnss_list(itf))
                           for itf in realIntfList(self._node)
-                          if itf.ra_prefixes)
-        # Fill AdvConnectedPrefix prefixes
-        self._fill_connected_prefixes()
-        # Fill AdvRDNSS IP addresses
-        self._fill_rdnss_addresses()
+                          if itf.ra_prefixes]
         return cfg
 
-    def _fill_connected_prefixes(self):
-        for itf in realIntfList(self._node):
-            for ra_prefix in itf.ra_prefixes:
-                if isinstance(ra_prefix, AdvConnectedPrefix):
-                    for ip in itf.ip6s(exclude_lls=True):
-                        ra_prefix.prefixes.append(ip.network.with_prefixlen)
-
-    def _fill_rdnss_addresses(self):
-        for itf in realIntfList(self._node):
-            for rdnss in itf.rdnss_list:
-                if rdnss.ips is None:
-                    rdnss.ips = []
-                    dns = find_node(self._node, rdnss.node).node
-                    for dns_itf in realIntfList(dns):
-                        for ip in dns_itf.ip6s(exclude_lls=True):
-                            rdnss.ips.append(ip.ip.compressed)
+    @staticmethod
+    def _build_prefixes(itf: 'IPIntf') -> List[AdvPrefix]:
+        """Return copies of the advertised prefixes of an interface, filling
+        AdvConnectedPrefix prefixes"""
+        InputRecorder.record(itf, 'ra_prefixes', itf.ra_prefixes,
+                             lambda: itf.ra_prefixes)
+        ra_prefixes = []
+        for ra_prefix in itf.ra_prefixes:
+            ra_prefix = copy.copy(ra_prefix)
+            ra_prefix.prefixes = list(ra_prefix.prefixes)
+            if isinstance(ra_prefix, AdvConnectedPrefix):
+                for ip in itf.ip6s(exclude_lls=True):
+                    ra_prefix.prefixes.append(ip.network.with_prefixlen)
+            ra_prefixes.append(ra_prefix)
+        return ra_prefixes
+
+    def _build_rdnss_list(self, itf: 'IPIntf') -> List[AdvRDNSS]:
+        """Return copies of the advertised DNS servers of an interface,
+        filling the IP addresses of the servers given by node name"""
+        InputRecorder.record(itf, 'rdnss_list', itf.rdnss_list,
+                             lambda: itf.rdnss_list)
+        rdnss_list = []
+        for rdnss in itf.rdnss_list:
+            if rdnss.ips is None:
+                rdnss = copy.copy(rdnss)
+                rdnss.ips = []
+                dns = find_node(self._node, rdnss.node).node
+                for dns_itf in realIntfList(dns):
+                    for ip in dns_itf.ip6s(exclude_lls=True):
+                        rdnss.ips.append(ip.ip.compressed)
+            rdnss_list.append(rdnss)
+        return rdnss_list
 
     def set_defaults(self, defaults):
         """
@@ -122,6 +139,19 @@ class RADVD(RouterDaemon):
     def dry_run(self):
         return 'radvd -c -C {cfg} -u root'.format(cfg=self.cfg_filename)
 
+    def readiness_probe(self):
+        return PidFileProbe(self._file('pid'))
+
+    def reload(self, previous):
+        """Ask radvd to read its configuration file again"""
+        try:
+            with open(self._file('pid'), 'r') as f:
+                pid = int(f.read().strip())
+        except (IOError, OSError, ValueError):
+            return False
+        self._node._processes.call('kill -HUP %d' % pid)
+        return True
+
     def cleanup(self):
         try:
             with open(self._file('pid'), 'r') as f:
@@ -0,0 +1,219 @@
+"""This module defines the probes telling whether a daemon is ready, e.g., that
+it has created its API socket or its pid file. Waiting for a probe blocks on
+filesystem events (using inotify if available) instead of polling."""
+import abc
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import socket
+import time
+from typing import Callable, Optional
+
+from mininet.log import lg as log
+
+# inotify(7) flags
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                                use_errno=True)
+            _libc.inotify_init1  # Check that the symbol exists
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc
+
+
+class DaemonStartupError(RuntimeError):
+    """A daemon did not become ready"""
+
+
+class DirectoryWatch:
+    """Report the changes of the entries of a directory.
+    This uses inotify if available, otherwise it falls back to polling with
+    an exponential backoff."""
+
+    MASK = IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE | IN_ATTRIB
+    MIN_POLL = .001
+    MAX_POLL = .1
+
+    def __init__(self, path: str):
+        """:param path: The directory to watch"""
+        self.path = path
+        self.fd = -1
+        self._poll = self.MIN_POLL
+        libc = _load_libc()
+        if not libc:
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        if libc.inotify_add_watch(fd, os.fsencode(path), self.MASK) < 0:
+            log.debug('Cannot watch %s: %s\n'
+                      % (path, os.strerror(ctypes.get_errno())))
+            os.close(fd)
+            return
+        self.fd = fd
+
+    def wait(self, timeout: float):
+        """Block until an entry of the directory changes or until the timeout
+        expires. Spurious wake-ups can happen.
+
+        :param timeout: The maximal time to wait in seconds"""
+        if timeout <= 0:
+            return
+        if self.fd < 0:
+            time.sleep(min(self._poll, timeout))
+            self._poll = min(self._poll * 2, self.MAX_POLL)
+            return
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if r:
+            self._drain()
+
+    def _drain(self):
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ReadinessProbe(metaclass=abc.ABCMeta):
+    """Tell whether a daemon is ready"""
+
+    def reset(self):
+        """Called before the daemon is launched, e.g., to remove any
+        leftover of a previous run that would make the probe succeed"""
+
+    @abc.abstractmethod
+    def ready(self) -> bool:
+        """Return whether the daemon is ready, without blocking"""
+
+    def wait(self, timeout: float,
+             alive: Optional[Callable[[], bool]] = None) -> bool:
+        """Wait until the daemon is ready
+
+        :param timeout: The maximal time to wait in seconds
+        :param alive: A function returning whether the daemon can still
+                      become ready, e.g., that its process did not fail
+        :return: True iff the daemon is ready"""
+        deadline = time.time() + timeout
+        delay = DirectoryWatch.MIN_POLL
+        while not self.ready():
+            remaining = deadline - time.time()
+            if remaining <= 0 or (alive is not None and not alive()):
+                return self.ready()
+            time.sleep(min(remaining, delay))
+            delay = min(delay * 2, DirectoryWatch.MAX_POLL)
+        return True
+
+
+class FileProbe(ReadinessProbe):
+    """The daemon is ready once a given file exists"""
+
+    def __init__(self, path: str):
+        """:param path: The path of the file"""
+        self.path = os.path.abspath(path)
+
+    def ready(self) -> bool:
+        return os.path.exists(self.path)
+
+    def wait(self, timeout: float,
+             alive: Optional[Callable[[], bool]] = None) -> bool:
+        deadline = time.time() + timeout
+        # Register the watch before the first check to not miss any event
+        with DirectoryWatch(os.path.dirname(self.path)) as watch:
+            while not self.ready():
+                remaining = deadline - time.time()
+                if remaining <= 0 or (alive is not None and not alive()):
+                    return self.ready()
+                # Wake up regularly to check that the daemon is alive
+                watch.wait(min(remaining, 1))
+        return True
+
+    def __str__(self):
+        return 'file %s' % self.path
+
+
+class PidFileProbe(FileProbe):
+    """The daemon is ready once its pid file has been written"""
+
+    def reset(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def ready(self) -> bool:
+        try:
+            with open(self.path) as f:
+                pid = int(f.read().strip() or 0)
+        except (IOError, OSError, ValueError):
+            return False
+        if pid <= 0:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False  # Stale pid file
+        except PermissionError:
+            pass
+        return True
+
+    def __str__(self):
+        return 'pid file %s' % self.path
+
+
+class UnixSocketProbe(FileProbe):
+    """The daemon is ready once it accepts connections on a unix socket"""
+
+    reset = PidFileProbe.reset
+
+    def ready(self) -> bool:
+        if not super().ready():
+            return False
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+            return True
+        except socket.error:
+            return False
+        finally:
+            sock.close()
+
+    def wait(self, timeout: float,
+             alive: Optional[Callable[[], bool]] = None) -> bool:
+        deadline = time.time() + timeout
+        # Block until the socket file appears
+        if not FileProbe(self.path).wait(timeout, alive):
+            return False
+        # The socket can exist before the daemon listens on it
+        return ReadinessProbe.wait(self, max(0., deadline - time.time()),
+                                   alive)
+
+    def __str__(self):
+        return 'unix socket %s' % self.path
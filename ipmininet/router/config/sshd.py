@@ -5,6 +5,7 @@ import os
 import tempfile
 
 from .base import Daemon
+from .readiness import PidFileProbe
 
 
 # Generate a new ssh keypair at each run
@@ -40,4 +41,9 @@ class SSHd(Daemon):
     def build(self):
         cfg = super().build()
         cfg.authorized_keys = PUBKEY
+        cfg.pidfile = os.path.abspath(self._file('pid'))
         return cfg
+
+    def readiness_probe(self):
+        # The pid file is written once sshd listens for connections
+        return PidFileProbe(self._file('pid'))
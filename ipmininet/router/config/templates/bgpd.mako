@@ -33,6 +33,9 @@ router bgp ${node.bgpd.asn}
     % for net in af.networks:
     network ${net.with_prefixlen}
     % endfor
+    % for net in af.aggregates:
+    aggregate-address ${net.with_prefixlen} summary-only
+    % endfor
     % for r in af.redistribute:
     redistribute ${r}
     % endfor
@@ -34,6 +34,9 @@ router ospf6
   % for itf in node.ospf6d.interfaces:
   interface ${itf.name} area ${itf.area}
   % endfor
+  % for r in node.ospf6d.area_ranges:
+  area ${r.area} range ${r.prefix.with_prefixlen}
+  % endfor
 
   <%block name="router"/>
 !
@@ -15,6 +15,9 @@ interface ${intf.name}
   # Highest priority routers will be DR
   ip ospf priority ${intf.priority}
   ip ospf cost ${intf.cost}
+  % if intf.point_to_point:
+  ip ospf network point-to-point
+  % endif
   % if not intf.passive and intf.active:
   ip ospf dead-interval ${intf.dead_int}
   ip ospf hello-interval ${intf.hello_int}
@@ -31,6 +34,9 @@ router ospf
   % for net in node.ospfd.networks:
   network ${net.domain.with_prefixlen} area ${net.area}
   % endfor
+  % for r in node.ospfd.area_ranges:
+  area ${r.area} range ${r.prefix.with_prefixlen}
+  % endfor
   % for itf in node.ospfd.interfaces:
       % if itf.passive or not itf.active:
   passive-interface ${itf.name}
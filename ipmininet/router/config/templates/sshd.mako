@@ -1,4 +1,5 @@
 AuthorizedKeysFile ${node.sshd.authorized_keys}
+PidFile ${node.sshd.pidfile}
 UseDNS no
 StrictModes no
 UsePAM yes
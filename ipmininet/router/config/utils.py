@@ -1,6 +1,15 @@
 """This modules contains various utilities to streamline config generation"""
+import hashlib
+import os
+import sys
 from ipaddress import ip_interface, IPv6Address, IPv4Address
-from typing import Union
+from typing import Union, Optional
+
+import mako
+from mako.lookup import TemplateLookup
+from mininet.log import lg as log
+
+from ipmininet.utils import cache_dir
 
 
 class ConfigDict(dict):
@@ -36,3 +45,103 @@ def ip_statement(ip: Union[int, str, IPv6Address, IPv4Address]):
     if not isinstance(ip, int):
         ip = ip_interface(str(ip)).version
     return 'ipv6' if ip == 6 else 'ip'
+
+
+def template_module_directory(directory: str) -> Optional[str]:
+    """Return the directory where the templates of a directory are cached once
+    compiled. It is keyed by the versions of Mako and of the interpreter and
+    by the template files so that stale modules are never loaded.
+
+    :param directory: The directory of the templates
+    :return: The path of the directory or None if the cache is disabled"""
+    root = cache_dir()
+    if root is None:
+        return None
+    digest = hashlib.sha1(os.path.abspath(directory).encode())
+    for name in sorted(os.listdir(directory)):
+        st = os.stat(os.path.join(directory, name))
+        digest.update(('%s:%d:%d' % (name, st.st_size, st.st_mtime_ns))
+                      .encode())
+    return os.path.join(root, 'templates',
+                        'mako-%s-%s-%s' % (mako.__version__,
+                                           sys.implementation.cache_tag,
+                                           digest.hexdigest()[:16]))
+
+
+class CachedTemplateLookup(TemplateLookup):
+    """A template lookup whose templates are compiled at most once into a
+    module directory shared by all the processes
+    (see template_module_directory()). This directory is only chosen and
+    created when it is first needed, e.g., when the first template is looked
+    up. The templates are compiled in memory if it cannot be written."""
+
+    def __init__(self, directory: str):
+        """:param directory: The directory of the templates"""
+        self._module_directory = None  # type: Optional[str]
+        super().__init__(directories=[directory])
+        self._resolved = False
+
+    @property
+    def module_directory(self) -> Optional[str]:
+        if not self._resolved:
+            self.module_directory = \
+                self._writable(template_module_directory(self.directories[0]))
+        return self._module_directory
+
+    @module_directory.setter
+    def module_directory(self, path: Optional[str]):
+        self._module_directory = path
+        self._resolved = True
+        if hasattr(self, 'template_args'):
+            self.template_args['module_directory'] = path
+
+    @staticmethod
+    def _writable(path: Optional[str]) -> Optional[str]:
+        """Return the path of a directory if it can be created and written"""
+        if path is None:
+            return None
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError as e:
+            log.debug('Cannot cache the templates in %s: %s\n' % (path, e))
+            return None
+        if not os.access(path, os.W_OK | os.X_OK):
+            log.debug('Cannot cache the templates in %s: not writable\n'
+                      % path)
+            return None
+        return path
+
+    def get_template(self, uri):
+        self.module_directory  # Choose the module directory if needed
+        return super().get_template(uri)
+
+
+def template_lookup(directory: str) -> TemplateLookup:
+    """Return a template lookup for a directory whose templates are compiled
+    at most once into a module directory shared by all the processes
+    (see CachedTemplateLookup)
+
+    :param directory: The directory of the templates"""
+    return CachedTemplateLookup(directory)
+
+
+def precompile_templates(*lookups: TemplateLookup) -> int:
+    """Compile all the templates of some lookups in their module directory,
+    e.g., at install time
+
+    :param lookups: The template lookups, defaults to the ones of the router
+                    and host daemons
+    :return: The number of compiled templates"""
+    if not lookups:
+        from .base import router_template_lookup
+        from ipmininet.host.config.base import host_template_lookup
+        lookups = (router_template_lookup, host_template_lookup)
+
+    count = 0
+    for lookup in lookups:
+        for directory in lookup.directories:
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.mako'):
+                    lookup.get_template(name)
+                    count += 1
+    return count
@@ -0,0 +1,117 @@
+"""This module computes the vtysh commands that turn the configuration of a
+running FRRouting daemon into a new one, so that it can be applied without
+restarting the daemon (see QuaggaDaemon.reload)"""
+from typing import Dict, List, Tuple
+
+# The commands opening a context at the root of the configuration
+CONTEXTS = ('interface ', 'router ', 'route-map ', 'line ', 'vrf ',
+            'key chain ')
+# The contexts that are removed at once instead of line by line
+REMOVABLE_CONTEXTS = ('router ', 'route-map ', 'key chain ')
+# The commands opening a context nested in the current one
+NESTED_CONTEXTS = ('address-family ',)
+# The commands closing a nested context
+NESTED_CONTEXT_ENDS = ('exit-address-family', 'exit')
+# The single-line commands that belong to the root of the configuration,
+# wherever they appear
+ROOT_COMMANDS = ('hostname ', 'password ', 'enable password ', 'log ',
+                 'debug ', 'access-list ', 'ip access-list ',
+                 'ipv6 access-list ', 'ip prefix-list ', 'ipv6 prefix-list ',
+                 'ip community-list ', 'bgp community-list ', 'ip as-path ',
+                 'bgp as-path ', 'ip route ', 'ipv6 route ', 'ip protocol ',
+                 'ipv6 protocol ', 'ip multicast-routing', 'frr ', 'service ')
+
+# A context is the sequence of the commands opening it, the root is ()
+Context = Tuple[str, ...]
+
+
+def parse_config(content: str) -> Dict[Context, List[str]]:
+    """Split an FRRouting configuration into the commands of each of its
+    contexts. Comments, blank lines and duplicate commands are left out, and
+    the whitespaces of the commands are normalized.
+
+    :param content: The configuration
+    :return: The commands of each context, by context in order of
+             appearance"""
+    contexts = {(): {}}  # type: Dict[Context, Dict[str, None]]
+    context = ()  # type: Context
+    for line in content.splitlines():
+        line = ' '.join(line.split())
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('!') or line == 'end':
+            context = ()
+            continue
+        if line.startswith(CONTEXTS):
+            context = (line,)
+            contexts.setdefault(context, {})
+        elif context and line.startswith(NESTED_CONTEXTS):
+            context = context[:1] + (line,)
+            contexts.setdefault(context, {})
+        elif line in NESTED_CONTEXT_ENDS:
+            context = context[:-1]
+        elif line.startswith(ROOT_COMMANDS):
+            context = ()
+            contexts[context][line] = None
+        else:
+            contexts[context][line] = None
+    return {c: list(commands) for c, commands in contexts.items()}
+
+
+def negate(command: str) -> str:
+    """Return the command undoing another one"""
+    return command[3:] if command.startswith('no ') else 'no ' + command
+
+
+def _replaced(command: str, commands: List[str]) -> bool:
+    """Return whether a command does not need to be undone since another one
+    of the commands overrides it. Undoing the AS number of a BGP neighbor
+    would remove the neighbor and all its other commands."""
+    words = command.split()
+    if len(words) != 4 or words[0] != 'neighbor' or words[2] != 'remote-as':
+        return False
+    prefix = ' '.join(words[:3]) + ' '
+    return any(c.startswith(prefix) for c in commands)
+
+
+def config_diff(old: str, new: str) -> List[str]:
+    """Return the vtysh commands that turn a configuration into another one.
+    The commands undoing the old configuration come first, from its last
+    context to its first one, then the commands of the new configuration
+    that are not in the old one. Each context is entered from the root of the
+    configuration, i.e., each of its blocks is enclosed between
+    'configure terminal' and 'end'.
+
+    :param old: The configuration that the daemon runs
+    :param new: The configuration to apply
+    :return: The commands to run, or an empty list if nothing changed"""
+    old_contexts = parse_config(old)
+    new_contexts = parse_config(new)
+    blocks = []  # type: List[Tuple[Context, List[str]]]
+    for context in reversed(list(old_contexts)):
+        if context in new_contexts:
+            added = set(new_contexts[context])
+            removed = [negate(c) for c in reversed(old_contexts[context])
+                       if c not in added and negate(c) not in added
+                       and not _replaced(c, new_contexts[context])]
+            if removed:
+                blocks.append((context, removed))
+        elif context[:1] in new_contexts or len(context) == 1:
+            if len(context) == 1 and context[0].startswith(REMOVABLE_CONTEXTS):
+                blocks.append(((), [negate(context[0])]))
+            else:
+                blocks.append((context, [negate(c) for c in
+                                         reversed(old_contexts[context])]))
+    for context, commands in new_contexts.items():
+        existing = set(old_contexts.get(context, ()))
+        added = [c for c in commands if c not in existing]
+        if added or context not in old_contexts:
+            blocks.append((context, added))
+    diff = []  # type: List[str]
+    for context, commands in blocks:
+        if context or commands:
+            diff.append('configure terminal')
+            diff.extend(context)
+            diff.extend(commands)
+            diff.append('end')
+    return diff
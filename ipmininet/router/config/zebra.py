@@ -1,10 +1,14 @@
 import os
-import socket
 from ipaddress import IPv4Network, IPv6Network
 from typing import Optional, Union, Sequence, Tuple
 
+from mininet.log import lg as log
+
+from ipmininet.utils import has_cmd
 from .base import RouterDaemon
+from .readiness import PidFileProbe, UnixSocketProbe
 from .utils import ConfigDict
+from .vtysh import config_diff
 
 #  Route Map actions
 DENY = 'deny'
@@ -19,12 +23,13 @@ class QuaggaDaemon(RouterDaemon):
 
     @property
     def startup_line(self):
-        return '{name} -f {cfg} -i {pid} -z {api} -u root {extra}'\
-                .format(name=self.NAME,
-                        cfg=self.cfg_filename,
-                        pid=self._file('pid'),
-                        api=self.zebra_socket,
-                        extra=self.STARTUP_LINE_EXTRA)
+        return '{name} -f {cfg} -i {pid} -z {api} --vty_socket {vty} ' \
+               '-u root {extra}'.format(name=self.NAME,
+                                        cfg=self.cfg_filename,
+                                        pid=self._file('pid'),
+                                        api=self.zebra_socket,
+                                        vty=self.vty_socket_dir,
+                                        extra=self.STARTUP_LINE_EXTRA)
 
     @property
     def zebra_socket(self):
@@ -32,16 +37,67 @@ class QuaggaDaemon(RouterDaemon):
         return os.path.join(self._node.cwd,
                             '%s_%s.api' % ('quagga', self._node.name))
 
+    @property
+    def vty_socket_dir(self) -> str:
+        """Return the path towards the directory of the vty sockets of the
+        daemons of the given node"""
+        return os.path.join(self._node.cwd,
+                            '%s_%s.vty' % ('quagga', self._node.name))
+
     def build(self):
         cfg = super().build()
         cfg.debug = self.options.debug
+        os.makedirs(self.vty_socket_dir, exist_ok=True)
         return cfg
 
+    def vtysh(self, *commands: str) -> Tuple[str, str, int]:
+        """Run commands on this daemon through vtysh
+
+        :param commands: The commands to run, in order
+        :return: the stdout, stderr and return code of vtysh"""
+        cmd = ['vtysh', '--vty_socket', self.vty_socket_dir, '-d', self.NAME]
+        for c in commands:
+            cmd.extend(('-c', c))
+        return self._node._processes.pexec(cmd)
+
+    def reload(self, previous):
+        """Push the commands that turn the running configuration into the
+        new one through vtysh (see ipmininet.router.config.vtysh)"""
+        running = previous.get(self.cfg_filename)
+        if running is None or not has_cmd('vtysh'):
+            return False
+        with open(self.cfg_filename) as f:
+            commands = config_diff(running, f.read())
+        if not commands:
+            return True
+        out, err, code = self.vtysh(*commands)
+        errors = [line for line in (out + err).splitlines()
+                  if line.startswith('%')]
+        if code or errors:
+            log.warning('Cannot reconfigure %s on %s through vtysh '
+                        '[rcode: %s]: %s\n'
+                        % (self.NAME, self._node.name, code,
+                           ' '.join(errors) or err))
+            return False
+        return True
+
+    def cleanup(self):
+        try:
+            os.unlink(os.path.join(self.vty_socket_dir, '%s.vty' % self.NAME))
+            os.rmdir(self.vty_socket_dir)
+        except OSError:
+            pass  # Sockets of other daemons or already removed
+        super().cleanup()
+
     def set_defaults(self, defaults):
         """:param debug: the set of debug events that should be logged"""
         defaults.debug = ()
         super().set_defaults(defaults)
 
+    def readiness_probe(self):
+        # The pid file is written once the configuration is loaded
+        return PidFileProbe(self._file('pid'))
+
     @property
     def dry_run(self):
         return '{name} -Cf {cfg} -u root'\
@@ -66,9 +122,9 @@ class Zebra(QuaggaDaemon):
         # Update with preset defaults
         cfg.update(self.options)
         # Track interfaces
-        cfg.interfaces = (ConfigDict(name=itf.name,
+        cfg.interfaces = [ConfigDict(name=itf.name,
                                      description=itf.describe)
-                          for itf in self._node.intfList())
+                          for itf in self._node.intfList()]
         return cfg
 
     def set_defaults(self, defaults):
@@ -80,19 +136,12 @@ class Zebra(QuaggaDaemon):
         defaults.route_maps = []
         super().set_defaults(defaults)
 
-    def has_started(self):
-        # We override this such that we wait until we have the API socket
-        # and until wa can connect to it
-        return os.path.exists(self.zebra_socket) and self.listening()
+    def readiness_probe(self):
+        # We wait until we have the API socket and until we can connect to it
+        return UnixSocketProbe(self.zebra_socket)
 
     def listening(self) -> bool:
-        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        try:
-            sock.connect(self.zebra_socket)
-            sock.close()
-            return True
-        except socket.error:
-            return False
+        return self.readiness_probe().ready()
 
 
 class CommunityList:
@@ -0,0 +1,196 @@
+"""This module schedules the startup of the nodes of a network. The daemons of
+every node are organized in a dependency graph so that independent nodes and
+independent daemons can be started concurrently."""
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Sequence, Set, \
+    TYPE_CHECKING
+
+import mininet.clean
+from mininet.log import lg as log
+
+from ipmininet.render import ConfigRenderer
+from ipmininet.validation import CheckCache, ConfigValidator
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+
+
+class StartupTask:
+    """A unit of work of the network startup, e.g., starting one daemon"""
+
+    def __init__(self, name: str, node: 'IPNode', action: Callable[[], None],
+                 depends: Sequence['StartupTask'] = ()):
+        """:param name: The name of the task
+        :param node: The node on which this task operates
+        :param action: The function to call to run the task
+        :param depends: The tasks that have to be completed before this one
+                        can run"""
+        self.name = name
+        self.node = node
+        self.action = action
+        self.depends = list(depends)
+        self.dependents = []  # type: List[StartupTask]
+        for t in self.depends:
+            t.dependents.append(self)
+
+    def run(self):
+        self.action()
+
+    def __repr__(self):
+        return '<StartupTask %s>' % self.name
+
+
+class StartupScheduler:
+    """Start a set of nodes and their daemons, using up to max_workers
+    threads.
+
+    The configurations of all nodes are first built, then checked, before any
+    daemon is started (see ConfigValidator). Then, the sysctls of each node
+    and every daemon of every node become tasks of a dependency graph:
+    a daemon waits for the sysctls of its node, for the daemons listed in its
+    Daemon.DEPENDS and for the daemons of the same node that have a lower
+    Daemon.PRIO, e.g., zebra is always ready before ospfd or bgpd are started.
+    Daemons of different nodes do not depend on each other."""
+
+    def __init__(self, max_workers=1,
+                 validation_workers: Optional[int] = None,
+                 check_cache: Optional[CheckCache] = None,
+                 renderer: Optional[ConfigRenderer] = None):
+        """:param max_workers: The maximal number of tasks that can be run at
+                               the same time
+        :param validation_workers: The maximal number of configuration checks
+                                   that can be run at the same time, defaults
+                                   to the number of CPUs
+        :param check_cache: The cache of the successful configuration
+                            checks
+        :param renderer: The renderer of the configurations, the nodes
+                         build their own configuration one after the other
+                         if not set"""
+        self.max_workers = max(1, max_workers)
+        self.validation_workers = validation_workers
+        self.check_cache = check_cache
+        self.renderer = renderer
+        # The time needed to check all the configurations
+        self.validation_time = 0.
+        # The time needed by each node to have all its daemons started
+        self.ready_time = {}  # type: Dict[str, float]
+        self._start_time = 0.
+        # The number of daemons left to start for each node
+        self._pending = {}  # type: Dict[str, int]
+        self._daemon_tasks = set()  # type: Set[StartupTask]
+
+    def start(self, nodes: Sequence['IPNode']):
+        """Configure and start the nodes
+
+        :param nodes: The nodes to start"""
+        self._start_time = time.time()
+        self.ready_time.clear()
+        self._pending.clear()
+        log.info('*** Building configurations\n')
+        if self.renderer is not None:
+            self.renderer.render(nodes)
+            log.info('*** Configurations built in %.3fs\n'
+                     % self.renderer.duration)
+        else:
+            for n in nodes:
+                log.info(n.name + ' ')
+                n.build_config()
+            log.info('\n')
+        log.info('*** Checking configurations\n')
+        validator = ConfigValidator(max_workers=self.validation_workers,
+                                    cache=self.check_cache)
+        failures = validator.validate(nodes)
+        self.validation_time = validator.duration
+        log.info('*** Configurations checked in %.3fs '
+                 '(%d cached, %d checked)\n'
+                 % (self.validation_time, validator.hits, validator.misses))
+        if failures:
+            log.error(validator.report(failures))
+            log.error('Config checks failed, aborting!\n')
+            mininet.clean.cleanup()
+            sys.exit(1)
+        log.info('*** Starting daemons\n')
+        tasks = []  # type: List[StartupTask]
+        for n in nodes:
+            tasks.extend(self.daemon_tasks(n))
+        self.run(tasks)
+        log.info('\n')
+        for n in nodes:
+            log.debug('*** %s ready after %.3fs\n'
+                      % (n.name, self.ready_time[n.name]))
+        if self.ready_time:
+            last = max(self.ready_time, key=self.ready_time.get)
+            log.info('*** All nodes ready after %.3fs (last one: %s)\n'
+                     % (self.ready_time[last], last))
+
+    def daemon_tasks(self, node: 'IPNode') -> List[StartupTask]:
+        """Return the tasks setting the sysctls of a node and starting each
+        of its daemons, linked by their dependencies
+
+        :param node: The node whose daemons have been built"""
+        sysctl = StartupTask('%s:sysctl' % node.name, node, node.set_sysctls)
+        tasks = []  # type: List[StartupTask]
+        by_name = {}  # type: Dict[str, StartupTask]
+        daemons = node.nconfig.daemons
+        for d in daemons:
+            # Daemons are sorted by priority
+            deps = [sysctl]
+            deps.extend(t for prev, t in zip(daemons, tasks)
+                        if prev.PRIO < d.PRIO)
+            deps.extend(by_name[c.NAME] for c in d.DEPENDS
+                        if c.NAME in by_name and by_name[c.NAME] not in deps)
+            t = StartupTask('%s:%s' % (node.name, d.NAME), node,
+                            self._daemon_action(node, d), depends=deps)
+            by_name[d.NAME] = t
+            tasks.append(t)
+        self._daemon_tasks.update(tasks)
+        self._pending[node.name] = len(tasks)
+        if not tasks:
+            self._node_ready(node)
+        return [sysctl] + tasks
+
+    @staticmethod
+    def _daemon_action(node: 'IPNode', daemon) -> Callable[[], None]:
+        return lambda: node.start_daemon(daemon)
+
+    def _node_ready(self, node: 'IPNode'):
+        self.ready_time[node.name] = time.time() - self._start_time
+        log.info(node.name + ' ')
+
+    def run(self, tasks: Sequence[StartupTask]):
+        """Run a set of tasks, respecting their dependencies.
+        If a task fails, no new task is started and its exception is raised
+        once the running tasks are over.
+
+        :param tasks: The tasks to run, all their dependencies must be in
+                      this sequence"""
+        remaining = {t: len(t.depends) for t in tasks}
+        # Tasks that are made available by a completed one are started first
+        # in order to have a node ready as soon as possible.
+        ready = deque(t for t in tasks if not t.depends)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = {}
+            while ready or running:
+                while ready and len(running) < self.max_workers:
+                    t = ready.popleft()
+                    running[pool.submit(t.run)] = t
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for f in done:
+                    t = running.pop(f)
+                    f.result()
+                    for dep in reversed(t.dependents):
+                        remaining[dep] -= 1
+                        if remaining[dep] == 0:
+                            ready.appendleft(dep)
+                    self._task_done(t)
+
+    def _task_done(self, task: StartupTask):
+        if task not in self._daemon_tasks:
+            return
+        self._daemon_tasks.discard(task)
+        self._pending[task.node.name] -= 1
+        if self._pending[task.node.name] == 0:
+            self._node_ready(task.node)
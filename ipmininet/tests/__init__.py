@@ -3,3 +3,7 @@ import os
 
 require_root = pytest.mark.skipif(
         os.getuid() != 0, reason='Running this test requires to be root')
+
+require_benchmark = pytest.mark.skipif(
+        not os.environ.get('IPMININET_BENCHMARK'),
+        reason='Set IPMININET_BENCHMARK=1 to run the benchmarks')
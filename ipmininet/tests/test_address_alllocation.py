@@ -1,3 +1,5 @@
+from ipaddress import ip_interface
+
 import pytest
 
 from ipmininet.clean import cleanup
@@ -5,6 +7,8 @@ from ipmininet.examples.simple_bgp_network import SimpleBGPTopo
 from ipmininet.examples.simple_ospf_network import SimpleOSPFNet
 from ipmininet.examples.simple_ospfv3_network import SimpleOSPFv3Net
 from ipmininet.ipnet import IPNet
+from ipmininet.iptopo import IPTopo
+from ipmininet.offline import OfflineNet
 from ipmininet.tests import require_root
 
 
@@ -43,3 +47,167 @@ def test_v4_and_v6_only_network(topo, use_v4, use_v6):
         net.stop()
     finally:
         cleanup()
+
+
+class RuntimeTopo(IPTopo):
+
+    def build(self, *args, **kwargs):
+        r1, r2 = self.addRouters('r1', 'r2')
+        s1 = self.addSwitch('s1')
+        h1 = self.addHost('h1')
+        self.addLinks((r1, r2), (r1, s1), (s1, h1))
+        super().build(*args, **kwargs)
+
+
+def subnet_of(node):
+    return ip_interface('%s/%s' % (node.defaultIntf().ip,
+                                   node.defaultIntf().prefixLen)).network
+
+
+@require_root
+def test_runtime_topology_changes():
+    try:
+        net = IPNet(topo=RuntimeTopo())
+        net.build()
+        n_domains = len(net.broadcast_domains)
+        lan = subnet_of(net['h1'])
+
+        # A new host on the LAN gets an address of its subnet
+        h2 = net.addHost('h2')
+        net.addLink(h2, net['s1'])
+        assert len(net.broadcast_domains) == n_domains
+        assert subnet_of(h2) == lan
+        assert net.node_for_ip(h2.defaultIntf().ip) is h2
+        assert net['h1'].defaultIntf().broadcast_domain \
+            is h2.defaultIntf().broadcast_domain
+
+        # A new router gets a loopback and a new subnet on its link
+        r3 = net.addRouter('r3')
+        net.addLink(r3, net['r2'])
+        assert len(net.broadcast_domains) == n_domains + 2
+        assert r3.intf('lo').broadcast_domain.net is not None
+        subnets = {d.net for d in net.broadcast_domains}
+        assert len(subnets) == len(net.broadcast_domains)
+
+        # Removing a host keeps the subnet of the LAN
+        h1_ip = net['h1'].defaultIntf().ip
+        net.delLink(net.linksBetween(net['s1'], net['h1'])[0])
+        assert subnet_of(h2) == lan
+        with pytest.raises(KeyError):
+            net.node_for_ip(h1_ip)
+        # Its address is still matched to the subnet of the LAN
+        assert net.subnet_for_ip(h1_ip) == \
+            (lan, h2.defaultIntf().broadcast_domain)
+
+        # Removing a point-to-point link removes its domain
+        net.delLink(net.linksBetween(net['r1'], net['r2'])[0])
+        assert len(net.broadcast_domains) == n_domains + 1
+        net.stop()
+    finally:
+        cleanup()
+
+
+def addresses_of(net):
+    return {(n, itf.name): sorted(ip.with_prefixlen for ip in
+                                  list(itf.ips())
+                                  + list(itf.ip6s(exclude_lls=True)))
+            for n in net for itf in net[n].intfList()}
+
+
+@require_root
+def test_cached_allocation(monkeypatch, tmpdir):
+    monkeypatch.setenv('IPMININET_CACHE_DIR', str(tmpdir))
+    runs = []
+    try:
+        for _ in range(2):
+            net = IPNet(topo=SimpleBGPTopo(), cache_allocation=True)
+            net.build()
+            runs.append((net.metrics['allocation_cached'],
+                         addresses_of(net),
+                         sorted(len(d.interfaces)
+                                for d in net.broadcast_domains)))
+            net.stop()
+            cleanup()
+    finally:
+        cleanup()
+    # The second run applies the plan of the first one
+    assert [r[0] for r in runs] == [False, True]
+    assert runs[0][1:] == runs[1][1:]
+
+
+def test_point_to_point_packing(tmpdir):
+    net = OfflineNet(topo=RuntimeTopo(), cwd=str(tmpdir),
+                     pack_v4_p2p=True, pack_v6_p2p=True)
+    r1, r2 = net['r1'], net['r2']
+    link = net.linksBetween(r1, r2)[0]
+    domain = link.intf1.broadcast_domain
+    assert domain.net.prefixlen == 31 and domain.net6.prefixlen == 127
+    # Both addresses of the subnets are used
+    assert {link.intf1.ip, link.intf2.ip} == \
+        {str(ip) for ip in domain.net}
+    assert {link.intf1.ip6, link.intf2.ip6} == \
+        {str(ip) for ip in domain.net6}
+    # The LAN and the loopbacks keep their usual subnets
+    assert subnet_of(net['h1']).prefixlen == net.max_v4_prefixlen
+    assert r1.intf('lo').broadcast_domain.net.prefixlen == \
+        net.max_v4_prefixlen
+
+    # Links added at runtime are packed as well
+    r3 = net.addRouter('r3')
+    link = net.addLink(r3, r2)
+    assert link.intf1.broadcast_domain.net.prefixlen == 31
+    assert link.intf1.ip != link.intf2.ip
+    net.render()
+    assert 'ip ospf network point-to-point' in \
+        tmpdir.join('ospfd_r3.cfg').read()
+    net.stop()
+
+
+@pytest.mark.parametrize("aggregate_by", [('area',), ('as', 'area')])
+def test_aggregated_allocation(aggregate_by, tmpdir, monkeypatch):
+    monkeypatch.setenv('IPMININET_CACHE_DIR', str(tmpdir))
+    topo = SimpleOSPFNet() if aggregate_by == ('area',) else SimpleBGPTopo()
+    runs = []
+    for _ in range(2):
+        net = OfflineNet(topo=topo, cwd=str(tmpdir), aggregate_by=aggregate_by,
+                         summarize_aggregates=True, cache_allocation=True)
+        runs.append((net.metrics['allocation_cached'], net.aggregates,
+                     {d.net for d in net.broadcast_domains}))
+        blocks = [b for _, b in net.aggregates]
+        assert blocks
+        for path, block in net.aggregates:
+            keys = dict(path)
+            # The blocks of a level never overlap
+            assert not any(block.overlaps(b) for p, b in net.aggregates
+                           if b is not block and len(p) == len(path))
+            for d in net.broadcast_domains:
+                if all(d.aggregate_key(level) == key for level, key in path):
+                    net_d = d.net if block.version == 4 else d.net6
+                    assert net_d is None or net_d.subnet_of(block)
+            # The block is summarized by the routers of its group
+            if path[-1][0] == 'area':
+                assert any((keys['area'], block) in
+                           r.get('ospf_area_ranges', []) for r in net.routers)
+            else:
+                assert all(block in r.get('bgp_aggregates', [])
+                           for r in net.routers if r.asn == keys['as'])
+        net.stop()
+    assert [r[0] for r in runs] == [False, True]
+    assert runs[0][1:] == runs[1][1:]
+
+
+def test_aggregated_configurations(tmpdir):
+    net = OfflineNet(topo=SimpleBGPTopo(), cwd=str(tmpdir),
+                     aggregate_by=('as', 'area'), summarize_aggregates=True)
+    net.render()
+    as2 = [b for p, b in net.aggregates if p == (('as', 2),)]
+    assert len(as2) == 2
+    bgpd = tmpdir.join('bgpd_as2r1.cfg').read()
+    ospfd = tmpdir.join('ospfd_as2r1.cfg').read()
+    for block in as2:
+        assert 'aggregate-address %s summary-only' % block.with_prefixlen \
+            in bgpd
+    assert 'area 0.0.0.0 range %s' % \
+        next(b for b in as2 if b.version == 4).with_prefixlen in ospfd
+    with pytest.raises(ValueError):
+        OfflineNet(topo=SimpleBGPTopo(), aggregate_by=('area', 'as'))
@@ -0,0 +1,143 @@
+"""This module tests the buddy allocator of subnets"""
+import time
+from ipaddress import ip_network
+
+import pytest
+
+from ipmininet.allocator import PrefixIndex, PrefixTrie, SubnetAllocator
+from . import require_benchmark
+
+
+def assert_disjoint(nets):
+    nets = sorted(nets, key=lambda n: n.network_address)
+    for a, b in zip(nets, nets[1:]):
+        assert not a.overlaps(b), "%s overlaps %s" % (a, b)
+
+
+@pytest.mark.parametrize("base,prefixlens,expected", [
+    ("192.168.0.0/16", [24, 24, 24],
+     ["192.168.0.0/24", "192.168.1.0/24", "192.168.2.0/24"]),
+    # Smaller domains reuse the halves split by the bigger ones
+    ("192.168.0.0/16", [24, 25, 26, 30],
+     ["192.168.0.0/24", "192.168.1.0/25", "192.168.1.128/26",
+      "192.168.1.192/30"]),
+    ("fc00::/7", [48, 48, 64],
+     ["fc00::/48", "fc00:0:1::/48", "fc00:0:2::/64"]),
+])
+def test_allocate(base, prefixlens, expected):
+    allocator = SubnetAllocator([ip_network(base)])
+    assert [allocator.allocate(p) for p in prefixlens] == \
+        [ip_network(n) for n in expected]
+
+
+def test_reserved():
+    reserved = [ip_network("192.168.0.0/24"), ip_network("192.168.0.128/25"),
+                ip_network("192.168.2.0/23"), ip_network("10.0.0.0/8")]
+    allocator = SubnetAllocator([ip_network("192.168.0.0/16")],
+                                reserved=reserved)
+    allocated = [allocator.allocate(24) for _ in range(3)]
+    assert allocated == [ip_network("192.168.1.0/24"),
+                         ip_network("192.168.4.0/24"),
+                         ip_network("192.168.5.0/24")]
+    assert_disjoint(allocated + reserved[:1] + reserved[2:3]
+                    + allocator.free_subnets())
+
+
+def test_release():
+    base = ip_network("192.168.0.0/16")
+    allocator = SubnetAllocator([base])
+    allocated = [allocator.allocate(24) for _ in range(5)]
+    for net in allocated:
+        allocator.release(net)
+    assert allocator.free_subnets() == [base]
+
+
+def test_exhausted():
+    allocator = SubnetAllocator([ip_network("192.168.0.0/30")])
+    for _ in range(4):
+        allocator.allocate(32)
+    assert allocator.largest_prefixlen() is None
+    with pytest.raises(ValueError):
+        allocator.allocate(32)
+
+
+def test_prefix_index():
+    index = PrefixIndex(["10.0.0.0/16", "10.0.1.0/24", "10.2.0.0/24",
+                         "2001:db8::/32"])
+    assert "10.0.1.0/24" in index and "10.0.2.0/24" not in index
+    assert index.maximal() == [ip_network("10.0.0.0/16"),
+                               ip_network("10.2.0.0/24"),
+                               ip_network("2001:db8::/32")]
+    assert index.covers("10.0.3.0/24") and not index.covers("10.2.0.0/23")
+    assert index.overlaps("10.2.0.0/23") and not index.overlaps("10.1.0.0/24")
+    assert index.overlaps("2001::/16") and not index.overlaps("2002::/16")
+    assert index.conflicts("10.0.1.0/25") == [ip_network("10.0.0.0/16"),
+                                              ip_network("10.0.1.0/24")]
+    assert index.next_free("10.0.0.0/8", 16) == ip_network("10.1.0.0/16")
+    assert index.next_free("10.2.0.0/23", 24) == ip_network("10.2.1.0/24")
+    assert index.next_free("10.2.0.0/24", 24) is None
+
+    # Removing a prefix exposes the ones that it contained
+    index.discard("10.0.0.0/16")
+    assert index.maximal()[:2] == [ip_network("10.0.1.0/24"),
+                                   ip_network("10.2.0.0/24")]
+    assert not index.overlaps("10.0.0.0/24")
+    assert len(index) == 3
+
+
+def test_prefix_trie():
+    trie = PrefixTrie([("10.0.0.0/8", "a"), ("10.0.0.0/24", "b"),
+                       ("10.0.0.1/32", "c"), ("2001:db8::/32", "d")])
+    assert len(trie) == 4 and "10.0.0.0/24" in trie
+    assert trie.longest_match("10.0.0.1") == (ip_network("10.0.0.1/32"), "c")
+    # The prefix length of an interface is ignored
+    assert trie.longest_match("10.0.0.2/8") == \
+        (ip_network("10.0.0.0/24"), "b")
+    assert [v for _, v in trie.matches("10.0.0.1")] == ["c", "b", "a"]
+    assert trie.longest_match("2001:db8::1")[1] == "d"
+    assert trie.longest_match("11.0.0.1") is None
+    assert list(trie) == [ip_network("10.0.0.0/8"), ip_network("10.0.0.0/24"),
+                          ip_network("10.0.0.1/32"),
+                          ip_network("2001:db8::/32")]
+
+    del trie["10.0.0.0/24"]
+    assert trie.longest_match("10.0.0.2") == (ip_network("10.0.0.0/8"), "a")
+    assert trie.get("10.0.0.0/24") is None
+    with pytest.raises(KeyError):
+        del trie["10.0.0.0/24"]
+    assert trie.setdefault("10.0.0.0/24", "e") == "e"
+    assert len(trie) == 4
+
+
+@pytest.mark.parametrize("base,prefixlen", [
+    ("10.0.0.0/8", 30),
+    ("fc00::/7", 48),
+])
+def test_allocation_packing(base, prefixlen):
+    """Allocate many broadcast domains of the same size"""
+    allocator = SubnetAllocator([ip_network(base)])
+    allocated = [allocator.allocate(prefixlen) for _ in range(1000)]
+    # The allocations are perfectly packed
+    assert int(allocated[-1].network_address) \
+        - int(allocated[0].network_address) \
+        == (1000 - 1) * allocated[0].num_addresses
+    assert_disjoint(allocated)
+
+
+@pytest.mark.parametrize("base,prefixlen", [
+    ("10.0.0.0/8", 30),
+    ("fc00::/7", 48),
+])
+@require_benchmark
+def test_allocation_benchmark(base, prefixlen, capsys):
+    """Allocate 100k broadcast domains and report the time taken"""
+    allocator = SubnetAllocator([ip_network(base)])
+    start = time.time()
+    allocated = [allocator.allocate(prefixlen) for _ in range(100000)]
+    elapsed = time.time() - start
+    with capsys.disabled():
+        print("\nAllocated 100k /%d in %s in %.3fs" % (prefixlen, base,
+                                                     elapsed))
+    assert int(allocated[-1].network_address) \
+        - int(allocated[0].network_address) \
+        == (100000 - 1) * allocated[0].num_addresses
@@ -4,7 +4,7 @@ from ipaddress import ip_interface
 from ipmininet.clean import cleanup
 from ipmininet.examples.static_address_network import StaticAddressNet
 from ipmininet.ipnet import IPNet
-from ipmininet.link import OrderedAddress
+from ipmininet.link import IPBatch, OrderedAddress, make_veth_pairs
 from ipmininet.tests import require_root
 
 
@@ -75,3 +75,55 @@ def test_addr_intf():
         net.stop()
     finally:
         cleanup()
+
+
+@require_root
+def test_ip_batch():
+    try:
+        net = IPNet(topo=StaticAddressNet())
+        net.start()
+        r1 = net["r1"]
+        itf1 = r1.intf("r1-eth1")
+        itf2 = r1.intf("r1-eth2")
+        lls = list(itf1.ip6s(exclude_lls=False))
+
+        # All the changes are only applied when the batch is run
+        with IPBatch(r1) as batch:
+            itf1.setIP(["10.1.2.1/24", "10.1.3.1/24", "2001:21::1/64"],
+                       batch=batch)
+            itf2.setIP6("2001:22::1/48", batch=batch)
+            assert len(batch) > 0
+            assert "10.1.3.1" not in r1.cmd("ip address show")
+        assert sorted(ip.with_prefixlen for ip in itf1.ips()) == \
+            ["10.1.2.1/24", "10.1.3.1/24"]
+        assert [ip.with_prefixlen for ip in itf1.ip6s(exclude_lls=True)] == \
+            ["2001:21::1/64"]
+        assert [ip.with_prefixlen for ip in itf2.ip6s(exclude_lls=True)] == \
+            ["2001:22::1/48"]
+        # Link-local addresses are kept
+        assert [ip for ip in itf1.ip6s(exclude_lls=False)
+                if ip.is_link_local] == [ip for ip in lls if ip.is_link_local]
+
+        net.stop()
+    finally:
+        cleanup()
+
+
+@require_root
+def test_veth_pairs_rollback():
+    try:
+        net = IPNet(topo=StaticAddressNet())
+        net.start()
+        r1, r2 = net["r1"], net["r2"]
+        # The first pair cannot be created since r1-eth1 already exists
+        with pytest.raises(RuntimeError, match="r1-eth1"):
+            make_veth_pairs([
+                (r1, "r1-eth1", net.randMac(), r2, "r2-new1", net.randMac()),
+                (r1, "r1-new2", net.randMac(), r2, "r2-new2", net.randMac())])
+        # Only the pair created by the call is removed
+        assert "r1-eth1" in r1.cmd("ip link show")
+        assert "r1-new2" not in r1.cmd("ip link show")
+        assert "r2-new2" not in r2.cmd("ip link show")
+        net.stop()
+    finally:
+        cleanup()
@@ -2,14 +2,24 @@ import os
 import subprocess
 
 import ipaddress
+from types import SimpleNamespace
+
 import pytest
 
 import ipmininet.utils as utils
 from ipmininet.clean import cleanup
+from ipmininet.examples.simple_ospfv3_network import SimpleOSPFv3Net
+from ipmininet.examples.spanning_tree_hub import SpanningTreeHub
 from ipmininet.examples.static_address_network import StaticAddressNet
-from ipmininet.ipnet import IPNet
-from ipmininet.link import _parse_addresses
-from ipmininet.router.config.utils import ip_statement
+from ipmininet.ipnet import IPNet, BroadcastDomain
+import ipmininet.link
+from ipmininet.link import _parse_addresses, addresses_by_interface
+from ipmininet.offline import OfflineNet
+from ipmininet.router import IPNode
+import ipmininet.router.config.base
+from ipmininet.router.config.base import RouterIdAllocator
+from ipmininet.router.config.utils import ip_statement, template_lookup, \
+    precompile_templates
 from . import require_root
 
 
@@ -77,6 +87,21 @@ def test_ip_address_format():
     assert len(out.strip('\n').split('\n')) == (2 + 2 * len(v4) + 2 * len(v6))
 
 
+def test_ip_address_dump(monkeypatch):
+    """Check that the addresses of all interfaces are found in a single dump,
+    with and without the JSON output of ip"""
+    subprocess.call(['ip', 'link', 'set', 'dev', 'lo', 'up'])
+    dump = addresses_by_interface()
+    assert 'lo' in dump
+    mac, v4, v6 = dump['lo']
+    assert mac is not None and len(v4) > 0 and len(v6) > 0
+    assert addresses_by_interface(devname='lo') == {'lo': dump['lo']}
+
+    monkeypatch.setattr(ipmininet.link, '_ip_json', False)
+    assert addresses_by_interface() == dump
+    assert addresses_by_interface(devname='lo') == {'lo': dump['lo']}
+
+
 @pytest.mark.parametrize("cmd,present", [
     ("ls", True),
     ("/bin/sh", True),
@@ -110,6 +135,78 @@ def test_address_pair(node, use_v4, use_v6, expected):
         cleanup()
 
 
+@require_root
+def test_address_pair_cache():
+    try:
+        net = IPNet(topo=StaticAddressNet())
+        net.start()
+        h1 = net["h1"]
+        assert utils.address_pair(h1) == ("10.0.0.2", "2001:1a::2")
+        # Addresses changed behind the back of IPIntf are only seen
+        # after invalidating the cache or forcing a refresh
+        h1.cmd("ip address flush dev %s scope global" % h1.defaultIntf())
+        assert utils.address_pair(h1) == ("10.0.0.2", "2001:1a::2")
+        assert utils.address_pair(h1, refresh=True) == (None, None)
+        h1.defaultIntf().setIP("10.0.0.3/24")
+        assert utils.address_pair(h1) == ("10.0.0.3", None)
+        h1.cmd("ip address flush dev %s scope global" % h1.defaultIntf())
+        h1.defaultIntf().invalidate()
+        assert utils.address_pair(h1) == (None, None)
+        net.stop()
+    finally:
+        cleanup()
+
+
+@pytest.mark.parametrize("bulk_links", [True, False])
+@require_root
+def test_deferred_intf_init(bulk_links):
+    try:
+        net = IPNet(topo=StaticAddressNet(), bulk_links=bulk_links)
+        net.build()
+        assert len(net.links) == len(net.topo.links())
+        for n in net.routers + net.hosts:
+            for itf in utils.realIntfList(n):
+                assert itf.isUp(), "%s of %s is down" % (itf, n)
+                assert itf.mac is not None
+                assert utils.otherIntf(itf) is not None
+                assert next(itf.ips(), None) is not None
+        net.stop()
+    finally:
+        cleanup()
+
+
+def test_union_find():
+    sets = utils.UnionFind()
+    for x, y in ((1, 2), (3, 4), (2, 4), (5, 5)):
+        sets.union(x, y)
+    assert len({sets.find(x) for x in (1, 2, 3, 4)}) == 1
+    assert sets.find(5) is not sets.find(1)
+    assert sets.find(6) == 6
+
+
+@pytest.mark.parametrize("topo", [StaticAddressNet, SpanningTreeHub])
+@require_root
+def test_broadcast_domains(topo):
+    try:
+        net = IPNet(topo=topo(), allocate_IPs=False)
+        net.build()
+        for domain in net.broadcast_domains:
+            # Exploring any interface finds the same domain
+            for itf in domain:
+                assert itf.broadcast_domain is domain
+                assert BroadcastDomain(itf).interfaces == domain.interfaces
+        # The cached sizes follow the changes of interface widths
+        domain = next(d for d in net.broadcast_domains
+                      if d.use_ip_version(6))
+        itf = next(iter(domain))
+        prefixlen = domain.max_v6prefixlen
+        itf.interface_width = (1, 65)
+        assert domain.max_v6prefixlen < prefixlen
+        net.stop()
+    finally:
+        cleanup()
+
+
 @pytest.mark.parametrize("start,node,present", [
     ("h1", "h1", True),
     ("h1", "r1", True),
@@ -155,3 +252,138 @@ def test_find_node(start, node, present):
 ])
 def test_ip_statement(test_input, expected):
     assert ip_statement(test_input) == expected
+
+
+def test_bulk_sysctl(tmpdir, monkeypatch):
+    root = tmpdir.mkdir('sys')
+    root.mkdir('net').mkdir('ipv4')
+    root.join('net', 'ipv4', 'ip_forward').write('0\n')
+    root.join('net', 'ipv4', 'port_range').write('1024\t65535\n')
+    monkeypatch.setattr(IPNode, 'SYSCTL_ROOT', str(root))
+
+    values = [('net.ipv4.ip_forward', '1'),
+              ('net.ipv4.port_range', '1024 65535'),
+              ('net.ipv4.unknown', '1')]
+    out = subprocess.check_output(['sh', '-c', IPNode._sysctl_script(values)],
+                                  universal_newlines=True)
+    old = IPNode._parse_sysctl_output(values, out, 'r1')
+    # Only the changed sysctls are part of the snapshot
+    assert old == {'net.ipv4.ip_forward': '0'}
+    assert root.join('net', 'ipv4', 'ip_forward').read() == '1\n'
+    assert root.join('net', 'ipv4', 'port_range').read() == '1024\t65535\n'
+
+    # Restoring the snapshot
+    values = list(old.items())
+    out = subprocess.check_output(['sh', '-c', IPNode._sysctl_script(values)],
+                                  universal_newlines=True)
+    assert IPNode._parse_sysctl_output(values, out, 'r1') == \
+        {'net.ipv4.ip_forward': '1'}
+    assert root.join('net', 'ipv4', 'ip_forward').read() == '0\n'
+
+
+@pytest.mark.parametrize("key,path", [
+    ("net.ipv4.ip_forward", "net/ipv4/ip_forward"),
+    ("net.ipv6.conf.all.forwarding", "net/ipv6/conf/all/forwarding"),
+    # The interface name is kept intact
+    ("net.ipv4.conf.eth0.100.rp_filter", "net/ipv4/conf/eth0.100/rp_filter"),
+    ("net.ipv6.neigh.r1-eth0.10.retrans_time_ms",
+     "net/ipv6/neigh/r1-eth0.10/retrans_time_ms"),
+    ("net/ipv4/conf/eth0.100/rp_filter", "net/ipv4/conf/eth0.100/rp_filter"),
+])
+def test_sysctl_path(key, path):
+    assert IPNode._sysctl_path(key) == os.path.join(IPNode.SYSCTL_ROOT, path)
+
+
+def test_bulk_sysctl_dotted_interface(tmpdir, monkeypatch):
+    root = tmpdir.mkdir('sys')
+    conf = root.mkdir('net').mkdir('ipv4').mkdir('conf').mkdir('eth0.100')
+    conf.join('rp_filter').write('1\n')
+    monkeypatch.setattr(IPNode, 'SYSCTL_ROOT', str(root))
+
+    values = [('net.ipv4.conf.eth0.100.rp_filter', '0')]
+    out = subprocess.check_output(['sh', '-c', IPNode._sysctl_script(values)],
+                                  universal_newlines=True)
+    assert IPNode._parse_sysctl_output(values, out, 'r1') == \
+        {'net.ipv4.conf.eth0.100.rp_filter': '1'}
+    assert conf.join('rp_filter').read() == '0\n'
+
+
+def test_routerid_allocator():
+    allocator = RouterIdAllocator()
+    allocator.reserve('0.0.0.2')
+    allocator.reserve('0.0.0.4')
+    r1, r2, r3 = (SimpleNamespace(name=n) for n in ('r1', 'r2', 'r3'))
+    assert [allocator.generate(r) for r in (r1, r2, r1, r3)] == \
+        ['0.0.0.3', '0.0.0.5', '0.0.0.3', '0.0.0.6']
+
+
+def test_default_routerid_allocator(tmpdir, monkeypatch):
+    monkeypatch.setattr(ipmininet.router.config.base,
+                        'default_routerid_allocator', RouterIdAllocator())
+    net = OfflineNet(topo=SimpleOSPFv3Net(), use_v4=False, cwd=str(tmpdir))
+    net.render()
+    r7 = net['r7']
+    others = {r.nconfig.routerid for r in net.routers if r is not r7}
+    # Without the allocator of the network, the router ids of the other
+    # routers are still reserved
+    r7.nconfig.routerid_allocator = None
+    assert r7.nconfig.compute_routerid() not in others
+
+
+@require_root
+def test_generated_routerids():
+    try:
+        net = IPNet(topo=SimpleOSPFv3Net(), use_v4=False)
+        net.start()
+        routerids = [r.nconfig.routerid for r in net.routers]
+        assert len(set(routerids)) == len(routerids)
+        net.stop()
+    finally:
+        cleanup()
+
+
+def test_template_module_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv('IPMININET_CACHE_DIR', str(tmpdir.join('cache')))
+    templates = tmpdir.mkdir('templates')
+    templates.join('a.mako').write('hello ${name}')
+    lookup = template_lookup(str(templates))
+    assert lookup.module_directory.startswith(str(tmpdir.join('cache')))
+    assert precompile_templates(lookup) == 1
+    module = os.path.join(lookup.module_directory, 'a.mako.py')
+    assert os.path.exists(module)
+    mtime = os.stat(module).st_mtime_ns
+
+    # Other processes load the compiled module
+    other = template_lookup(str(templates))
+    assert other.module_directory == lookup.module_directory
+    assert lookup.get_template('a.mako').render(name='x') == 'hello x'
+    assert other.get_template('a.mako').render(name='y') == 'hello y'
+    assert os.stat(module).st_mtime_ns == mtime
+
+    # The modules of another version of the templates are kept apart
+    templates.join('a.mako').write('bye ${name}')
+    other = template_lookup(str(templates))
+    assert other.module_directory != lookup.module_directory
+    assert other.get_template('a.mako').render(name='y') == 'bye y'
+
+    monkeypatch.setenv('IPMININET_CACHE_DIR', '')
+    assert template_lookup(str(templates)).module_directory is None
+
+
+def test_template_module_cache_lazy(tmpdir, monkeypatch):
+    cache = tmpdir.join('cache')
+    monkeypatch.setenv('IPMININET_CACHE_DIR', str(cache))
+    templates = tmpdir.mkdir('templates')
+    templates.join('a.mako').write('hello ${name}')
+    lookup = template_lookup(str(templates))
+    # The cache directory is only created when a template is looked up
+    assert not cache.exists()
+    assert lookup.get_template('a.mako').render(name='x') == 'hello x'
+    assert cache.exists()
+
+    # The templates are compiled in memory if the cache cannot be written
+    cache.remove()
+    cache.join('templates').write('not a directory', ensure=True)
+    lookup = template_lookup(str(templates))
+    assert lookup.get_template('a.mako').render(name='y') == 'hello y'
+    assert lookup.module_directory is None
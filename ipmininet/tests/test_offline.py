@@ -0,0 +1,44 @@
+import os
+
+from ipmininet.examples.simple_bgp_network import SimpleBGPTopo
+from ipmininet.examples.simple_ospfv3_network import SimpleOSPFv3Net
+from ipmininet.offline import OfflineNet, link_local
+
+
+def test_link_local():
+    assert link_local('52:54:00:12:34:56').with_prefixlen == \
+        'fe80::5054:ff:fe12:3456/64'
+
+
+def test_offline_network(tmpdir):
+    net = OfflineNet(topo=SimpleBGPTopo(), cwd=str(tmpdir))
+    subnets = set()
+    for domain in net.broadcast_domains:
+        assert domain.net not in subnets
+        subnets.add(domain.net)
+        for itf in domain:
+            assert next(itf.ips(), None) in domain.net
+            assert next(itf.ip6s(exclude_lls=True), None) in domain.net6
+            assert next(itf.ip6s(), None) is not None
+            assert net.intf_for_ip(next(itf.ips()).ip) is itf
+
+    files = net.render()
+    assert set(files) == {n.name for n in net.routers + net.hosts}
+    for r in net.routers:
+        assert r.nconfig.routerid == r.intf('lo').ip
+        assert files[r.name]
+        for f in files[r.name]:
+            assert os.path.dirname(f) == str(tmpdir)
+            assert os.path.getsize(f) > 0
+    net.stop()
+    # The configuration files are kept
+    assert all(os.path.exists(f) for fs in files.values() for f in fs)
+
+
+def test_offline_routerids(tmpdir):
+    net = OfflineNet(topo=SimpleOSPFv3Net(), cwd=str(tmpdir), use_v4=False)
+    net.start()
+    routerids = [r.nconfig.routerid for r in net.routers]
+    assert len(set(routerids)) == len(routerids)
+    assert 'render_time' in net.metrics
+    net.stop()
@@ -0,0 +1,73 @@
+"""This module tests the readiness probes of the daemons"""
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from ipmininet.router.config.readiness import FileProbe, PidFileProbe, \
+    ReadinessProbe, UnixSocketProbe
+
+
+def delayed(delay, fun, *args):
+    t = threading.Timer(delay, fun, args=args)
+    t.start()
+    return t
+
+
+def write_file(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_file_probe(tmpdir):
+    path = str(tmpdir.join('daemon.cfg'))
+    probe = FileProbe(path)
+    assert not probe.ready()
+    assert not probe.wait(.05)
+    delayed(.1, write_file, path, '')
+    t = time.time()
+    assert probe.wait(5)
+    assert time.time() - t < 2
+
+
+def test_pid_file_probe(tmpdir):
+    path = str(tmpdir.join('daemon.pid'))
+    probe = PidFileProbe(path)
+    write_file(path, '')
+    assert not probe.ready()
+    delayed(.1, write_file, path, '%d\n' % os.getpid())
+    assert probe.wait(5)
+    probe.reset()
+    assert not os.path.exists(path)
+
+
+def test_probe_dead_process(tmpdir):
+    probe = PidFileProbe(str(tmpdir.join('daemon.pid')))
+    t = time.time()
+    assert not probe.wait(5, alive=lambda: False)
+    assert time.time() - t < 1
+
+
+def test_unix_socket_probe(tmpdir):
+    path = str(tmpdir.join('daemon.api'))
+    probe = UnixSocketProbe(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        # The socket exists but the daemon does not listen yet
+        assert not probe.ready()
+        delayed(.1, sock.listen, 1)
+        assert probe.wait(5)
+    finally:
+        sock.close()
+
+
+def test_abstract_probe():
+    class NoProbe(ReadinessProbe):
+        pass
+
+    # Probes must tell whether the daemon is ready
+    with pytest.raises(TypeError):
+        NoProbe()
@@ -0,0 +1,140 @@
+"""This module tests the reconfiguration of running daemons"""
+import pytest
+
+from ipmininet.clean import cleanup
+from ipmininet.examples.simple_bgp_network import SimpleBGPTopo
+from ipmininet.ipnet import IPNet
+from ipmininet.offline import OfflineNet
+from ipmininet.router.config import BGP, OSPF, OSPF6, zebra
+from ipmininet.router.config.vtysh import config_diff, parse_config
+from ipmininet.tests import require_root
+from ipmininet.tests.utils import assert_connectivity
+
+BGP_CFG = """hostname r1
+password zebra
+log file /tmp/bgpd_r1.log
+
+router bgp 1
+    bgp router-id 1.1.1.1
+    no bgp default ipv4-unicast
+    no auto-summary
+    neighbor 10.0.0.2 remote-as 2
+    no auto-summary
+    neighbor 10.0.0.3 remote-as 1
+    address-family ipv4
+    redistribute connected
+    neighbor 10.0.0.2 activate
+    neighbor 10.0.0.3 activate
+    address-family ipv6
+    redistribute connected
+
+ip access-list all permit any
+
+route-map rm1-ipv4 permit 10
+    match ip address all
+    set local-preference 50
+!
+"""
+
+
+def test_parse_config():
+    assert parse_config(BGP_CFG) == {
+        (): ['hostname r1', 'password zebra', 'log file /tmp/bgpd_r1.log',
+             'ip access-list all permit any'],
+        ('router bgp 1',): ['bgp router-id 1.1.1.1',
+                            'no bgp default ipv4-unicast', 'no auto-summary',
+                            'neighbor 10.0.0.2 remote-as 2',
+                            'neighbor 10.0.0.3 remote-as 1'],
+        ('router bgp 1', 'address-family ipv4'): [
+            'redistribute connected', 'neighbor 10.0.0.2 activate',
+            'neighbor 10.0.0.3 activate'],
+        ('router bgp 1', 'address-family ipv6'): ['redistribute connected'],
+        ('route-map rm1-ipv4 permit 10',): ['match ip address all',
+                                            'set local-preference 50']}
+
+
+@pytest.mark.parametrize('old,new,expected', [
+    (BGP_CFG, BGP_CFG, []),
+    (BGP_CFG, BGP_CFG.replace('2\n', '3\n'),
+     ['configure terminal', 'router bgp 1', 'neighbor 10.0.0.2 remote-as 3',
+      'end']),
+    (BGP_CFG, BGP_CFG.replace('    neighbor 10.0.0.3 activate\n', ''),
+     ['configure terminal', 'router bgp 1', 'address-family ipv4',
+      'no neighbor 10.0.0.3 activate', 'end']),
+    (BGP_CFG, BGP_CFG.replace('50', '200'),
+     ['configure terminal', 'route-map rm1-ipv4 permit 10',
+      'no set local-preference 50', 'end',
+      'configure terminal', 'route-map rm1-ipv4 permit 10',
+      'set local-preference 200', 'end']),
+    (BGP_CFG, BGP_CFG[:BGP_CFG.index('route-map')],
+     ['configure terminal', 'no route-map rm1-ipv4 permit 10', 'end']),
+    (BGP_CFG, BGP_CFG.replace('no bgp default', 'bgp default'),
+     ['configure terminal', 'router bgp 1', 'bgp default ipv4-unicast',
+      'end']),
+    ("interface r1-eth0\n  ip ospf cost 1\n!\nrouter ospf\n!",
+     "interface r1-eth0\n  ip ospf cost 5\n!\nrouter ospf\n!",
+     ['configure terminal', 'interface r1-eth0', 'no ip ospf cost 1', 'end',
+      'configure terminal', 'interface r1-eth0', 'ip ospf cost 5', 'end']),
+])
+def test_config_diff(old, new, expected):
+    assert config_diff(old, new) == expected
+
+
+def test_reconfigure_updated_files(tmpdir, monkeypatch):
+    """The daemons get the configuration files that update_configs() wrote
+    before the reconfiguration"""
+    commands = []
+    monkeypatch.setattr(zebra, 'has_cmd', lambda cmd: True)
+    monkeypatch.setattr(zebra.QuaggaDaemon, 'vtysh',
+                        lambda d, *cmds: commands.append((d.NAME, cmds))
+                        or ('', '', 0))
+    net = OfflineNet(topo=SimpleBGPTopo(), cwd=str(tmpdir))
+    net.render()
+    as2r1 = net['as2r1']
+    # The daemons loaded the rendered configurations
+    as2r1._loaded_configs = {d.NAME: d.read_cfg()
+                             for d in as2r1.nconfig.daemons}
+
+    as2r1.intf('as2r1-eth1').params['igp_metric'] = 5
+    assert net.update_configs() == {'as2r1': [OSPF.NAME, OSPF6.NAME]}
+    assert as2r1.reconfigure() == [as2r1.nconfig.daemon(OSPF),
+                                   as2r1.nconfig.daemon(OSPF6)]
+    assert [name for name, _ in commands] == [OSPF.NAME, OSPF6.NAME]
+    assert 'ip ospf cost 5' in commands[0][1]
+    # The applied configurations are the loaded ones
+    assert as2r1.reconfigure() == []
+    assert len(commands) == 2
+
+
+@require_root
+def test_live_reconfiguration():
+    try:
+        net = IPNet(topo=SimpleBGPTopo())
+        net.start()
+        as2r1 = net['as2r1']
+        pids = {d.NAME: as2r1._processes.get_process(
+            as2r1._daemon_processes[d.NAME]).pid
+            for d in as2r1.nconfig.daemons}
+
+        as2r1.intf('as2r1-eth1').params['igp_metric'] = 5
+        assert net.reconfigure()['as2r1'] == [OSPF.NAME, OSPF6.NAME]
+        assert net.reconfigure() == {}
+
+        # The files written by update_configs() are applied as well
+        as2r1.intf('as2r1-eth1').params['igp_metric'] = 7
+        assert net.update_configs() == {'as2r1': [OSPF.NAME, OSPF6.NAME]}
+        assert net.reconfigure() == {'as2r1': [OSPF.NAME, OSPF6.NAME]}
+
+        ospfd = as2r1.nconfig.daemon(OSPF)
+        out, _, code = ospfd.vtysh('show running-config')
+        assert code == 0
+        assert 'ip ospf cost 7' in out
+        # The daemons were not restarted
+        assert {d.NAME: as2r1._processes.get_process(
+            as2r1._daemon_processes[d.NAME]).pid
+            for d in as2r1.nconfig.daemons} == pids
+        assert as2r1.nconfig.daemon(BGP).vtysh('show bgp summary')[2] == 0
+        assert_connectivity(net, v6=False)
+        net.stop()
+    finally:
+        cleanup()
@@ -0,0 +1,147 @@
+"""This module tests the rendering of the configurations in parallel and
+their incremental updates"""
+import os
+import pickle
+import threading
+from ipaddress import ip_network
+
+import pytest
+
+from ipmininet.examples.bgp_local_pref import BGPTopoLocalPref
+from ipmininet.examples.dns_network import DNSNetwork
+from ipmininet.examples.router_adv_network import RouterAdvNet
+from ipmininet.examples.simple_bgp_network import SimpleBGPTopo
+from ipmininet.examples.simple_ospf_network import SimpleOSPFNet
+from ipmininet.offline import OfflineNet
+from ipmininet.router.config import BGP, OSPF
+from ipmininet.utils import InputRecorder
+
+
+def test_render_job(tmpdir):
+    net = OfflineNet(topo=SimpleBGPTopo(), cwd=str(tmpdir))
+    for r in net.routers:
+        r.nconfig.build_daemons()
+        expected = {}
+        for d in r.nconfig.daemons:
+            r.nconfig.render_daemon(d)
+            expected[d.NAME] = d.cfg_digest
+        contents = {f: open(f).read() for d in r.nconfig.daemons
+                    for f in d.cfg_filenames}
+        for f in contents:
+            os.unlink(f)
+
+        job, local = r.nconfig.render_job()
+        assert not local
+        results = pickle.loads(pickle.dumps(job)).run()
+        assert {name: digest for name, (digest, _) in results.items()} \
+            == expected
+        assert {f: open(f).read() for f in contents} == contents
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_parallel_rendering(workers, tmpdir):
+    net = OfflineNet(topo=SimpleOSPFNet(), cwd=str(tmpdir),
+                     render_workers=workers)
+    files = net.render()
+    daemons = set()
+    for r in net.routers:
+        for d in r.nconfig.daemons:
+            daemons.add(d.NAME)
+            assert set(d.cfg_filenames) <= set(d.files)
+            assert all(os.path.getsize(f) > 0 for f in files[r.name])
+            # The digest is the one of the files written by the workers
+            digest = d.cfg_digest
+            r.nconfig.render_daemon(d)
+            assert d.cfg_digest == digest
+    assert set(net.metrics['daemon_render_time']) == daemons
+
+
+def test_local_rendering(tmpdir):
+    class CustomOSPF(OSPF):
+        def write(self, cfg):
+            super().write(cfg)
+
+    net = OfflineNet(topo=SimpleOSPFNet(), cwd=str(tmpdir))
+    r1 = net['r1']
+    r1.nconfig._daemons[OSPF.NAME] = CustomOSPF(r1)
+    r1.nconfig.build_daemons()
+    job, local = r1.nconfig.render_job()
+    assert [d.NAME for d in local] == [OSPF.NAME]
+    assert OSPF.NAME not in [name for name, *_ in job.daemons]
+    net.render()
+    assert r1.nconfig.daemon(OSPF).cfg_digest is not None
+
+
+def test_update_configs(tmpdir):
+    net = OfflineNet(topo=SimpleOSPFNet(), cwd=str(tmpdir))
+    net.render()
+    inputs = {d: d.inputs for r in net.routers for d in r.nconfig.daemons}
+    assert net.update_configs() == {}
+    # No configuration tree was built again
+    assert all(d.inputs is i for d, i in inputs.items())
+
+    r1 = net['r1']
+    ospfd = r1.nconfig.daemon(OSPF)
+    r1.intf('r1-eth0').params['igp_metric'] = 7
+    assert net.update_configs() == {'r1': [OSPF.NAME]}
+    with open(ospfd.cfg_filename) as f:
+        assert 'ip ospf cost 7' in f.read()
+    assert net.update_configs() == {}
+
+    ospfd.options.hello_int = 3
+    assert net.update_configs() == {'r1': [OSPF.NAME]}
+    with open(ospfd.cfg_filename) as f:
+        assert 'ip ospf hello-interval 3' in f.read()
+    assert net.metrics['update_time'] >= 0
+
+
+def test_update_peers(tmpdir):
+    net = OfflineNet(topo=SimpleBGPTopo(), cwd=str(tmpdir))
+    net.render()
+    # The peers of the router read its AS number
+    net['as1r1'].params['asn'] = 4
+    assert net.update_configs() == {'as1r1': [BGP.NAME], 'as2r1': [BGP.NAME]}
+    with open(net['as2r1'].nconfig.daemon(BGP).cfg_filename) as f:
+        assert 'remote-as 4' in f.read()
+
+
+def test_update_in_place(tmpdir):
+    net = OfflineNet(topo=BGPTopoLocalPref(), cwd=str(tmpdir))
+    net.render()
+    # The objects of the options and parameters are compared by content
+    as4r1 = net['as4r1'].nconfig.daemon(BGP)
+    as4r1.options.address_families[0].networks.append(
+        ip_network('beef::/32'))
+    assert net.update_configs() == {'as4r1': [BGP.NAME]}
+    with open(as4r1.cfg_filename) as f:
+        assert 'network beef::/32' in f.read()
+
+    net['as1r6'].params['bgp_route_maps'][0]['set_actions'][0].value = 77
+    assert net.update_configs() == {'as1r6': [BGP.NAME]}
+    with open(net['as1r6'].nconfig.daemon(BGP).cfg_filename) as f:
+        assert 'set local-preference 77' in f.read()
+    assert net.update_configs() == {}
+
+
+def test_recorder_per_thread():
+    params = {'a': 1, 'b': 2}
+    with InputRecorder() as recorder:
+        # The inputs read by other threads are not recorded
+        other = threading.Thread(target=InputRecorder.record,
+                                 args=('params', 'a', 1, lambda: params['a']))
+        other.start()
+        other.join()
+        InputRecorder.record('params', 'b', 2, lambda: params['b'])
+        assert list(recorder.inputs) == [('params', 'b')]
+    assert InputRecorder.active() is None
+
+
+@pytest.mark.parametrize('topo', [BGPTopoLocalPref, DNSNetwork, RouterAdvNet])
+def test_rebuild_configs(topo, tmpdir):
+    net = OfflineNet(topo=topo(), cwd=str(tmpdir))
+    net.render()
+    for n in net.routers + net.hosts:
+        for d in n.nconfig.daemons:
+            d.inputs = None
+    # Building the configurations again gives the same files
+    assert net.update_configs() == {}
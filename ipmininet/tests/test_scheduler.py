@@ -0,0 +1,97 @@
+"""This module tests the startup scheduler of the nodes"""
+import threading
+import time
+
+import pytest
+
+from ipmininet.scheduler import StartupScheduler
+
+
+class FakeDaemon:
+
+    def __init__(self, name, prio=10, depends=()):
+        self.NAME = name
+        self.PRIO = prio
+        self.DEPENDS = depends
+
+
+class FakeConfig:
+
+    def __init__(self, daemons):
+        self.daemons = sorted(daemons, key=lambda d: d.PRIO)
+
+
+class FakeNode:
+
+    def __init__(self, name, daemons, log, delay=0.):
+        self.name = name
+        self.nconfig = FakeConfig(daemons)
+        self.log = log
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def build_config(self):
+        self.log.append((self.name, 'build'))
+
+    def check_daemon(self, d):
+        return '', '', 0
+
+    def set_sysctls(self):
+        pass
+
+    def start_daemon(self, d):
+        time.sleep(self.delay)
+        with self.lock:
+            self.log.append((self.name, d.NAME))
+
+
+def router_daemons():
+    zebra = FakeDaemon('zebra', prio=0)
+    return [zebra, FakeDaemon('ospfd', depends=(zebra,)),
+            FakeDaemon('bgpd', depends=(zebra,)), FakeDaemon('sshd', prio=20)]
+
+
+@pytest.mark.parametrize('workers', [1, 4, 16])
+def test_scheduler_ordering(workers):
+    log = []
+    nodes = [FakeNode('r%d' % i, router_daemons(), log, delay=.01)
+             for i in range(8)]
+    nodes.append(FakeNode('h1', [], log))
+    scheduler = StartupScheduler(max_workers=workers)
+    scheduler.start(nodes)
+
+    for n in nodes:
+        assert n.name in scheduler.ready_time
+        events = [e for node, e in log if node == n.name]
+        assert events[0] == 'build'
+        if not n.nconfig.daemons:
+            continue
+        assert sorted(events[1:]) == ['bgpd', 'ospfd', 'sshd', 'zebra']
+        # zebra must be started before the daemons of higher priority
+        assert events[1] == 'zebra'
+        assert events[-1] == 'sshd'
+    # All configurations are built before any daemon is started
+    assert all(e == 'build' for _, e in log[:len(nodes)])
+
+
+def test_scheduler_concurrency():
+    log = []
+    nodes = [FakeNode('r%d' % i, router_daemons(), log, delay=.05)
+             for i in range(8)]
+    t = time.time()
+    StartupScheduler(max_workers=16).start(nodes)
+    parallel = time.time() - t
+    # 3 dependency levels per node, nodes started at the same time
+    assert parallel < 8 * 4 * .05
+
+
+def test_scheduler_failure():
+    log = []
+
+    class FailingNode(FakeNode):
+        def start_daemon(self, d):
+            raise RuntimeError('Cannot start %s' % d.NAME)
+
+    nodes = [FailingNode('r1', router_daemons(), log)]
+    with pytest.raises(RuntimeError):
+        StartupScheduler(max_workers=2).start(nodes)
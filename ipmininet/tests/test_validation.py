@@ -0,0 +1,99 @@
+"""Tests of the network-wide validation of daemon configurations"""
+import time
+
+import mininet.clean
+import pytest
+
+from ipmininet.scheduler import StartupScheduler
+from ipmininet.validation import CheckCache, ConfigValidator
+from ipmininet.tests.test_scheduler import FakeNode, router_daemons
+
+
+class CheckedNode(FakeNode):
+
+    def __init__(self, name, daemons, log, invalid=(), delay=0.):
+        super().__init__(name, daemons, log)
+        self.invalid = invalid
+        self.check_delay = delay
+        self.checking = 0
+        self.max_checking = 0
+
+    def check_daemon(self, d):
+        with self.lock:
+            self.checking += 1
+            self.max_checking = max(self.checking, self.max_checking)
+        time.sleep(self.check_delay)
+        with self.lock:
+            self.checking -= 1
+        if d.NAME in self.invalid:
+            return '', 'invalid %s' % d.NAME, 1
+        return '', '', 0
+
+
+def test_validation_report():
+    log = []
+    nodes = [CheckedNode('r1', router_daemons(), log, invalid=('ospfd',)),
+             CheckedNode('r2', router_daemons(), log),
+             CheckedNode('r3', router_daemons(), log,
+                         invalid=('bgpd', 'zebra'))]
+    validator = ConfigValidator(max_workers=4)
+    failures = validator.validate(nodes)
+    # Every failure is reported, not only the first one
+    assert sorted((f.node.name, f.daemon.NAME) for f in failures) == \
+        [('r1', 'ospfd'), ('r3', 'bgpd'), ('r3', 'zebra')]
+    report = validator.report(failures)
+    assert 'r1, r3' in report
+    assert 'invalid bgpd' in report and 'invalid ospfd' in report
+    assert validator.duration >= 0
+
+
+def test_validation_concurrency():
+    log = []
+    node = CheckedNode('r1', router_daemons() * 4, log, delay=.05)
+    ConfigValidator(max_workers=4).validate([node])
+    assert node.max_checking == 4
+    node.max_checking = 0
+    ConfigValidator(max_workers=1).validate([node])
+    assert node.max_checking == 1
+
+
+def test_validation_aborts_startup(monkeypatch):
+    cleaned = []
+    monkeypatch.setattr(mininet.clean, 'cleanup', lambda: cleaned.append(1))
+    log = []
+    nodes = [CheckedNode('r1', router_daemons(), log),
+             CheckedNode('r2', router_daemons(), log, invalid=('bgpd',))]
+    with pytest.raises(SystemExit):
+        StartupScheduler(max_workers=2).start(nodes)
+    # No daemon was started
+    assert all(e == 'build' for _, e in log)
+    assert cleaned
+
+
+def test_check_cache(tmpdir):
+    path = str(tmpdir.join('checks.json'))
+    log = []
+    daemons = router_daemons()
+    for i, d in enumerate(daemons):
+        d.dry_run = 'true %s' % d.NAME
+        d.cfg_digest = 'digest%d' % i
+    node = CheckedNode('r1', daemons, log, invalid=('bgpd',))
+
+    validator = ConfigValidator(cache=CheckCache(path))
+    assert len(validator.validate([node])) == 1
+    assert (validator.hits, validator.misses) == (0, 4)
+
+    # Successful checks are remembered across runs, failed ones are not
+    validator = ConfigValidator(cache=CheckCache(path))
+    assert len(validator.validate([node])) == 1
+    assert (validator.hits, validator.misses) == (3, 1)
+
+    # A configuration change invalidates its check
+    daemons[0].cfg_digest = 'changed'
+    validator = ConfigValidator(cache=CheckCache(path))
+    validator.validate([node])
+    assert (validator.hits, validator.misses) == (2, 2)
+
+    # Checks whose binary cannot be found are not cached
+    daemons[0].dry_run = 'not-a-real-binary-xyz -C'
+    assert CheckCache.key(daemons[0]) is None
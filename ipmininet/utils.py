@@ -1,17 +1,21 @@
 """utils: utility functions to manipulate host, interfaces, ..."""
 import collections
 import os
+import threading
+import types
 
-from mininet.link import Intf
+from mininet.link import Intf, Link
 from mininet.log import lg as log
 from mininet.node import Node
 
 from ipaddress import ip_address, IPv4Address, IPv6Address, IPv4Network,\
-    IPv6Network
+    IPv6Network, IPv4Interface, IPv6Interface
 
-from typing import Type, Dict, Optional, Union, Tuple, List, TYPE_CHECKING, Set
+from typing import Type, Dict, Optional, Union, Tuple, List, TYPE_CHECKING, \
+    Set, Any, Callable, Hashable
 if TYPE_CHECKING:
     from ipmininet.link import IPIntf
+RecordedInput = Tuple[Callable[[], Any], Any]
 
 
 def has_cmd(cmd: str) -> bool:
@@ -43,10 +47,34 @@ def require_cmd(cmd: str, help_str: Optional[str] = None):
     raise RuntimeError('[%s] is not available in $PATH' % cmd)
 
 
+def cache_dir() -> Optional[str]:
+    """Return the directory where data is cached between runs, i.e.,
+    $IPMININET_CACHE_DIR if set or ~/.cache/ipmininet otherwise. Setting
+    $IPMININET_CACHE_DIR to an empty string disables the caches.
+
+    :return: The path of the directory or None if it cannot be used"""
+    path = os.environ.get('IPMININET_CACHE_DIR')
+    if path is None:
+        path = os.path.join(os.path.expanduser('~'), '.cache', 'ipmininet')
+    if not path:
+        return None
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        log.debug('Cannot use the cache directory %s: %s\n' % (path, e))
+        return None
+    return path
+
+
 def otherIntf(intf: Intf) -> Optional['IPIntf']:
-    """"Get the interface on the other side of a link"""
+    """"Get the interface on the other side of a link, recording it in the
+    active InputRecorder if any"""
     link = intf.link
-    return (link.intf1 if link.intf2 == intf else link.intf2) if link else None
+    other = (link.intf1 if link.intf2 == intf else link.intf2) \
+        if link else None
+    if InputRecorder.active() is not None:
+        InputRecorder.record(intf, 'other', other, lambda: otherIntf(intf))
+    return other
 
 
 def realIntfList(n: Node) -> List['IPIntf']:
@@ -54,25 +82,30 @@ def realIntfList(n: Node) -> List['IPIntf']:
     return [i for i in n.intfList() if i.name != 'lo']
 
 
-def address_pair(n: Node, use_v4=True, use_v6=True) \
+def address_pair(n: Node, use_v4=True, use_v6=True, refresh=False) \
         -> Tuple[Optional[str], Optional[str]]:
     """Returns a tuple (ip, ip6) with ip/ip6 being one of the IPv4/IPv6
-       addresses of the node n"""
-    from .link import IPIntf  # Prevent circular imports
+       addresses of the node n
+
+    :param n: The node
+    :param use_v4: Whether to look for an IPv4 address
+    :param use_v6: Whether to look for an IPv6 address
+    :param refresh: Whether to request the addresses from the node even if
+                    the cached ones are up to date"""
+    from .link import IPIntf, refresh_addresses  # Prevent circular imports
+    itfs = [itf for itf in n.intfList()
+            # Mininet switches have a loopback interface
+            # declared as an Intf.
+            # This object does not have ips() or ip6s() methods.
+            if isinstance(itf, IPIntf)]
+    if refresh or any(itf.addresses_outdated for itf in itfs):
+        refresh_addresses(n)
     v4_str = v6_str = None
-    for itf in n.intfList():
-        # Mininet switches have a loopback interface
-        # declared as an Intf.
-        # This object does not have ips() or ip6s() methods.
-        if not isinstance(itf, IPIntf):
-            continue
-
+    for itf in itfs:
         if use_v4 and v4_str is None:
-            itf.updateIP()
             v4 = next(itf.ips(), None)
             v4_str = v4.ip.compressed if v4 is not None else v4
         if use_v6 and v6_str is None:
-            itf.updateIP6()
             v6 = next(itf.ip6s(exclude_lls=True), None)
             v6_str = v6.ip.compressed if v6 is not None else v6
         if (not use_v4 or v4_str is not None) \
@@ -131,6 +164,151 @@ class L3Router:
             return False
 
 
+class UnionFind:
+    """A disjoint-set forest over hashable elements, with path halving and
+    union by size"""
+
+    def __init__(self):
+        self.parent = {}  # type: Dict[Any, Any]
+        self.size = {}  # type: Dict[Any, int]
+
+    def find(self, x) -> Any:
+        """Return the representative of the set of x, adding x if needed"""
+        parent = self.parent
+        if x not in parent:
+            parent[x] = x
+            self.size[x] = 1
+            return x
+        while parent[x] is not x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, x, y) -> Any:
+        """Merge the sets of x and y
+
+        :return: The representative of the merged set"""
+        x = self.find(x)
+        y = self.find(y)
+        if x is y:
+            return x
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+        self.parent[y] = x
+        self.size[x] += self.size.pop(y)
+        return x
+
+
+# The values that are immutable, and thus frozen as is
+IMMUTABLE_TYPES = (str, bytes, int, float, complex, type(None), IPv4Address,
+                   IPv6Address, IPv4Network, IPv6Network, IPv4Interface,
+                   IPv6Interface)
+# The values that are frozen as is since they are compared by identity: the
+# nodes, links and interfaces, whose changes are recorded by their own
+# accessors, as well as the functions, classes and modules
+IDENTITY_TYPES = (Node, Intf, Link, type, types.FunctionType,
+                  types.BuiltinFunctionType, types.MethodType,
+                  types.ModuleType)
+
+
+def freeze(value, _visiting: Optional[Set[int]] = None):
+    """Return a snapshot of a value that is not modified along with it.
+    Lists, tuples, sets and dicts are copied recursively. Other objects are
+    replaced by the snapshot of their __getstate__() if they define one, or
+    else of their attributes, so that modifying them in place also changes
+    their snapshot. Immutable values, topology objects, functions and objects
+    without attributes are returned as is, and thus compared with their own
+    __eq__ method."""
+    if isinstance(value, IMMUTABLE_TYPES + IDENTITY_TYPES):
+        return value
+    if _visiting is None:
+        _visiting = set()
+    if id(value) in _visiting:  # A reference cycle
+        return type(value), id(value)
+    _visiting.add(id(value))
+    try:
+        if isinstance(value, dict):
+            return tuple((k, freeze(v, _visiting)) for k, v in value.items())
+        if isinstance(value, (list, tuple)):
+            return tuple(freeze(v, _visiting) for v in value)
+        if isinstance(value, (set, frozenset)):
+            return frozenset(freeze(v, _visiting) for v in value)
+        getstate = getattr(type(value), '__getstate__', None)
+        if getstate is not None \
+                and getstate is not getattr(object, '__getstate__', None):
+            return type(value), freeze(value.__getstate__(), _visiting)
+        if hasattr(value, '__dict__'):
+            return type(value), freeze(vars(value), _visiting)
+        return value
+    finally:
+        _visiting.discard(id(value))
+
+
+class InputRecorder:
+    """Record the inputs read while this context is active, e.g., the
+    parameters, interfaces and addresses read while building the
+    configuration of a daemon, so that one can later tell whether any of
+    them changed (see NodeConfig.update). Each thread has its own active
+    context."""
+
+    # The context in which the inputs of each thread are currently recorded
+    _local = threading.local()
+
+    def __init__(self):
+        # How to read each input again and the snapshot of the value read,
+        # by source object and key
+        self.inputs = {}  # type: Dict[Tuple[Any, Hashable], RecordedInput]
+        self._outer = None  # type: Optional[InputRecorder]
+
+    @staticmethod
+    def active() -> Optional['InputRecorder']:
+        """Return the context in which the current thread records its
+        inputs, if any"""
+        return getattr(InputRecorder._local, 'recorder', None)
+
+    @staticmethod
+    def _activate(recorder: Optional['InputRecorder']):
+        InputRecorder._local.recorder = recorder
+
+    @staticmethod
+    def record(source, key: Hashable, value, fetch: Callable[[], Any]):
+        """Record an input in the active contexts, if any
+
+        :param source: The object from which the input is read
+        :param key: The name of the input in the source
+        :param value: The value read
+        :param fetch: A function reading the input again"""
+        recorder = InputRecorder.active()
+        while recorder is not None:
+            recorder.add(source, key, value, fetch)
+            recorder = recorder._outer
+
+    def add(self, source, key: Hashable, value, fetch: Callable[[], Any]):
+        """Record an input, unless it was already read in this context"""
+        if (source, key) not in self.inputs:
+            self.inputs[source, key] = (fetch, freeze(value))
+
+    def changes(self) -> List[Tuple[Any, Hashable]]:
+        """Return the source and key of the inputs whose value is not the
+        recorded one anymore"""
+        outer = InputRecorder.active()
+        InputRecorder._activate(None)
+        try:
+            return [k for k, (fetch, value) in self.inputs.items()
+                    if freeze(fetch()) != value]
+        finally:
+            InputRecorder._activate(outer)
+
+    def __enter__(self) -> 'InputRecorder':
+        self._outer = InputRecorder.active()
+        InputRecorder._activate(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        InputRecorder._activate(self._outer)
+        self._outer = None
+
+
 def get_set(d: Dict, key, default: Type):
     """Attempt to return the value for the given key,
     otherwise initialize it
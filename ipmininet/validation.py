@@ -0,0 +1,191 @@
+"""This module checks the daemon configurations of all the nodes of a network
+before any daemon is started"""
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from ipmininet.utils import cache_dir
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+    from ipmininet.router.config.base import Daemon
+
+
+class ValidationFailure:
+    """The failed configuration check of a daemon"""
+
+    def __init__(self, node: 'IPNode', daemon: 'Daemon', code: int, out: str,
+                 err: str):
+        """:param node: The node of the daemon
+        :param daemon: The daemon whose configuration is invalid
+        :param code: The return code of the dry-run
+        :param out: The standard output of the dry-run
+        :param err: The standard error of the dry-run"""
+        self.node = node
+        self.daemon = daemon
+        self.code = code
+        self.out = out
+        self.err = err
+
+    def __str__(self):
+        return '[%s] %s configuration check failed [rcode: %s]\n' \
+               'stdout: %s\nstderr: %s' % (self.node.name, self.daemon.NAME,
+                                           self.code, self.out.strip(),
+                                           self.err.strip())
+
+
+class CheckCache:
+    """A persistent cache of the successful configuration checks.
+    A check is identified by its command line, the hash of the configuration
+    files of the daemon (see Daemon.cfg_digest) and the version of the
+    binary running the check, approximated by its path, size and modification
+    time. Failed checks are never cached."""
+
+    FILENAME = 'config_checks.json'
+    # The maximal number of checks remembered, the least recently used ones
+    # are forgotten first
+    MAX_ENTRIES = 10000
+
+    def __init__(self, path: Optional[str] = None):
+        """:param path: The file storing the cache,
+                        defaults to a file in ipmininet.utils.cache_dir()"""
+        if path is None:
+            directory = cache_dir()
+            if directory is not None:
+                path = os.path.join(directory, self.FILENAME)
+        self.path = path
+        self._entries = OrderedDict()  # type: OrderedDict[str, bool]
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                keys = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            log.debug('Ignoring the check cache %s: %s\n' % (self.path, e))
+            return
+        if isinstance(keys, list):
+            self._entries.update((str(k), True) for k in keys)
+
+    def save(self):
+        """Write down the cache"""
+        if self.path is None:
+            return
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+        tmp = '%s.%d' % (self.path, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(list(self._entries), f)
+            os.replace(tmp, self.path)
+        except (IOError, OSError) as e:
+            log.debug('Cannot save the check cache %s: %s\n' % (self.path, e))
+
+    @staticmethod
+    def key(daemon: 'Daemon') -> Optional[str]:
+        """Return the key identifying the check of the daemon configuration
+        or None if the check cannot be cached"""
+        if daemon.cfg_digest is None:
+            return None
+        cmd = shlex.split(daemon.dry_run)
+        binary = shutil.which(cmd[0]) if cmd else None
+        if binary is None:
+            return None
+        binary = os.path.realpath(binary)
+        try:
+            st = os.stat(binary)
+        except OSError:
+            return None
+        h = hashlib.sha256()
+        for field in (daemon.dry_run, binary, str(st.st_size),
+                      str(st.st_mtime_ns), daemon.cfg_digest):
+            h.update(field.encode() + b'\0')
+        return h.hexdigest()
+
+    def __contains__(self, key: Optional[str]) -> bool:
+        if key is None or key not in self._entries:
+            return False
+        self._entries.move_to_end(key)
+        return True
+
+    def add(self, key: Optional[str]):
+        """Remember a successful check"""
+        if key is not None:
+            self._entries[key] = True
+            self._entries.move_to_end(key)
+
+
+class ConfigValidator:
+    """Run the dry-run of every daemon of a set of nodes. The dry-runs
+    are independent processes so they are run concurrently.
+    Checks found in the cache are skipped."""
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 cache: Optional[CheckCache] = None):
+        """:param max_workers: The maximal number of dry-runs running at the
+                               same time, defaults to the number of CPUs
+        :param cache: The cache of the successful checks"""
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache = cache
+        # The time needed by the last validation, in seconds
+        self.duration = 0.
+        # The number of checks skipped and run during the last validation
+        self.hits = 0
+        self.misses = 0
+
+    def validate(self, nodes: Sequence['IPNode']) -> List[ValidationFailure]:
+        """Check the configurations of all the daemons of the nodes. Their
+        configurations must have been built beforehand.
+
+        :param nodes: The nodes to check
+        :return: The failed checks"""
+        start = time.time()
+        jobs = []
+        keys = []
+        self.hits = 0
+        for n in nodes:
+            for d in n.nconfig.daemons:
+                key = self.cache.key(d) if self.cache is not None else None
+                if key is not None and key in self.cache:
+                    log.debug('[%s] %s configuration check cached\n'
+                              % (n.name, d.NAME))
+                    self.hits += 1
+                    continue
+                jobs.append((n, d))
+                keys.append(key)
+        self.misses = len(jobs)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self._check, jobs))
+        failures = []
+        for (n, d), key, (out, err, code) in zip(jobs, keys, results):
+            if code:
+                failures.append(ValidationFailure(n, d, code, out, err))
+            elif self.cache is not None:
+                self.cache.add(key)
+        if self.cache is not None and self.misses:
+            self.cache.save()
+        self.duration = time.time() - start
+        return failures
+
+    @staticmethod
+    def _check(job: Tuple['IPNode', 'Daemon']) -> Tuple[str, str, int]:
+        node, daemon = job
+        return node.check_daemon(daemon)
+
+    @staticmethod
+    def report(failures: Sequence[ValidationFailure]) -> str:
+        """Return a report of all the failed configuration checks"""
+        nodes = sorted({f.node.name for f in failures})
+        return '%d configuration check(s) failed on %s:\n%s\n' % (
+            len(failures), ', '.join(nodes),
+            '\n'.join(str(f) for f in failures))